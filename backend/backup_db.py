@@ -4,78 +4,264 @@ Database Backup Script
 
 This script periodically backs up the database by fetching it from the /exportdb endpoint.
 It saves each backup with a timestamp in the filename.
+
+Backups form chains: a full backup followed by incremental ones holding only
+the users changed since the previous backup (the X-DB-Generation of the last
+export is sent back as `since`). A new chain starts every BACKUP_FULL_EVERY
+backups and whenever the server cannot export changes only, e.g. after a
+restart. An interval without changes, or whose content has the same hash as
+the previous backup, is not stored.
+
+Exports are streamed straight to disk (one user per line, gzip-compressed by
+default), so a backup uses constant memory whatever the database size.
+Restoring reads ndjson backups line by line but loads each json backup
+whole, so use the default ndjson format for large databases.
+
+Usage:
+    python backup_db.py                          # run the backup service
+    python backup_db.py restore -o db.json       # rebuild db.json from the latest chain
+    python backup_db.py restore --at 20250101_120000
 """
 
+import argparse
+import gzip
+import hashlib
+import io
+import json
 import os
+import re
 import time
-import json
+import zlib
 import requests
 from datetime import datetime
-from typing import Optional
-from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd backups need `pip install zstandard`
+    zstandard = None
 
 # Configuration
 BACKUP_DIR = "db_backups"
 BACKUP_INTERVAL = 60  # seconds
 API_BASE_URL = "http://localhost:8000"  # Update this if your API is running on a different URL
 DB_EXPORT_PASSWORD = os.getenv("DB_PWD")  # Get password from environment variable
+BACKUP_FORMAT = os.getenv("BACKUP_FORMAT", "ndjson")  # "ndjson" or "json"
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "gzip")  # "gzip", "zstd" or "none"
+BACKUP_FULL_EVERY = int(os.getenv("BACKUP_FULL_EVERY", "60"))  # backups per chain
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# Exports up to this size are checked for records; larger ones always hold some
+SMALL_EXPORT_BYTES = 1024
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+# Generation, content hash and kind of the last stored backup
+STATE_FILE = "backup_state.json"
+# db_backup_<timestamp>[.full|.delta].<format>[.gz|.zst]; files without a kind are full backups
+BACKUP_NAME = re.compile(r"^db_backup_(\d{8}_\d{6}(?:_\d{6})?)(?:\.(full|delta))?\.(json|ndjson)(\.gz|\.zst)?$")
+
+def load_state() -> Dict[str, Any]:
+    """Load the state of the current backup chain."""
+    try:
+        with open(os.path.join(BACKUP_DIR, STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state: Dict[str, Any]) -> None:
+    """Save the state of the current backup chain."""
+    path = os.path.join(BACKUP_DIR, STATE_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+def make_decompressor(compression: str) -> Optional[Any]:
+    """Create a streaming decompressor for the export's compression, or None if it is not compressed."""
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd backups need the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+def has_records(content: bytes, fmt: str) -> bool:
+    """Check whether a (small, uncompressed) export holds any user or global record.
 
-# Ensure backup directory exists
-os.makedirs(BACKUP_DIR, exist_ok=True)
+    An export without changes is empty in ndjson but {"users":{}} in json.
+    """
+    if fmt == "ndjson":
+        return bool(content.strip())
+    db = json.loads(content)
+    return "_global" in db or bool(db.get("users"))
 
-def fetch_database() -> Optional[dict]:
-    """Fetch the database from the /exportdb endpoint."""
+def download_backup(state: Dict[str, Any]) -> str:
+    """Stream the changes since the last backup (or everything) into a timestamped file.
+
+    Args:
+        state: State of the current backup chain, updated in place
+
+    Returns:
+        str: Path of the backup, or "" if nothing was stored
+    """
     if not DB_EXPORT_PASSWORD:
         print("Error: DB_PWD environment variable is not set")
-        return None
-    
-    try:
-        response = requests.get(
-            f"{API_BASE_URL}/exportdb",
-            params={"password": DB_EXPORT_PASSWORD},
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching database: {e}")
-        return None
-
-def save_backup(data: dict) -> str:
-    """Save the database to a JSON file with a timestamp."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"db_backup_{timestamp}.json"
-    filepath = os.path.join(BACKUP_DIR, filename)
-    
+        return ""
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    params = {
+        "password": DB_EXPORT_PASSWORD,
+        "format": BACKUP_FORMAT,
+        "compression": BACKUP_COMPRESSION,
+    }
+    if state.get("generation") and state.get("since_full", 0) < BACKUP_FULL_EVERY:
+        params["since"] = state["generation"]
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    # Only complete downloads get a backup's name
+    temp_path = os.path.join(BACKUP_DIR, f"db_backup_{timestamp}.part")
+    # The hash covers the uncompressed content, which does not depend on the compression
+    digest = hashlib.sha256()
+    size = 0
+    # The content of a small export, checked for records once complete
+    head = []
+
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        return filepath
-    except Exception as e:
-        print(f"Error saving backup: {e}")
+        decompressor = make_decompressor(BACKUP_COMPRESSION)
+        with requests.get(f"{API_BASE_URL}/exportdb", params=params, stream=True, timeout=10) as response:
+            response.raise_for_status()
+            incremental = response.headers.get("X-DB-Incremental") == "true"
+            generation = response.headers.get("X-DB-Generation")
+            with open(temp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+                    content = decompressor.decompress(chunk) if decompressor else chunk
+                    digest.update(content)
+                    size += len(content)
+                    if size <= SMALL_EXPORT_BYTES:
+                        head.append(content)
+        empty = size <= SMALL_EXPORT_BYTES and not has_records(b"".join(head), BACKUP_FORMAT)
+    except (requests.exceptions.RequestException, OSError, RuntimeError, zlib.error, ValueError) as e:
+        print(f"Error downloading backup: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         return ""
 
-def main():
+    kind = "delta" if incremental else "full"
+    content_hash = digest.hexdigest()
+    # A delta without records changes nothing; so does content equal to the previous
+    # backup of the same kind (an identical delta re-applies the same records)
+    if empty or (content_hash == state.get("hash") and kind == state.get("kind")):
+        os.remove(temp_path)
+        state["generation"] = generation
+        save_state(state)
+        print("No changes since the last backup")
+        return ""
+
+    filename = f"db_backup_{timestamp}.{kind}.{BACKUP_FORMAT}{COMPRESSION_SUFFIXES.get(BACKUP_COMPRESSION, '')}"
+    filepath = os.path.join(BACKUP_DIR, filename)
+    os.replace(temp_path, filepath)
+    state.update(
+        generation=generation,
+        hash=content_hash,
+        kind=kind,
+        since_full=state.get("since_full", 0) + 1 if incremental else 0,
+    )
+    save_state(state)
+    return filepath
+
+def list_backups(directory: str) -> List[Tuple[str, str, str]]:
+    """List the backups in a directory, oldest first.
+
+    Returns:
+        List of (timestamp, kind, path) with kind "full" or "delta"
+    """
+    backups = []
+    for name in os.listdir(directory):
+        match = BACKUP_NAME.match(name)
+        if match:
+            backups.append((match.group(1), match.group(2) or "full", os.path.join(directory, name)))
+    return sorted(backups)
+
+def open_backup(path: str) -> io.BufferedIOBase:
+    """Open a backup file for reading its uncompressed content."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstd backups need the zstandard package (pip install zstandard)")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+def read_backup(path: str) -> Iterator[Dict[str, Any]]:
+    """Read the records of a backup: {"_global": ...} and {"user_id": ..., "data": ...}.
+
+    ndjson backups are read one line at a time; a json backup is decoded whole.
+    """
+    with open_backup(path) as f:
+        if ".ndjson" in os.path.basename(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        db = json.load(f)
+    if "_global" in db:
+        yield {"_global": db["_global"]}
+    for user_id, data in db.get("users", {}).items():
+        yield {"user_id": user_id, "data": data}
+
+def restore(output: str, at: Optional[str] = None, directory: Optional[str] = None) -> str:
+    """Rebuild a db.json from the latest full backup and the incremental backups after it.
+
+    Args:
+        output: Path of the db.json to write
+        at: Restore the state as of this timestamp (YYYYmmdd_HHMMSS); defaults to the latest
+        directory: Backup directory; defaults to BACKUP_DIR
+
+    Returns:
+        str: A summary of the restored chain
+
+    Raises:
+        RuntimeError: If there is no full backup to start from
+    """
+    backups = [
+        backup for backup in list_backups(directory or BACKUP_DIR)
+        if at is None or backup[0][:15] <= at
+    ]
+    starts = [index for index, (_, kind, _) in enumerate(backups) if kind == "full"]
+    if not starts:
+        raise RuntimeError("No full backup found")
+    chain = backups[starts[-1]:]
+
+    db: Dict[str, Any] = {"_global": {"levels": {}}, "users": {}}
+    for _, _, path in chain:
+        for record in read_backup(path):
+            if "_global" in record:
+                db["_global"] = record["_global"]
+            else:
+                db["users"][record["user_id"]] = record["data"]
+
+    with open(f"{output}.tmp", "w", encoding="utf-8") as f:
+        json.dump(db, f, separators=(",", ":"))
+    os.replace(f"{output}.tmp", output)
+    return (f"Restored {len(db['users'])} users from {os.path.basename(chain[0][2])} "
+            f"and {len(chain) - 1} incremental backups")
+
+def run_service():
     print(f"Starting database backup service. Backing up every {BACKUP_INTERVAL} seconds.")
     print(f"Backups will be saved to: {os.path.abspath(BACKUP_DIR)}")
-    
+
     if not DB_EXPORT_PASSWORD:
         print("Warning: DB_PWD environment variable is not set. Backups will fail.")
-    
+
+    state = load_state()
     try:
         while True:
             print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Fetching database...")
-            db_data = fetch_database()
-            
-            if db_data:
-                backup_path = save_backup(db_data)
-                if backup_path:
-                    print(f"Backup saved to: {backup_path}")
-                else:
-                    print("Failed to save backup")
-            else:
-                print("Failed to fetch database")
-            
+            backup_path = download_backup(state)
+
+            if backup_path:
+                print(f"Backup saved to: {backup_path}")
+
             # Wait for the next backup interval
             time.sleep(BACKUP_INTERVAL)
     except KeyboardInterrupt:
@@ -83,5 +269,22 @@ def main():
     except Exception as e:
         print(f"\nFatal error: {e}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Back up the database from /exportdb, or restore a backup.")
+    commands = parser.add_subparsers(dest="command")
+    restore_parser = commands.add_parser("restore", help="rebuild a db.json from the backups")
+    restore_parser.add_argument("-o", "--output", default="db.json", help="db.json to write")
+    restore_parser.add_argument("--at", help="restore the state as of YYYYmmdd_HHMMSS")
+    restore_parser.add_argument("--dir", default=BACKUP_DIR, help="backup directory")
+    args = parser.parse_args()
+
+    if args.command == "restore":
+        try:
+            print(restore(args.output, args.at, args.dir))
+        except (RuntimeError, OSError, ValueError) as e:
+            parser.exit(1, f"Restore failed: {e}\n")
+    else:
+        run_service()
+
 if __name__ == "__main__":
     main()
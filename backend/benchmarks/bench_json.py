@@ -0,0 +1,94 @@
+"""
+JSON Micro-benchmark
+
+Compares the standard library with orjson for the database file (the
+previous indented format, compact stdlib and compact orjson) and for
+rendering a /submit response and a 100-entry leaderboard page, on a
+synthetic database.
+
+Run from the backend directory:
+    python -m benchmarks.bench_json
+    python -m benchmarks.bench_json --users 100000
+"""
+import argparse
+import json
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastapi.responses import JSONResponse
+
+import serialization
+from benchmarks.run import generate_db
+from responses import FastJSONResponse
+
+
+def measure(func: Callable[[], Any], number: int) -> float:
+    """Best time of one call in milliseconds."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1000
+
+
+def submit_response() -> Dict[str, Any]:
+    """A /submit response of a user at level 12."""
+    levels = [
+        {'level': level, 'name': f'Level {level}', 'description': 'x' * 80,
+         'attempts': 3, 'last_attempt': '2025-01-01T00:00:00'}
+        for level in range(1, 13)
+    ]
+    return {
+        'user_id': 'user42',
+        'current_level': {'level': 12, 'name': 'Level 12', 'description': 'x' * 80, 'extras': {}},
+        'passed_levels': levels[:11],
+        'failed_levels': levels[11:],
+        'message': 'Password verification failed',
+    }
+
+
+def leaderboard_page(db: Dict[str, Any]) -> Dict[str, Any]:
+    """A /leaderboard response with 100 entries."""
+    return {
+        'leaderboard': [
+            {'user_id': user_id, 'rank': rank, 'score': float(user['current_level'] * 100),
+             'current_level': user['current_level']}
+            for rank, (user_id, user) in enumerate(list(db['users'].items())[:100], start=1)
+        ],
+        'last_updated': '2025-01-01T00:00:00',
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000, help='users in the database')
+    parser.add_argument('--number', type=int, default=5, help='database calls per measurement')
+    args = parser.parse_args()
+
+    if serialization.orjson is None:
+        parser.error('orjson is not installed (pip install orjson)')
+    orjson = serialization.orjson
+
+    db = generate_db(args.users)
+    indented = json.dumps(db, indent=2).encode()
+    compact = orjson.dumps(db)
+    submit, page = submit_response(), leaderboard_page(db)
+
+    rows: List[Tuple[str, float, float]] = [
+        ('db encode (indent=2)', measure(lambda: json.dumps(db, indent=2), args.number),
+         measure(lambda: orjson.dumps(db), args.number)),
+        ('db encode (compact)', measure(lambda: json.dumps(db, separators=(',', ':')), args.number),
+         measure(lambda: orjson.dumps(db), args.number)),
+        ('db decode', measure(lambda: json.loads(compact), args.number),
+         measure(lambda: orjson.loads(compact), args.number)),
+        ('submit response', measure(lambda: JSONResponse(submit), 2000),
+         measure(lambda: FastJSONResponse(submit), 2000)),
+        ('leaderboard page', measure(lambda: JSONResponse(page), 2000),
+         measure(lambda: FastJSONResponse(page), 2000)),
+    ]
+
+    print(f"{args.users} users: db.json {len(indented) / 1e6:.1f} MB indented, "
+          f"{len(compact) / 1e6:.1f} MB compact")
+    print(f"{'operation':<22} {'stdlib ms':>10} {'orjson ms':>10} {'speedup':>8}")
+    for name, stdlib, fast in rows:
+        print(f"{name:<22} {stdlib:>10.3f} {fast:>10.3f} {stdlib / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
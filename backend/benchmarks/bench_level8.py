@@ -0,0 +1,58 @@
+"""
+Level 8 Micro-benchmark
+
+Compares the atomic-number scanner of Level 8 with the original
+character-by-character implementation on random 1-10 KB passwords.
+
+Run from the backend directory:
+    python -m benchmarks.bench_level8
+"""
+import argparse
+import random
+import string
+import timeit
+
+from levels.level_8 import ELEMENTS, atomic_number_sum
+
+
+def legacy_atomic_number_sum(password: str) -> int:
+    """The original Level 8 scan, without its print() call."""
+    elements = dict(ELEMENTS)
+    elements_found = []
+    i = 0
+    while i < len(password):
+        if i + 2 <= len(password) and password[i:i+2] in elements:
+            elements_found.append(password[i:i+2])
+            i += 2
+        elif password[i] in elements:
+            elements_found.append(password[i])
+            i += 1
+        else:
+            i += 1
+    return sum(elements[symbol] for symbol in elements_found)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 4096, 10240],
+                        help='password sizes in characters')
+    parser.add_argument('--number', type=int, default=200, help='calls per measurement')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    alphabet = string.ascii_letters + string.digits + string.punctuation
+    print(f"{'size':>8} {'legacy us':>10} {'new us':>10} {'speedup':>8}")
+    for size in args.sizes:
+        password = ''.join(rng.choice(alphabet) for _ in range(size))
+        assert atomic_number_sum(password) == legacy_atomic_number_sum(password)
+
+        legacy = min(timeit.repeat(lambda: legacy_atomic_number_sum(password),
+                                   number=args.number, repeat=5)) / args.number
+        new = min(timeit.repeat(lambda: atomic_number_sum(password),
+                                number=args.number, repeat=5)) / args.number
+        print(f"{size:>8} {legacy * 1e6:>10.1f} {new * 1e6:>10.1f} {legacy / new:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
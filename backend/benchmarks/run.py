@@ -0,0 +1,322 @@
+"""
+Benchmark Runner
+
+Measures the hot paths of the API on synthetic databases:
+- startup: importing main (loading the database, validators and leaderboard)
+- validate: LevelManager.apply_submission() called directly, without I/O
+- submit: POST /submit through TestClient, including persistence
+- leaderboard: GET /leaderboard, and with a matching If-None-Match (304)
+- rank: GET /leaderboard/{user_id}
+
+Each database size runs in a fresh interpreter against its own temporary
+db.json, and every scenario reports p50/p95/p99 latency and throughput.
+
+Run from the backend directory:
+    python -m benchmarks.run                                # 1k, 10k and 100k users
+    python -m benchmarks.run --users 1000 --requests 100    # quick run
+    python -m benchmarks.run --save-baseline                # write benchmarks/baseline.json
+    python -m benchmarks.run --compare                      # exit 1 on p95 regressions
+
+The baseline records the backend, parameters and settings it was measured
+with; --compare refuses (exit 2) to compare runs made with different ones,
+and warns when only the Python version or platform differ.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import serialization
+from storage import DEFAULT_PATHS, create_storage
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, 'benchmarks', 'baseline.json')
+
+# Literals some levels look for, mixed into realistic submissions
+FRAGMENTS = [
+    'welcome123', 'GFC6+H8', '000000000019d6689c085ae165831e93', 'exactlyaggron',
+    'mitochondria', '1000101', '3.14159', 'MAZE_COMPLETED', 'Indonesia', 'zerodayctf',
+    'bypass@)@%', 'IrW', '💀', 'A', '!', '9',
+]
+MAX_LEVEL = 21
+# Environment variables that change the measured numbers, recorded in the baseline
+SETTINGS = (
+    'DB_CACHE', 'DB_DURABILITY', 'DB_FLUSH_INTERVAL', 'DB_FLUSH_BATCH', 'DB_COMPACT_INTERVAL',
+    'DB_COMPACT_BYTES', 'VALIDATION_WORKERS', 'VALIDATION_CACHE_SIZE', 'JSON_BACKEND',
+)
+# Meta fields that must match for results to be comparable; others only warn
+COMPARABLE = ('backend', 'requests', 'budget', 'seed', 'json_backend', 'settings')
+
+
+def make_user(rng: random.Random, registered_at: datetime) -> Dict[str, Any]:
+    """Create a user record at a random point of the game."""
+    current_level = rng.randint(1, MAX_LEVEL)
+    passed = list(range(1, current_level))
+    attempt = (registered_at + timedelta(minutes=rng.randint(1, 10000))).isoformat()
+    return {
+        'current_level': current_level,
+        'passed_levels': passed,
+        'failed_levels': [current_level] if rng.random() < 0.5 else [],
+        'level_states': {
+            str(level): {'attempts': rng.randint(1, 20), 'last_attempt': attempt}
+            for level in range(1, current_level + 1)
+        },
+        'previous_passed_levels': [],
+        'initialized': True,
+        'registered_at': registered_at.isoformat(),
+        'last_updated': attempt,
+    }
+
+
+def generate_db(users: int, seed: int = 0) -> Dict[str, Any]:
+    """Generate a database with the given number of users.
+
+    Args:
+        users: Number of users
+        seed: Random seed, so every run sees the same database
+
+    Returns:
+        dict: Database in the db.json format
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return {
+        '_global': {'levels': {}},
+        'users': {
+            f'user{i}': make_user(rng, start + timedelta(seconds=rng.randint(0, 90 * 86400)))
+            for i in range(users)
+        },
+    }
+
+
+def make_password(rng: random.Random) -> str:
+    """Create a submission: mostly short attempts, some with level literals, a few 1-10 KB."""
+    kind = rng.random()
+    if kind < 0.5:
+        length = rng.randint(8, 24)
+        return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+    if kind < 0.9:
+        return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(2, 12)))
+    filler = ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(rng.randint(1024, 10240)))
+    return rng.choice(FRAGMENTS) + filler + rng.choice(FRAGMENTS)
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Compute latency percentiles (ms) and throughput (ops/s)."""
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(50), 3),
+        'p95_ms': round(percentile(95), 3),
+        'p99_ms': round(percentile(99), 3),
+        'ops_per_s': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def measure(operations: List[Any], func, budget: float) -> Dict[str, float]:
+    """Call func once per operation and summarize the latencies.
+
+    Stops early once budget seconds have passed, so slow scenarios on large
+    databases still finish; the reported count shows how many ran.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for operation in operations:
+        t0 = time.perf_counter()
+        func(operation)
+        now = time.perf_counter()
+        latencies.append(now - t0)
+        if now - started > budget:
+            break
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_worker(users: int, requests: int, seed: int, budget: float) -> Dict[str, Dict[str, float]]:
+    """Run all scenarios against the database configured by DB_PATH.
+
+    Must run in a fresh interpreter: main opens the database on import.
+    """
+    import copy
+
+    started = time.perf_counter()
+    import main
+    from fastapi.testclient import TestClient
+    startup = time.perf_counter() - started
+
+    main.limiter.enabled = False
+    rng = random.Random(seed)
+    user_ids = [f'user{rng.randrange(users)}' for _ in range(requests)]
+    passwords = [make_password(rng) for _ in range(requests)]
+    results = {'startup': summarize([startup], startup)}
+
+    records = {user_id: main.storage.get_user(user_id) for user_id in set(user_ids)}
+    results['validate'] = measure(
+        list(zip(user_ids, passwords)),
+        lambda op: main.level_manager.apply_submission(op[0], copy.deepcopy(records[op[0]]), op[1]),
+        budget
+    )
+
+    tokens = {user_id: main.create_access_token(user_id) for user_id in set(user_ids)}
+    with TestClient(main.app) as client:
+        def submit(op: Tuple[str, str]) -> None:
+            response = client.post('/submit', json={'auth_token': tokens[op[0]], 'password': op[1]})
+            assert response.status_code == 200, response.text
+
+        results['submit'] = measure(list(zip(user_ids, passwords)), submit, budget)
+
+        results['leaderboard'] = measure(
+            range(requests), lambda _: client.get('/leaderboard', params={'limit': 100}), budget
+        )
+        etag = client.get('/leaderboard', params={'limit': 100}).headers['etag']
+        results['leaderboard_304'] = measure(
+            range(requests),
+            lambda _: client.get('/leaderboard', params={'limit': 100}, headers={'If-None-Match': etag}),
+            budget
+        )
+        results['rank'] = measure(user_ids, lambda user_id: client.get(f'/leaderboard/{user_id}'), budget)
+    return results
+
+
+def run_size(users: int, requests: int, seed: int, backend: str,
+             budget: float) -> Dict[str, Dict[str, float]]:
+    """Generate a database and run the worker for it in a subprocess."""
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmp:
+        db_path = os.path.join(tmp, os.path.basename(DEFAULT_PATHS[backend]))
+        storage = create_storage(backend, db_path, cache=False)
+        storage.replace_all(generate_db(users, seed))
+        storage.close()
+
+        env = dict(os.environ, DB_BACKEND=backend, DB_PATH=db_path,
+                   LOG_LEVEL='ERROR', LOG_LEVELS='access=WARNING')
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', '--worker',
+             '--users', str(users), '--requests', str(requests), '--seed', str(seed),
+             '--budget', str(budget)],
+            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_meta(args: argparse.Namespace) -> Dict[str, Any]:
+    """Describe what a run was measured with."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'requests': args.requests,
+        'budget': args.budget,
+        'seed': args.seed,
+        'json_backend': serialization.BACKEND,
+        'settings': {name: os.environ[name] for name in SETTINGS if name in os.environ},
+    }
+
+
+def compare_meta(meta: Dict[str, Any], baseline_meta: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Compare the conditions of a run with those of the baseline.
+
+    Returns:
+        Tuple of (mismatches that make the results incomparable, warnings)
+    """
+    mismatches, warnings = [], []
+    for key in meta:
+        if key in baseline_meta and meta[key] != baseline_meta[key]:
+            line = f"{key}: {meta[key]!r} vs baseline {baseline_meta[key]!r}"
+            (mismatches if key in COMPARABLE else warnings).append(line)
+        elif key not in baseline_meta and key in COMPARABLE:
+            warnings.append(f"{key}: not recorded in the baseline")
+    return mismatches, warnings
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the scenarios whose p95 latency regressed beyond the tolerance."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, stats in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if base and base['p95_ms'] > 0 and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{size} users / {name}: p95 {stats['p95_ms']:.3f} ms vs baseline {base['p95_ms']:.3f} ms"
+                )
+    return regressions
+
+
+def print_table(users: int, scenarios: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{users} users")
+    print(f"{'scenario':<16} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10}")
+    for name, stats in scenarios.items():
+        print(f"{name:<16} {stats['count']:>6} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+              f"{stats['p99_ms']:>10.3f} {stats['ops_per_s']:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the submission and leaderboard hot paths.')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='database sizes to benchmark')
+    parser.add_argument('--requests', type=int, default=200, help='operations per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=30.0,
+                        help='seconds after which a scenario stops early')
+    parser.add_argument('--backend', default=os.getenv('DB_BACKEND', 'json'), choices=['json', 'sqlite', 'journal'])
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true', help='exit 1 if p95 regressed against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown before --compare fails (0.25 = 25%%)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.users[0], args.requests, args.seed, args.budget)))
+        return
+
+    results = {}
+    for users in args.users:
+        results[str(users)] = run_size(users, args.requests, args.seed, args.backend, args.budget)
+        print_table(users, results[str(users)])
+
+    meta = run_meta(args)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {**meta, 'created_at': datetime.utcnow().isoformat()},
+                'results': results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatches, warnings = compare_meta(meta, baseline.get('meta', {}))
+        for line in warnings:
+            print(f"WARNING {line}")
+        missing = [size for size in results if size not in baseline['results']]
+        if missing:
+            print(f"WARNING no baseline for {', '.join(missing)} users")
+        if mismatches:
+            for line in mismatches:
+                print(f"MISMATCH {line}")
+            print("\nThe baseline was measured under other conditions; rerun with matching "
+                  "options or record a new baseline with --save-baseline")
+            sys.exit(2)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
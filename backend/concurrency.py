@@ -0,0 +1,86 @@
+"""
+Concurrency Module
+
+This module provides the primitives the API handlers use to run safely under
+concurrent requests:
+- UserLocks serializes requests of the same user with per-user asyncio locks
+- StoreWriter funnels every write to the shared storage through one thread
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict
+
+from storage import BaseStorage
+
+class UserLocks:
+    """Per-user asyncio locks.
+
+    Requests for the same user run one after another while requests for
+    different users proceed in parallel. Locks are created on demand and
+    dropped as soon as nobody holds or waits for them.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, user_id: str) -> AsyncIterator[None]:
+        """Hold the lock of a user for the duration of the block.
+
+        Args:
+            user_id: The user whose lock to acquire
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        self._users[user_id] = self._users.get(user_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[user_id] -= 1
+            if not self._users[user_id]:
+                del self._users[user_id]
+                del self._locks[user_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class StoreWriter:
+    """Single writer for the shared storage.
+
+    All writes are executed in order on one dedicated thread, so they never
+    block the event loop and never race each other on the database file.
+    """
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a write function on the writer thread and wait for it.
+
+        Args:
+            func: The function to run
+            *args: Arguments passed to the function
+
+        Returns:
+            The function's return value
+        """
+        return await asyncio.wrap_future(self._executor.submit(func, *args))
+
+    async def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        """Create or replace a user's record.
+
+        Args:
+            user_id: The user's ID
+            data: The full user record
+        """
+        await self.run(self.storage.put_user, user_id, data)
+
+    def drain(self) -> None:
+        """Block until every write submitted so far has completed."""
+        self._executor.submit(lambda: None).result()
@@ -0,0 +1,159 @@
+"""
+Export Module
+
+This module streams the database for /exportdb without building the
+encoded document in memory. The caller passes a snapshot taken with
+storage.export_snapshot() (for the in-memory backends this only copies the
+list of user records, not the records themselves); it is encoded a few users
+at a time and sent in chunks of about CHUNK_BYTES.
+
+Two formats are available:
+- json: the db.json layout, {"_global": {...}, "users": {...}}
+- ndjson: a first line {"_global": {...}} followed by one line
+  {"user_id": ..., "data": {...}} per user
+
+Either can be compressed with gzip or, when the zstandard package is
+installed (pip install zstandard), with zstd.
+
+An incremental export (storage.export_snapshot(since=...)) has the same
+layout but only contains the users changed since the given generation, and
+'_global' only if it changed.
+"""
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import serialization
+from storage import empty_db
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+FORMATS = ('json', 'ndjson')
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+# Encoded bytes collected before a chunk is sent
+CHUNK_BYTES = 64 * 1024
+# Exports are compressed by the server for every backup: favour speed
+# (level 1 is ~3x faster than the default 6 for ~30% larger files)
+GZIP_LEVEL = 1
+
+_MEDIA_TYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+_COMPRESSED = {'gzip': ('application/gzip', '.gz'), 'zstd': ('application/zstd', '.zst')}
+
+
+def content_info(fmt: str, compression: str) -> Tuple[str, str]:
+    """Get the media type and file name of an export.
+
+    Args:
+        fmt: "json" or "ndjson"
+        compression: "none", "gzip" or "zstd"
+
+    Returns:
+        Tuple of (media type, file name)
+    """
+    if compression in _COMPRESSED:
+        media_type, suffix = _COMPRESSED[compression]
+        return media_type, f"db.{fmt}{suffix}"
+    return _MEDIA_TYPES[fmt], f"db.{fmt}"
+
+
+def _chunked(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    """Join small pieces into chunks of about CHUNK_BYTES."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _json_pieces(db: Dict[str, Any]) -> Iterator[bytes]:
+    if '_global' in db:
+        yield b'{"_global":' + serialization.dumps(db['_global']) + b',"users":{'
+    else:
+        yield b'{"users":{'
+    separator = b''
+    for user_id, data in db['users'].items():
+        # '"user_id":{...}' without the enclosing braces
+        yield separator + serialization.dumps({user_id: data})[1:-1]
+        separator = b','
+    yield b'}}'
+
+
+def _ndjson_pieces(db: Dict[str, Any]) -> Iterator[bytes]:
+    if '_global' in db:
+        yield serialization.dumps({'_global': db['_global']}) + b'\n'
+    for user_id, data in db['users'].items():
+        yield serialization.dumps({'user_id': user_id, 'data': data}) + b'\n'
+
+
+def _compress(chunks: Iterable[bytes], compressor: Any) -> Iterator[bytes]:
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(db: Dict[str, Any], fmt: str = 'json', compression: str = 'none') -> Iterator[bytes]:
+    """Encode a database snapshot as a stream of chunks.
+
+    Args:
+        db: Database content in the db.json layout, e.g. from storage.export_snapshot()
+        fmt: "json" or "ndjson"
+        compression: "none", "gzip" or "zstd"
+
+    Returns:
+        Iterator over the encoded (and compressed) chunks
+
+    Raises:
+        ValueError: If the format or compression is unknown or zstd is not installed
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r} (expected 'json' or 'ndjson')")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression!r} (expected 'none', 'gzip' or 'zstd')")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression is not available (pip install zstandard)")
+
+    pieces = _json_pieces(db) if fmt == 'json' else _ndjson_pieces(db)
+    chunks = _chunked(pieces)
+    if compression == 'gzip':
+        # wbits=31 writes a gzip header, so the output is a regular .gz file
+        return _compress(chunks, zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31))
+    if compression == 'zstd':
+        return _compress(chunks, zstandard.ZstdCompressor().compressobj())
+    return chunks
+
+
+def read_ndjson(lines: Iterable[bytes]) -> Dict[str, Any]:
+    """Rebuild the db.json layout from an NDJSON export.
+
+    Args:
+        lines: The lines of the (decompressed) export
+
+    Returns:
+        Dict with the '_global' and 'users' sections
+
+    Raises:
+        ValueError: If a line is neither the '_global' header nor a user
+    """
+    db = empty_db()
+    for line in lines:
+        if not line.strip():
+            continue
+        record = serialization.loads(line)
+        if '_global' in record:
+            db['_global'] = record['_global']
+        elif 'user_id' in record:
+            db['users'][record['user_id']] = record.get('data', {})
+        else:
+            raise ValueError(f"Unexpected export line: {line[:80]!r}")
+    return db
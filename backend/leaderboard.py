@@ -0,0 +1,365 @@
+"""
+Leaderboard Module
+
+This module keeps the global ranking of all users in a sorted index that is
+updated incrementally whenever a user's record changes, instead of scoring
+and sorting every user on each leaderboard request.
+
+LeaderboardBroadcaster pushes changes of the ranking to streaming clients.
+"""
+import asyncio
+import json
+import secrets
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import serialization
+
+# Sort key: (-score, last_updated, user_id); ascending order is rank order
+RankKey = Tuple[int, str, str]
+
+MAX_TIMESTAMP = datetime.max.isoformat()
+
+# Distinct (limit, offset) pages kept per generation
+MAX_CACHED_PAGES = 256
+
+
+class LeaderboardSnapshot(NamedTuple):
+    """A serialized leaderboard page for one generation of the index."""
+    etag: str
+    body: bytes
+    last_updated: str
+
+
+def compute_score(user_data: Dict[str, Any]) -> Tuple[int, int]:
+    """Calculate a user's score.
+
+    Args:
+        user_data: The user's record
+
+    Returns:
+        Tuple of (score, current_level)
+    """
+    passed_levels = user_data.get('passed_levels', [])
+    current_level = user_data.get('current_level', 1)  # Default to level 1 if not set
+
+    # Ensure passed_levels is a list
+    if not isinstance(passed_levels, list):
+        passed_levels = []
+
+    # Ensure current_level is an integer
+    try:
+        current_level = int(current_level)
+    except (ValueError, TypeError):
+        current_level = 1
+
+    # Simple scoring: 100 points per level completed + 10 points per level in current level
+    return (len(passed_levels) * 100) + (current_level * 10), current_level
+
+
+class LeaderboardIndex:
+    """Sorted ranking of all users.
+
+    Users are kept in a list sorted by (-score, last_updated, user_id), so a
+    rank lookup is a binary search and a page is a slice. The generation
+    counter increases every time the ranking changes; serialized pages are
+    cached until the next change.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[RankKey] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._snapshots: Dict[Tuple[int, int], LeaderboardSnapshot] = {}
+        # Distinguishes generations of different server processes in ETags
+        self.epoch = secrets.token_hex(4)
+        self.generation = 0
+        self.updated_at = datetime.utcnow().isoformat()
+
+    def _changed(self) -> None:
+        """Start a new generation after the ranking changed."""
+        self.generation += 1
+        self.updated_at = datetime.utcnow().isoformat()
+        self._snapshots = {}
+
+    def rebuild(self, users: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Replace the whole index.
+
+        Args:
+            users: (user_id, record) pairs of all users
+        """
+        entries = {}
+        for user_id, user_data in users:
+            if isinstance(user_data, dict):
+                entries[user_id] = self._make_entry(user_id, user_data)
+
+        with self._lock:
+            self._entries = entries
+            self._keys = sorted(entry['key'] for entry in entries.values())
+            self._changed()
+
+    def _make_entry(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        score, current_level = compute_score(user_data)
+        last_updated = user_data.get('registered_at')
+        return {
+            # Users without a registration time rank after everyone they tie with
+            'key': (-score, str(last_updated or MAX_TIMESTAMP), user_id),
+            'user_id': user_id,
+            'score': score,
+            # Shown as n-1 for consistent display, min 0
+            'current_level': max(0, current_level - 1),
+            'last_updated': last_updated,
+        }
+
+    def update(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        """Insert or reposition a user after their record changed.
+
+        Args:
+            user_id: The user's ID
+            user_data: The user's new record
+
+        Returns:
+            bool: True if the user's leaderboard entry changed
+        """
+        entry = self._make_entry(user_id, user_data)
+        with self._lock:
+            old = self._entries.get(user_id)
+            if old is not None:
+                if old == entry:
+                    return False
+                del self._keys[bisect_left(self._keys, old['key'])]
+            insort(self._keys, entry['key'])
+            self._entries[user_id] = entry
+            self._changed()
+            return True
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """Get a user's 1-based rank, or None if the user isn't ranked."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return bisect_left(self._keys, entry['key']) + 1
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a user's leaderboard entry including their rank."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._public(entry, bisect_left(self._keys, entry['key']) + 1)
+
+    def page(self, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a slice of the leaderboard in rank order.
+
+        Args:
+            limit: Maximum number of entries to return
+            offset: Number of entries to skip
+
+        Returns:
+            List of leaderboard entries
+        """
+        offset = max(0, offset)
+        with self._lock:
+            keys = self._keys[offset:offset + max(0, limit)]
+            return [
+                self._public(self._entries[key[2]], offset + i)
+                for i, key in enumerate(keys, 1)
+            ]
+
+    def snapshot(self, limit: int, offset: int = 0) -> LeaderboardSnapshot:
+        """Get a leaderboard page serialized as a /leaderboard response body.
+
+        The page is serialized once per generation and reused until the
+        ranking changes.
+
+        Args:
+            limit: Maximum number of entries to return
+            offset: Number of entries to skip
+
+        Returns:
+            LeaderboardSnapshot with the ETag, JSON body and snapshot time
+        """
+        offset = max(0, offset)
+        with self._lock:
+            snapshot = self._snapshots.get((limit, offset))
+            if snapshot is not None:
+                return snapshot
+
+            body = serialization.dumps({
+                'leaderboard': [
+                    {
+                        'user_id': entry['user_id'],
+                        'rank': entry['rank'],
+                        'score': float(entry['score']),
+                        'current_level': entry['current_level']
+                    }
+                    for entry in self.page(limit, offset)
+                ],
+                'last_updated': self.updated_at
+            })
+            snapshot = LeaderboardSnapshot(
+                etag=f'"{self.epoch}-{self.generation}-{limit}-{offset}"',
+                body=body,
+                last_updated=self.updated_at,
+            )
+            if len(self._snapshots) < MAX_CACHED_PAGES:
+                self._snapshots[(limit, offset)] = snapshot
+            return snapshot
+
+    @staticmethod
+    def _public(entry: Dict[str, Any], rank: int) -> Dict[str, Any]:
+        return {
+            'user_id': entry['user_id'],
+            'rank': rank,
+            'score': entry['score'],
+            'current_level': entry['current_level'],
+            'last_updated': entry['last_updated'],
+        }
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LeaderboardBroadcaster:
+    """Fan-out of leaderboard changes to server-sent event streams.
+
+    Every stream first receives a "snapshot" event with the top `limit`
+    rows and then "delta" events containing only the rows whose rank, score
+    or level changed plus the users that dropped out of the page. Bursts of
+    changes are coalesced so each stream gets at most max_rate deltas per
+    second.
+    """
+
+    def __init__(self, index: LeaderboardIndex, max_rate: float = 2.0,
+                 heartbeat: float = 15.0, queue_size: int = 16):
+        """Create a broadcaster for a leaderboard index.
+
+        Args:
+            index: The leaderboard index to watch
+            max_rate: Maximum number of delta events per second
+            heartbeat: Seconds between keep-alive comments on idle streams
+            queue_size: Pending events per stream before it is resynced
+        """
+        self.index = index
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+
+        # Subscriber queues grouped by page size, with the rows last sent
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._last_rows: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def notify(self) -> None:
+        """Signal that the leaderboard changed. Safe to call from any thread."""
+        loop, changed = self._loop, self._changed
+        if not self._subscribers or loop is None or changed is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                changed.set()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(changed.set)
+
+    def _rows(self, limit: int) -> Dict[str, Dict[str, Any]]:
+        return {
+            entry['user_id']: {
+                'user_id': entry['user_id'],
+                'rank': entry['rank'],
+                'score': float(entry['score']),
+                'current_level': entry['current_level']
+            }
+            for entry in self.index.page(limit)
+        }
+
+    def _ensure_running(self) -> None:
+        """Start the publisher task on the current event loop."""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._changed = asyncio.Event()
+        self._task = loop.create_task(self._publish_loop())
+
+    async def _publish_loop(self) -> None:
+        """Compute and fan out deltas, at most once per min_interval."""
+        changed = self._changed
+        while self._subscribers:
+            await changed.wait()
+            changed.clear()
+            self._publish()
+            # Coalesce further changes that arrive during the interval
+            await asyncio.sleep(self.min_interval)
+
+    def _publish(self) -> None:
+        for limit, queues in list(self._subscribers.items()):
+            previous = self._last_rows.get(limit, {})
+            rows = self._rows(limit)
+            delta = {
+                'rows': [row for user_id, row in rows.items() if previous.get(user_id) != row],
+                'removed': [user_id for user_id in previous if user_id not in rows],
+                'size': len(rows),
+                'last_updated': self.index.updated_at
+            }
+            self._last_rows[limit] = rows
+            if not delta['rows'] and not delta['removed']:
+                continue
+
+            event = format_sse('delta', delta)
+            for queue in list(queues):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # A slow client gets a fresh snapshot instead of the backlog
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(self._snapshot_event(limit, rows))
+
+    def _snapshot_event(self, limit: int, rows: Dict[str, Dict[str, Any]]) -> str:
+        return format_sse('snapshot', {
+            'leaderboard': list(rows.values()),
+            'last_updated': self.index.updated_at
+        })
+
+    async def stream(self, limit: int = 100) -> AsyncIterator[str]:
+        """Stream leaderboard events for one client.
+
+        Args:
+            limit: Number of top rows the client displays
+
+        Yields:
+            Server-sent event strings
+        """
+        self._ensure_running()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(limit, set()).add(queue)
+        rows = self._last_rows.setdefault(limit, self._rows(limit))
+        try:
+            yield self._snapshot_event(limit, rows)
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            queues = self._subscribers.get(limit)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[limit]
+                    self._last_rows.pop(limit, None)
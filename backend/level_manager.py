@@ -4,115 +4,211 @@ Level Manager Module
 This module provides a class to manage password validation across different levels.
 It dynamically imports level validators and provides methods to verify passwords.
 """
-import importlib
+import copy
+import logging
+import multiprocessing
 import os
-import json
-from typing import Dict, List, Optional, Any, cast
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple, cast
 from datetime import datetime
 
-from levels.base_level import BaseLevel
+from logs import setup_worker_logging
+from levels.features import PasswordFeatures
+from levels.matcher import LiteralMatcher
+from levels.registry import LevelRegistry, LevelWatcher, PipelineStep, MANIFEST_PATH
+from metrics import level_cache_hits, level_check_seconds, level_results, registry as metrics_registry
+from storage import BaseStorage, create_storage
+
+logger = logging.getLogger(__name__)
+
+# Validity window of results that never expire
+ALWAYS_VALID: Tuple[float, float] = (float('-inf'), float('inf'))
+
+# Validation modes accepted by verify_password() and apply_submission()
+VALIDATION_MODES = ('full', 'fast')
+
+# Passwords over these sizes are rejected before any level runs
+MAX_PASSWORD_LENGTH = int(os.getenv('MAX_PASSWORD_LENGTH', '16384'))
+MAX_PASSWORD_BYTES = int(os.getenv('MAX_PASSWORD_BYTES', '65536'))
+
+# Submissions a validation worker may have in flight (running or queued)
+VALIDATION_QUEUE_PER_WORKER = int(os.getenv('VALIDATION_QUEUE_PER_WORKER', '256'))
+
+class PasswordTooLarge(ValueError):
+    """Raised for passwords over MAX_PASSWORD_LENGTH or MAX_PASSWORD_BYTES."""
+
+class ValidationBusy(RuntimeError):
+    """Raised when the validation workers have too many submissions in flight."""
+
+def check_password_size(password: str) -> None:
+    """Reject a password over the configured size limits.
+
+    The character count is checked first, so the UTF-8 size is only
+    computed for passwords that could exceed the byte limit.
+
+    Args:
+        password: The password to check
+
+    Raises:
+        PasswordTooLarge: If the password is too large
+    """
+    if len(password) > MAX_PASSWORD_LENGTH:
+        raise PasswordTooLarge(f"Password is longer than {MAX_PASSWORD_LENGTH} characters")
+    # A character takes at most 4 bytes in UTF-8
+    if len(password) * 4 > MAX_PASSWORD_BYTES and \
+            len(password.encode('utf-8', 'surrogatepass')) > MAX_PASSWORD_BYTES:
+        raise PasswordTooLarge(f"Password is larger than {MAX_PASSWORD_BYTES} bytes")
+
+# (user_id, password, level); level None means the user's current level
+BatchItem = Tuple[str, str, Optional[int]]
+
+# LevelManager used by worker processes, inherited from the parent
+_worker_manager: Optional['LevelManager'] = None
+
+def _init_worker(manager: 'LevelManager') -> None:
+    global _worker_manager
+    setup_worker_logging()
+    # The parent's cache lock may have been held by another thread at fork time
+    manager.result_cache = ResultCache(manager.result_cache.max_size)
+    # Workers report only their own metrics, which the parent merges
+    metrics_registry.drain()
+    _worker_manager = manager
+
+# (index, user_id, password, level, stored user record or None)
+BatchTask = Tuple[int, str, str, int, Optional[Dict[str, Any]]]
+
+def _evaluate_batch_chunk(chunk: List[BatchTask],
+                          mode: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Evaluate a chunk of batch items in a worker process.
+
+    The records come from the parent: the worker's copy of the storage is
+    only as recent as the fork.
+    """
+    results = [
+        _worker_manager._evaluate(user_id, password, level, mode, index, user_data)
+        for index, user_id, password, level, user_data in chunk
+    ]
+    return results, metrics_registry.drain()
+
+def _apply_submission_in_worker(user_id: str, user_data: Dict[str, Any], password: str,
+                                current_level: Optional[int],
+                                mode: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Apply a submission in a worker process, returning the updated user data."""
+    result = _worker_manager.apply_submission(user_id, user_data, password, current_level, mode)
+    return result, user_data, metrics_registry.drain()
+
+class ResultCache:
+    """LRU cache of validation results keyed on (password hash, level).
+
+    Every result is stored with the validity window it was computed in and
+    is only returned for lookups in the same window, so results of
+    time-dependent levels are reused until the window ends while results of
+    pure levels are reused indefinitely. Results also carry the version of
+    the level registry that computed them, so a submission still running
+    with the levels from before a reload never serves its results to later
+    ones.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        """Create a result cache.
+
+        Args:
+            max_size: Maximum number of distinct passwords kept; 0 disables the cache
+        """
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._results: 'OrderedDict[bytes, Dict[int, Tuple[int, Tuple[float, float], bool]]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes, level_num: int,
+            window: Tuple[float, float] = ALWAYS_VALID, version: int = 0) -> Optional[bool]:
+        """Get the cached result of a level for a password, if any.
+
+        Args:
+            digest: Hash of the password
+            level_num: The level number
+            window: The current validity window of the level's results
+            version: Version of the level registry in use
+
+        Returns:
+            The cached result, or None if there is none for this window and version
+        """
+        with self._lock:
+            results = self._results.get(digest)
+            cached = results.get(level_num) if results is not None else None
+            if cached is None or cached[0] != version or cached[1] != window:
+                self.misses += 1
+                return None
+            self._results.move_to_end(digest)
+            self.hits += 1
+            return cached[2]
+
+    def put(self, digest: bytes, level_num: int, is_valid: bool,
+            window: Tuple[float, float] = ALWAYS_VALID, version: int = 0) -> None:
+        """Store the result of a level for a password.
+
+        Args:
+            digest: Hash of the password
+            level_num: The level number
+            is_valid: The level's result
+            window: The validity window the result was computed in
+            version: Version of the level registry that computed it
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            results = self._results.get(digest)
+            if results is None:
+                results = self._results[digest] = {}
+                if len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+            else:
+                self._results.move_to_end(digest)
+            results[level_num] = (version, window, is_valid)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
 
 class LevelManager:
-    def __init__(self):
-        """Initialize the LevelManager and load all available level validators."""
-        # Initialize database path first
-        self.db_path = os.path.join(os.path.dirname(__file__), 'db.json')
-        self._ensure_db_exists()
+    def __init__(self, storage: Optional[BaseStorage] = None):
+        """Initialize the LevelManager and load all available level validators.
+
+        Args:
+            storage: Storage backend to use; defaults to the configured backend
+        """
+        # Initialize storage first
+        self.storage = storage or create_storage()
+        self.db_path = self.storage.path
+        self.result_cache = ResultCache(int(os.getenv('VALIDATION_CACHE_SIZE', '10000')))
+        # Worker process pools by name, with their size
+        self._pools: Dict[str, Tuple[int, ProcessPoolExecutor]] = {}
+        self._pools_lock = threading.Lock()
+        # Submissions in flight in the validation pool, with the limit
+        self._validation_slots: Tuple[int, threading.BoundedSemaphore] = (0, threading.BoundedSemaphore(1))
         
         # Then load levels and validators
-        self.levels: Dict[int, BaseLevel] = {}
+        self.levels: LevelRegistry = LevelRegistry({})
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[LevelWatcher] = None
         self._load_validators()
         
-    def _ensure_db_exists(self) -> None:
-        """Ensure the database file exists with proper structure."""
-        if not os.path.exists(self.db_path):
-            with open(self.db_path, 'w') as f:
-                json.dump({
-                    '_global': {
-                        'levels': {}
-                    },
-                    'users': {}
-                }, f, indent=2)
-        else:
-            # Ensure the database has the correct structure
-            try:
-                with open(self.db_path, 'r+') as f:
-                    try:
-                        db = json.load(f)
-                        updated = False
-                        
-                        # Add _global.levels if it doesn't exist
-                        if '_global' not in db:
-                            db['_global'] = {'levels': {}}
-                            updated = True
-                        elif 'levels' not in db['_global']:
-                            db['_global']['levels'] = {}
-                            updated = True
-                            
-                        # Ensure users object exists
-                        if 'users' not in db:
-                            db['users'] = {}
-                            updated = True
-                        
-                        # Migrate old users to the new structure if needed
-                        if not isinstance(db.get('users'), dict):
-                            db['users'] = {}
-                            updated = True
-                            
-                        # Move any top-level users into the users object
-                        for key in list(db.keys()):
-                            if key not in ['_global', 'users'] and isinstance(db[key], dict):
-                                if 'current_level' in db[key]:  # Likely a user
-                                    db['users'][key] = db[key]
-                                    del db[key]
-                                    updated = True
-                            
-                        # Save back if updated
-                        if updated:
-                            f.seek(0)
-                            json.dump(db, f, indent=2)
-                            f.truncate()
-                            
-                    except json.JSONDecodeError:
-                        # If file is corrupted, recreate it
-                        db = {
-                            '_global': {
-                                'levels': {}
-                            },
-                            'users': {}
-                        }
-                        f.seek(0)
-                        json.dump(db, f, indent=2)
-                        f.truncate()
-            except Exception as e:
-                print(f"Error ensuring database structure: {e}")
-                # If we can't read/write, create a new file
-                with open(self.db_path, 'w') as f:
-                    json.dump({
-                        '_global': {
-                            'levels': {}
-                        },
-                        'users': {}
-                    }, f, indent=2)
-                
     def _get_user_data(self, user_id: str) -> Dict[str, Any]:
         """Get user data from the database."""
-        if not os.path.exists(self.db_path):
-            self._ensure_db_exists()
-            
-        try:
-            with open(self.db_path, 'r') as f:
-                db = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            db = {'users': {}}
-            
-        # Ensure users object exists and is a dictionary
-        if 'users' not in db or not isinstance(db['users'], dict):
-            db['users'] = {}
+        user_data = self.storage.get_user(user_id)
             
         # Initialize user data if it doesn't exist
-        if user_id not in db['users'] or not isinstance(db['users'][user_id], dict):
-            db['users'][user_id] = {
+        if user_data is None:
+            user_data = {
                 'current_level': 1,
                 'passed_levels': [],
                 'failed_levels': [],
@@ -120,21 +216,16 @@ class LevelManager:
                 'previous_passed_levels': [],
                 'initialized': True
             }
-            self._save_db(db)
+            self.storage.put_user(user_id, user_data)
                 
-        return db['users'][user_id]
+        return user_data
 
     def _get_global_data(self) -> Dict[str, Any]:
         """Get global data from the database."""
         try:
-            with open(self.db_path, 'r') as f:
-                db = json.load(f)
-                # Ensure _global exists and has the correct structure
-                if '_global' not in db or not isinstance(db['_global'], dict):
-                    db['_global'] = {'levels': {}}
-                    self._save_db(db)
-                return db['_global']
-        except (FileNotFoundError, json.JSONDecodeError):
+            return self.storage.get_global()
+        except Exception as e:
+            logger.error("Error reading global data: %s", e)
             return {'levels': {}}
             
     def get_max_level(self) -> int:
@@ -144,39 +235,15 @@ class LevelManager:
         Returns:
             int: The highest level number available, or 0 if no levels exist.
         """
-        if not self.levels:
-            return 0
-        return max(self.levels.keys()) if self.levels else 0
+        return self.levels.max_level
             
     def _load_db(self) -> Dict[str, Any]:
-        """Load the entire database from disk."""
-        if not os.path.exists(self.db_path):
-            return {'_global': {'levels': {}}, 'users': {}}
-            
-        try:
-            with open(self.db_path, 'r') as f:
-                db = json.load(f)
-                # Ensure basic structure
-                if not isinstance(db, dict):
-                    return {'_global': {'levels': {}}, 'users': {}}
-                return db
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {'_global': {'levels': {}}, 'users': {}}
+        """Load the entire database from storage."""
+        return self.storage.load_all()
             
     def _save_db(self, db: Dict[str, Any]) -> None:
-        """Save the entire database to disk."""
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
-        # Write to a temporary file first, then rename (atomic write)
-        temp_path = f"{self.db_path}.tmp"
-        with open(temp_path, 'w') as f:
-            json.dump(db, f, indent=2)
-            
-        # On Windows, we need to remove the destination file first
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-        os.rename(temp_path, self.db_path)
+        """Replace the entire database in storage."""
+        self.storage.replace_all(db)
     
     def _save_global_data(self, data: Dict[str, Any]) -> None:
         """Save global data to the database.
@@ -185,68 +252,109 @@ class LevelManager:
             data: The global data to save, must include 'levels' key
         """
         try:
-            db = self._load_db()
-            if '_global' not in db or not isinstance(db['_global'], dict):
-                db['_global'] = {'levels': {}}
-            
             # Ensure levels data is properly structured
             if 'levels' not in data or not isinstance(data['levels'], dict):
                 data['levels'] = {}
             
             # Preserve existing global data while updating levels
-            db['_global'].update(data)
-            
-            # Ensure levels is a dictionary with string keys
-            if not isinstance(db['_global']['levels'], dict):
-                db['_global']['levels'] = {}
-                
-            self._save_db(db)
-            print("Successfully saved global levels to database")
+            self.storage.save_global(data)
+            logger.debug("Saved global levels to database")
         except Exception as e:
-            print(f"Error saving global data: {e}")
+            logger.error("Error saving global data: %s", e)
             raise
     
     def _save_user_data(self, user_id: str, data: Dict[str, Any]) -> None:
         """Save user data to the database."""
         try:
-            # Read existing data or initialize new database
-            db = self._load_db()
-            
-            # Ensure users object exists and is a dictionary
-            if 'users' not in db or not isinstance(db['users'], dict):
-                db['users'] = {}
-                
-            # Update user data
-            db['users'][user_id] = data
-            
-            # Write back to file
-            self._save_db(db)
-                
+            self.storage.put_user(user_id, data)
         except Exception as e:
-            print(f"Error saving user data: {e}")
-            # Try to create a fresh database if something went wrong
-            with open(self.db_path, 'w') as f:
-                json.dump({
-                    '_global': {'levels': {}},
-                    'users': {user_id: data}
-                }, f, indent=2)
+            logger.error("Error saving user data: %s", e)
+            raise
     
     def _load_validators(self) -> None:
-        """Dynamically load all level validators from the levels directory and update global levels.
+        """Register all level validators and update global levels.
         
         This method:
-        1. Scans the levels directory for level modules
-        2. Loads each level validator
-        3. Updates the global levels in the database
-        4. Ensures all levels are properly registered
+        1. Reads the level registry from levels/manifest.json, so level
+           modules are only imported when first used; if the manifest is
+           missing or out of date, imports every level module instead
+        2. Updates the global levels in the database if they changed
+        3. Prepares the validation pipelines
         """
-        print("\n--- Loading level validators ---")
         levels_dir = os.path.join(os.path.dirname(__file__), 'levels')
-        print(f"Looking for levels in: {levels_dir}")
         
         if not os.path.exists(levels_dir):
             raise FileNotFoundError(f"Levels directory not found at: {levels_dir}")
         
+        registry = LevelRegistry.from_manifest(MANIFEST_PATH, levels_dir)
+        if registry is None:
+            logger.info("Loading level validators from %s", levels_dir)
+            registry = LevelRegistry.scan(levels_dir)
+        else:
+            logger.debug("Registered %d levels from %s", len(registry), MANIFEST_PATH)
+        
+        # Ensure we have at least one level registered
+        if not registry:
+            raise RuntimeError("No valid level modules found in levels directory")
+        
+        self.levels = registry
+        self._sync_global_levels()
+        self.result_cache.clear()
+    
+    def reload_levels(self) -> Dict[int, str]:
+        """Reload level files that changed on disk, while serving requests.
+        
+        Changed files are executed again and the new level set replaces the
+        current one in a single assignment: a submission that already started
+        finishes with the levels it started with, later ones use the new
+        version. Only changed levels are re-synced into the global levels,
+        a new result cache replaces the old one, and worker processes are restarted once
+        their queued work is done, so they pick up the new levels.
+        
+        Returns:
+            dict: What happened to each level ('added', 'changed' or 'removed')
+        """
+        with self._reload_lock:
+            registry, changes = self.levels.reload(os.path.dirname(MANIFEST_PATH))
+            if not changes:
+                return changes
+            self.levels = registry
+            # Submissions still running with the old levels keep the old
+            # cache; their results are for the old version either way
+            self.result_cache = ResultCache(self.result_cache.max_size)
+            self._sync_global_levels(set(changes))
+            for name in list(self._pools):
+                self._discard_pool(name, cancel_futures=False)
+        logger.warning("Reloaded levels (version %d): %s", registry.version,
+                       ', '.join(f"{num} {change}" for num, change in sorted(changes.items())))
+        return changes
+    
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Reload levels whenever files in the levels directory change.
+        
+        Args:
+            interval: Seconds between checks of the level files
+        """
+        if self._watcher is None:
+            self._watcher = LevelWatcher(self.reload_levels, interval, os.path.dirname(MANIFEST_PATH))
+            self._watcher.start()
+    
+    def stop_watching(self) -> None:
+        """Stop watching the levels directory."""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+    
+    def _sync_global_levels(self, level_nums: Optional[Iterable[int]] = None) -> None:
+        """Store the info of registered levels in the global levels.
+        
+        Entries are only replaced when a level's description or level_id
+        changed, and the database is only written if an entry was replaced.
+        Entries of removed levels are kept.
+        
+        Args:
+            level_nums: Levels to sync; defaults to every registered level
+        """
         # Get existing global data to preserve any custom level info
         global_data = self._get_global_data()
         if 'levels' not in global_data or not isinstance(global_data['levels'], dict):
@@ -254,127 +362,137 @@ class LevelManager:
             
         updated_levels = global_data['levels'].copy()
         
-        # List all files in the levels directory
-        try:
-            files = [f for f in os.listdir(levels_dir) 
-                    if os.path.isfile(os.path.join(levels_dir, f))]
-            print(f"Found {len(files)} files in levels directory")
-        except Exception as e:
-            print(f"Error reading levels directory: {e}")
-            files = []
-        
-        # Track which levels we've processed
-        processed_levels = set()
-        
-        for filename in sorted(files):  # Sort for consistent processing
-            if not (filename.startswith('level_') and filename.endswith('.py')):
-                continue
-                
-            if filename == 'base_level.py':
-                continue
-                
-            try:
-                # Extract level number from filename (level_X.py -> X)
-                level_num = int(filename[6:-3])
-                processed_levels.add(level_num)
-                
-                module_name = f"levels.level_{level_num}"
-                print(f"\nLoading level {level_num} from {filename}")
-                
-                # Import the level module
-                try:
-                    module = importlib.import_module(module_name)
-                    level_instance = getattr(module, 'level', None)
-                    
-                    if level_instance is None:
-                        print(f"Warning: {filename} does not export a 'level' instance")
-                        continue
-                        
-                    if not isinstance(level_instance, BaseLevel):
-                        print(f"Warning: {filename} exports a level that doesn't inherit from BaseLevel")
-                        continue
-                        
-                    # Initialize the level and get its data
-                    level_data = level_instance.start() or {}
-                    level_desc = getattr(level_instance, 'level_desc', '')
-                    level_id = getattr(level_instance, 'level_id', f'level_{level_num}')
-                    
-                    print(f"Loaded level {level_num}: {level_id} - {level_desc[:50]}...")
-                    
-                    # Store the level instance
-                    self.levels[level_num] = level_instance
-                    
-                    # Prepare level info for global storage
-                    level_info = {
-                        'level': level_num,
-                        'name': f'Level {level_num}',
-                        'description': level_desc,
-                        'level_id': level_id,
-                        'has_state': bool(level_data.get('level_state')),
-                        'last_updated': datetime.utcnow().isoformat()
-                    }
-                    
-                    # Update if level doesn't exist or has changed
-                    level_str = str(level_num)
-                    if level_str not in updated_levels or \
-                       updated_levels[level_str].get('description') != level_desc or \
-                       updated_levels[level_str].get('level_id') != level_id:
-                        
-                        updated_levels[level_str] = level_info
-                        print(f"Updated level {level_num} in global levels")
-                    
-                except ImportError as e:
-                    print(f"Error importing {module_name}: {e}")
-                    continue
-                    
-            except (ValueError, IndexError) as e:
-                print(f"Skipping invalid level file: {filename} - {e}")
+        for level_num in (self.levels if level_nums is None else sorted(level_nums)):
+            if level_num not in self.levels:
                 continue
-            except Exception as e:
-                print(f"Unexpected error processing {filename}: {e}")
+            metadata = self.levels.metadata(level_num)
+            level_str = str(level_num)
+            stored = updated_levels.get(level_str)
+            if stored is not None and \
+               stored.get('description') == metadata['description'] and \
+               stored.get('level_id') == metadata['level_id']:
                 continue
+            
+            updated_levels[level_str] = {
+                'level': level_num,
+                'name': f'Level {level_num}',
+                'description': metadata['description'],
+                'level_id': metadata['level_id'],
+                'has_state': metadata['has_state'],
+                'last_updated': datetime.utcnow().isoformat()
+            }
+            logger.debug("Updated level %d in global levels", level_num)
         
         # Save updated levels back to global data if anything changed
         if updated_levels != global_data.get('levels', {}):
             try:
-                print(f"Saving {len(updated_levels)} levels to global data...")
+                logger.info("Saving %d levels to global data", len(updated_levels))
                 self._save_global_data({'levels': updated_levels})
-                print("Successfully saved global levels")
             except Exception as e:
-                print(f"Error saving global levels: {e}")
+                logger.error("Error saving global levels: %s", e)
         else:
-            print("No changes to global levels")
-            
-        # Ensure we have at least one level loaded
-        if not self.levels:
-            raise RuntimeError("No valid level modules found in levels directory")
+            logger.debug("No changes to global levels")
     
-    def verify_password(self, user_id: str, password: str, current_level: int) -> Dict[str, Any]:
+    @property
+    def matcher(self) -> LiteralMatcher:
+        """Literal matcher of the current levels."""
+        return self.levels.matcher
+    
+    def _get_pipeline(self, current_level: int) -> Tuple[PipelineStep, ...]:
+        """Get the validation steps for levels 1 to current_level."""
+        return self.levels.pipeline(current_level)
+    
+    def _get_steps(self, current_level: int, mode: str,
+                   levels: Optional[LevelRegistry] = None) -> Tuple[PipelineStep, ...]:
+        """Get the steps to evaluate, in order, for a validation mode.
+
+        In 'fast' mode the current level comes first, followed by the
+        lower levels, so a submission that fails the current level is
+        rejected after a single check.
+
+        Args:
+            current_level: The level to validate up to
+            mode: 'full' or 'fast'
+            levels: Registry to take the steps from; defaults to the current one
+        """
+        pipeline = (levels or self.levels).pipeline(current_level)
+        if mode == 'full' or not pipeline or pipeline[-1][0] != current_level:
+            return pipeline
+        return (pipeline[-1],) + pipeline[:-1]
+
+    def verify_password(self, user_id: str, password: str, current_level: int,
+                        mode: str = 'full') -> Dict[str, Any]:
         """Verify a password against all levels up to the current level.
 
+        Loads the user's record, applies the submission with
+        apply_submission() and saves the record back.
+
         Args:
             user_id: Unique identifier for the user
             password: The password to verify
             current_level: The user's current level
+            mode: 'full' to evaluate every level, or 'fast' to evaluate the
+                current level first and stop at the first failure
 
         Returns:
             dict: Dictionary containing verification results with full level information
         """
-        print(f"\n--- Starting password validation for user {user_id} ---")
-        print(f"Current level from request: {current_level}")
-
-        # Load or initialize user data
-        user_data = self._get_user_data(user_id) or {
-            'current_level': 1,
-            'passed_levels': [],
-            'failed_levels': [],
-            'level_states': {}
-        }
+        user_data = self._get_user_data(user_id)
+        result = self.apply_submission(user_id, user_data, password, current_level, mode)
+        self._save_user_data(user_id, user_data)
+        return result
+
+    def apply_submission(self, user_id: str, user_data: Dict[str, Any], password: str,
+                         current_level: Optional[int] = None, mode: str = 'full') -> Dict[str, Any]:
+        """Validate a password against an already-loaded user record.
+
+        This is the unit of work for a submission: it updates the record in
+        memory (level attempt counters, passed/failed levels, current level)
+        and performs no I/O. The caller persists user_data exactly once.
+
+        Results of levels that don't depend on level_state are cached per
+        password: results of pure levels indefinitely, results of
+        time-dependent levels (13, 18) for their validity window.
+        In 'fast' mode levels that are skipped after the first failure are
+        neither reported nor counted as attempts.
+
+        Args:
+            user_id: Unique identifier for the user
+            user_data: The user's record, modified in place
+            password: The password to verify
+            current_level: The level to validate up to; defaults to the
+                record's current_level
+            mode: 'full' to evaluate every level, or 'fast' to evaluate the
+                current level first and stop at the first failure
+
+        Returns:
+            dict: Dictionary containing verification results with full level information
+
+        Raises:
+            ValueError: If mode is not a known validation mode
+            PasswordTooLarge: If the password is over the size limits; the
+                record is left unchanged
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode: {mode}")
+        # Cheap pre-check, so oversized input never reaches the levels
+        check_password_size(password)
+
+        if current_level is None:
+            current_level = user_data.get('current_level', 1)
+        try:
+            current_level = int(current_level)
+        except (ValueError, TypeError):
+            current_level = 1
+        logger.debug("Validating levels 1 to %d for user %s (%s mode)", current_level, user_id, mode)
 
         # Ensure data structure integrity
-        user_data.setdefault('level_states', {})
-        user_data.setdefault('passed_levels', [])
-        user_data.setdefault('failed_levels', [])
+        if not isinstance(user_data.get('level_states'), dict):
+            user_data['level_states'] = {}
+        if not isinstance(user_data.get('passed_levels'), list):
+            user_data['passed_levels'] = []
+        if not isinstance(user_data.get('failed_levels'), list):
+            user_data['failed_levels'] = []
 
         # Normalize level lists
         user_data['passed_levels'] = [
@@ -387,172 +505,384 @@ class LevelManager:
         ]
 
         previous_passed = set(user_data['passed_levels'])
-        previous_failed = set(user_data['failed_levels'])
 
-        # Level references
-        global_levels = self._get_global_data().get('levels', {})
         passed_levels = []
         failed_levels = []
 
-        print(f"Validating levels 1 to {current_level}")
+        # The levels of this submission, even if they are reloaded meanwhile
+        levels = self.levels
 
-        for level_num in range(1, current_level + 1):
-            level_str = str(level_num)
-            level = self.levels.get(level_num)
-
-            if not level:
-                print(f"Warning: No validator found for level {level_num}")
-                continue
+        # Shared, lazily computed password features and one timestamp per submission
+        features = PasswordFeatures(password, levels.matcher)
+        now = datetime.utcnow().isoformat()
+        level_states = user_data['level_states']
+        result_cache = self.result_cache
+        stop_at_failure = mode == 'fast'
 
+        for level_num, level_str, check, name, description, level in self._get_steps(current_level, mode, levels):
             # Initialize or update level state
-            level_state = user_data['level_states'].setdefault(level_str, {
-                'attempts': 0,
-                'last_attempt': None
-            })
+            level_state = level_states.get(level_str)
+            if level_state is None:
+                level_state = level_states[level_str] = {'attempts': 0, 'last_attempt': None}
 
-            level_state['attempts'] += 1
-            level_state['last_attempt'] = datetime.utcnow().isoformat()
+            level_state['attempts'] = level_state.get('attempts', 0) + 1
+            level_state['last_attempt'] = now
 
-            try:
-                is_valid = level.is_valid(password, level_state)
-                level_info = {
-                    'level': level_num,
-                    'name': f'Level {level_num}',
-                    'description': getattr(level, 'level_desc', ''),
-                    'attempts': level_state['attempts'],
-                    'last_attempt': level_state['last_attempt']
-                }
-
-                if is_valid:
-                    print(f"Level {level_num} passed validation")
-                    passed_levels.append(level_info)
-                else:
-                    print(f"Level {level_num} failed validation (attempt {level_state['attempts']})")
-                    failed_levels.append(level_info)
+            cacheable = not level.stateful
+            if cacheable:
+                window = level.validity_window() or ALWAYS_VALID
+                is_valid = result_cache.get(features.digest, level_num, window, levels.version)
+            else:
+                is_valid = None
+            if is_valid is None:
+                started = time.perf_counter()
+                try:
+                    is_valid = bool(check(features, level_state))
+                except Exception as e:
+                    level_check_seconds.observe(time.perf_counter() - started, level_str)
+                    level_results.inc(level_str, 'error')
+                    logger.warning("Error validating level %d: %s", level_num, e)
+                    failed_levels.append({
+                        'level': level_num,
+                        'name': name,
+                        'description': description
+                    })
+                    if stop_at_failure:
+                        break
+                    continue
+                level_check_seconds.observe(time.perf_counter() - started, level_str)
+                # Only cache results that didn't straddle the end of the window
+                if cacheable and (level.validity_window() or ALWAYS_VALID) == window:
+                    result_cache.put(features.digest, level_num, is_valid, window, levels.version)
+            else:
+                level_cache_hits.inc(level_str)
+            level_results.inc(level_str, 'pass' if is_valid else 'fail')
 
-            except Exception as e:
-                print(f"Error validating level {level_num}: {e}")
-                failed_levels.append({
-                    'level': level_num,
-                    'name': f'Level {level_num}',
-                    'description': getattr(level, 'level_desc', '')
-                })
-
-        # Get the actual passed levels from current validation
-        current_passed = {lvl['level'] for lvl in passed_levels}
-        current_failed = {lvl['level'] for lvl in failed_levels}
-
-        # Update user data with current validation results (overwrite, don't merge)
-        user_data['passed_levels'] = sorted(current_passed)
-        user_data['failed_levels'] = sorted(current_failed - current_passed)
-
-        # Only update current_level if the current level was passed
-        if current_level in user_data['passed_levels']:
-            # Find the next unpassed level
-            new_current_level = current_level + 1
-            # Don't exceed the maximum level
-            max_level = self.get_max_level()
-            if new_current_level > max_level:
-                new_current_level = max_level
-            user_data['current_level'] = new_current_level
+            level_info = {
+                'level': level_num,
+                'name': name,
+                'description': description,
+                'attempts': level_state['attempts'],
+                'last_attempt': now
+            }
+            if is_valid:
+                passed_levels.append(level_info)
+            else:
+                failed_levels.append(level_info)
+                if stop_at_failure:
+                    break
+
+        current_level_passed = any(lvl['level'] == current_level for lvl in passed_levels)
+
+        # Record progress on the current level
+        if current_level_passed:
+            if current_level not in user_data['passed_levels']:
+                user_data['passed_levels'].append(current_level)
+
+            # Advance to the next level without exceeding the maximum level
+            new_current_level = min(current_level + 1, levels.max_level or 1)
+            new_current_level = max(new_current_level, current_level)
         else:
+            if current_level not in user_data['passed_levels'] and \
+               current_level not in user_data['failed_levels']:
+                user_data['failed_levels'].append(current_level)
             # Keep the same current level if not passed
             new_current_level = current_level
 
-        # Identify newly passed levels (before overwriting!)
+        user_data['current_level'] = new_current_level
+        user_data['last_updated'] = datetime.utcnow().isoformat()
+
+        # Identify newly passed levels
         newly_passed = [
             level for level in passed_levels
             if level['level'] not in previous_passed
         ]
 
-        # Save user data
-        self._save_user_data(user_id, user_data)
-
         # Sort response consistently
         passed_levels_sorted = sorted(passed_levels, key=lambda x: x['level'])
         failed_levels_sorted = sorted(failed_levels, key=lambda x: x['level'])
 
-        # Debug output
-        print("\n--- Validation Results ---")
-        print(f"Passed levels: {[l['level'] for l in passed_levels_sorted]}")
-        print(f"Newly passed: {[l['level'] for l in newly_passed]}")
-        print(f"Failed levels: {[l['level'] for l in failed_levels_sorted]}")
-        print(f"New current level: {new_current_level}")
-
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Validation results for user %s: passed=%s newly_passed=%s failed=%s current_level=%d",
+                user_id,
+                [l['level'] for l in passed_levels_sorted],
+                [l['level'] for l in newly_passed],
+                [l['level'] for l in failed_levels_sorted],
+                new_current_level,
+            )
 
         return {
             'passed': passed_levels_sorted,
             'failed': failed_levels_sorted,
             'current_level': new_current_level,
+            'current_level_passed': current_level_passed,
             'newly_passed': newly_passed
         }
 
 
-    def get_level_info(self, level_num: int) -> Optional[Dict[str, Any]]:
+    def evaluate_password(self, user_id: str, password: str, level: int, mode: str = 'full',
+                          index: Optional[int] = None) -> Dict[str, Any]:
+        """Validate a password for a level without changing any user record.
+
+        The password is applied to a copy of the user's stored record, so
+        stateful levels see the user's level_state exactly as /submit would;
+        the copy is never saved. Unknown users are evaluated as a user
+        without previous attempts.
+
+        Args:
+            user_id: The user the attempt belongs to
+            password: The password to validate
+            level: The level to validate up to
+            mode: 'full' or 'fast', see apply_submission()
+            index: Position of the item in a batch, reported back
+
+        Returns:
+            dict: The passed and failed level numbers and the resulting level
+        """
+        return self._evaluate(user_id, password, level, mode, index, self.storage.get_user(user_id))
+
+    def _evaluate(self, user_id: str, password: str, level: int, mode: str,
+                  index: Optional[int], stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """evaluate_password() against a given stored record (None for an unknown user)."""
+        if stored is not None:
+            user_data = copy.deepcopy(stored)
+        else:
+            user_data = {
+                'current_level': level,
+                'passed_levels': [],
+                'failed_levels': [],
+                'level_states': {},
+            }
+        result = self.apply_submission(user_id, user_data, password, level, mode)
+        return {
+            'index': index,
+            'user_id': user_id,
+            'level': level,
+            'passed': [entry['level'] for entry in result['passed']],
+            'failed': [entry['level'] for entry in result['failed']],
+            'current_level_passed': result['current_level_passed'],
+            'current_level': result['current_level'],
+        }
+
+    def _get_pool(self, name: str, workers: int) -> Optional[ProcessPoolExecutor]:
+        """Get a pool of worker processes, or None to run in-process.
+
+        Workers are forked from this process, so they reuse the validators
+        loaded by _load_validators() instead of importing and starting the
+        levels again. Where fork is unavailable work runs in-process.
+
+        Args:
+            name: Pool name; every name gets its own pool
+            workers: Number of worker processes; below 1 means no pool
+        """
+        if workers < 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return None
+        # Import every level first, so workers start with nothing left to load
+        self._get_pipeline(self.get_max_level())
+        with self._pools_lock:
+            size, pool = self._pools.get(name, (0, None))
+            if pool is None or size != workers:
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=(self,),
+                )
+                self._pools[name] = (workers, pool)
+            return pool
+
+    def _discard_pool(self, name: str, cancel_futures: bool = True) -> None:
+        """Shut a pool down so the next _get_pool() call starts a fresh one.
+
+        Args:
+            name: Pool name
+            cancel_futures: Cancel queued work instead of letting the old
+                workers finish it
+        """
+        with self._pools_lock:
+            _, pool = self._pools.pop(name, (0, None))
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=cancel_futures)
+
+    def shutdown_workers(self) -> None:
+        """Stop all worker processes."""
+        for name in list(self._pools):
+            self._discard_pool(name)
+
+    def submit_validation(self, user_id: str, user_data: Dict[str, Any], password: str,
+                          current_level: Optional[int] = None, mode: str = 'full',
+                          workers: Optional[int] = None) -> Optional[Future]:
+        """Run apply_submission() in a validation worker process.
+
+        Validation is CPU bound, so running it in worker processes keeps the
+        event loop responsive and lets submissions use every core. The
+        future resolves to (result, user_data) where user_data is an updated
+        copy; the given user_data is left untouched, so a caller that stops
+        waiting has nothing to undo. Cancelling the future cancels the
+        validation if no worker has picked it up yet.
+
+        At most VALIDATION_QUEUE_PER_WORKER submissions per worker are in
+        flight, counting those whose caller stopped waiting while a worker
+        still runs them; beyond that submissions are refused instead of
+        queued.
+
+        Args:
+            user_id: The ID of the user
+            user_data: The user's data
+            password: The password to verify
+            current_level: The level to validate up to
+            mode: 'full' or 'fast', see apply_submission()
+            workers: Worker processes; defaults to VALIDATION_WORKERS or the CPU count
+
+        Returns:
+            Future: The pending validation, or None if worker processes are disabled
+
+        Raises:
+            ValidationBusy: If the workers have too many submissions in flight
+        """
+        if workers is None:
+            workers = int(os.getenv('VALIDATION_WORKERS', str(os.cpu_count() or 1)))
+        pool = self._get_pool('validation', workers)
+        if pool is None:
+            return None
+
+        with self._pools_lock:
+            size, slots = self._validation_slots
+            if size != workers * VALIDATION_QUEUE_PER_WORKER:
+                size = workers * VALIDATION_QUEUE_PER_WORKER
+                slots = threading.BoundedSemaphore(size)
+                self._validation_slots = (size, slots)
+        if not slots.acquire(blocking=False):
+            raise ValidationBusy(f"{size} submissions are already being validated")
+
+        done: Future = Future()
+
+        def complete(task: Future) -> None:
+            slots.release()
+            # Marks done as running, or tells that the caller cancelled it
+            if not done.set_running_or_notify_cancel():
+                return
+            try:
+                result, updated_user_data, metrics = task.result()
+            except BrokenProcessPool as e:
+                # A worker died, e.g. killed for memory; start over next time
+                self._discard_pool('validation')
+                done.set_exception(e)
+            except BaseException as e:
+                done.set_exception(e)
+            else:
+                metrics_registry.merge(metrics)
+                done.set_result((result, updated_user_data))
+
+        try:
+            task = pool.submit(_apply_submission_in_worker, user_id, user_data, password, current_level, mode)
+        except BaseException as e:
+            slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool('validation')
+            raise
+        task.add_done_callback(complete)
+        done.add_done_callback(lambda future: future.cancelled() and task.cancel())
+        return done
+
+    def validate_batch(self, items: Iterable[BatchItem], mode: str = 'full',
+                       workers: Optional[int] = None, chunk_size: int = 64) -> Iterator[Dict[str, Any]]:
+        """Validate many passwords, yielding one result per item in input order.
+
+        Nothing is persisted: items are evaluated with evaluate_password() in
+        a pool of worker processes. Progress is only recorded through /submit.
+
+        Args:
+            items: (user_id, password, level) tuples; a level of None uses the
+                user's stored current level (1 for unknown users)
+            mode: 'full' or 'fast', see apply_submission()
+            workers: Worker processes; defaults to BATCH_WORKERS or the CPU count
+            chunk_size: Items sent to a worker at a time
+
+        Yields:
+            dict: Result of each item, see evaluate_password()
+
+        Raises:
+            ValueError: If mode is not a known validation mode
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode: {mode}")
+
+        def resolve(level: Optional[int], user_data: Optional[Dict[str, Any]]) -> int:
+            if level is not None:
+                return int(level)
+            try:
+                return int((user_data or {}).get('current_level', 1))
+            except (ValueError, TypeError):
+                return 1
+
+        if workers is None:
+            workers = int(os.getenv('BATCH_WORKERS', '0')) or os.cpu_count() or 1
+        pool = self._get_pool('batch', workers) if workers > 1 else None
+
+        def chunks() -> Iterator[List[BatchTask]]:
+            chunk = []
+            for index, (user_id, password, level) in enumerate(items):
+                user_data = self.storage.get_user(user_id)
+                chunk.append((index, user_id, password, resolve(level, user_data), user_data))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        if pool is None:
+            for chunk in chunks():
+                for index, user_id, password, level, user_data in chunk:
+                    yield self._evaluate(user_id, password, level, mode, index, user_data)
+            return
+
+        # Keep a bounded number of chunks in flight so results stream back
+        # while the input is still being read
+        pending: 'deque[Future]' = deque()
+        def collect(task: Future) -> List[Dict[str, Any]]:
+            results, metrics = task.result()
+            metrics_registry.merge(metrics)
+            return results
+
+        for chunk in chunks():
+            pending.append(pool.submit(_evaluate_batch_chunk, chunk, mode))
+            if len(pending) >= workers * 2:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
+
+    def get_level_info(self, level_num: int) -> Dict[str, Any]:
         """Get information about a specific level.
         
+        Served from the catalog of the current levels, which is built when
+        the levels are registered and replaced when they are reloaded, so
+        this performs no I/O and imports no level module.
+        
         Args:
             level_num: The level number to get info for
             
         Returns:
-            Dict containing level information or a default dict if level doesn't exist
+            Dict containing level information (level, name, description,
+            extras, level_id, has_state), or a default dict if the level
+            doesn't exist
         """
-        try:
-            # First try to get from global levels
-            global_levels = self._get_global_data().get('levels', {})
-            level_info = global_levels.get(str(level_num))
-            
-            if level_info:
-                return level_info
-                
-            # Fall back to dynamic generation if not in global levels
-            if level_num not in self.levels:
-                print(f"Warning: Level {level_num} not found in loaded levels")
-                return {
-                    'level': level_num,
-                    'name': f'Level {level_num}',
-                    'description': '',
-                    'level_id': f'level_{level_num}',
-                    'has_state': False
-                }
-                
-            level = self.levels[level_num]
-            level_data = level.start() or {}
-            
-            # Build the level info
-            result = {
-                'level': level_num,
-                'name': f'Level {level_num}',
-                'description': getattr(level, 'level_desc', ''),
-                'level_id': getattr(level, 'level_id', f'level_{level_num}'),
-                'has_state': bool(level_data.get('level_state'))
-            }
-            
-            # Cache this info in global levels for future use
-            try:
-                db = self._load_db()
-                if '_global' not in db:
-                    db['_global'] = {'levels': {}}
-                
-                if 'levels' not in db['_global']:
-                    db['_global']['levels'] = {}
-                
-                db['_global']['levels'][str(level_num)] = result
-                self._save_db(db)
-            except Exception as e:
-                print(f"Error caching level info: {e}")
-                
-            return result
-            
-        except Exception as e:
-            print(f"Error in get_level_info for level {level_num}: {e}")
+        info = self.levels.catalog.get(level_num)
+        if info is None:
+            logger.warning("Level %d not found in loaded levels", level_num)
             return {
                 'level': level_num,
                 'name': f'Level {level_num}',
                 'description': '',
+                'extras': {},
                 'level_id': f'level_{level_num}',
                 'has_state': False
             }
+        # A copy, so callers can't change the catalog
+        return dict(info, extras=dict(info['extras']))
         
     def get_user_level_state(self, user_id: str, level_num: int) -> Dict[str, Any]:
         """Get the current state for a user's level.
@@ -5,7 +5,9 @@ This module provides a base class for all level validators.
 Each level should extend this class and implement the required methods.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+
+from .features import PasswordFeatures
 
 class BaseLevel(ABC):
     """Base class for all level validators.
@@ -15,8 +17,21 @@ class BaseLevel(ABC):
     when validating passwords.
     
     Child classes should call super().__init__() with level_id and level_desc.
+    
+    Levels also declare what their result depends on, which the LevelManager
+    uses to decide which results it may cache and reuse:
+    - time_dependent: the result depends on the current time; such levels
+      report how long a result stays valid with validity_window()
+    - stateful: the result depends on the user's level_state
+    A level that is neither is pure: its result depends only on the password.
     """
     
+    time_dependent: bool = False
+    stateful: bool = False
+    # Substrings the level looks for, keyed by the form of the password they
+    # are searched in ('exact', 'lower' or 'upper'); see levels.matcher
+    literals: Dict[str, Tuple[str, ...]] = {}
+    
     def __init__(self, level_id: int = 0, level_desc: str = ""):
         """Initialize the level with its ID and description.
         
@@ -40,6 +55,41 @@ class BaseLevel(ABC):
         """
         pass
     
+    @property
+    def pure(self) -> bool:
+        """Whether the result depends on nothing but the password."""
+        return not (self.time_dependent or self.stateful)
+    
+    def validity_window(self, at: Optional[float] = None) -> Optional[Tuple[float, float]]:
+        """Get the period in which a result computed at a given time is valid.
+        
+        Time-dependent levels override this; results of other levels never
+        expire.
+        
+        Args:
+            at: Unix timestamp the result is computed at; defaults to now
+            
+        Returns:
+            (start, end) Unix timestamps, or None if the result never expires
+        """
+        return None
+    
+    def check(self, features: PasswordFeatures, level_state: Dict[str, Any]) -> bool:
+        """Validate a password using its precomputed features.
+        
+        The LevelManager calls this instead of is_valid() so derived values
+        such as the lowercase password are shared between levels. Levels
+        override it to use the features; by default it calls is_valid().
+        
+        Args:
+            features: The features of the password to validate
+            level_state: The state data for this level
+            
+        Returns:
+            bool: True if the password is valid, False otherwise
+        """
+        return self.is_valid(features.password, level_state)
+    
     def start(self) -> Dict[str, Any]:
         """Initialize the level and return its initial state.
         
@@ -0,0 +1,107 @@
+"""
+Password Features Module
+
+This module provides PasswordFeatures, a per-submission view of a password
+that computes derived values (lowercase copy, digit sum, character classes,
+...) at most once and shares them between all level validators.
+"""
+import hashlib
+from functools import cached_property
+from typing import Dict, FrozenSet, Optional
+
+from .matcher import LiteralMatcher
+
+SPECIAL_CHARS = frozenset("!@#$%^&*()_+-=[]{}|;:,.<>?/")
+
+class PasswordFeatures:
+    """Lazily computed features of a password.
+
+    Character-class checks run over the set of distinct characters, which is
+    built in a single pass over the password, so their cost does not grow
+    with the password length.
+    """
+
+    def __init__(self, password: str, matcher: Optional[LiteralMatcher] = None):
+        """Create the features of a password.
+
+        Args:
+            password: The password
+            matcher: Matcher for the literals registered by the levels
+        """
+        self.password = password
+        self.matcher = matcher
+        self._hits: Dict[str, FrozenSet[str]] = {}
+
+    def text(self, fold: str) -> str:
+        """Get the password in a fold ('exact', 'lower' or 'upper')."""
+        if fold == 'exact':
+            return self.password
+        if fold == 'lower':
+            return self.lower
+        if fold == 'upper':
+            return self.upper
+        raise ValueError(f"Unknown fold: {fold}")
+
+    def contains(self, literal: str, fold: str = 'exact') -> bool:
+        """Check whether the password contains a literal.
+
+        Literals registered with the matcher are looked up in the hits the
+        matcher found for the fold, computed on first use with one scan per
+        registered literal; others are searched directly.
+
+        Args:
+            literal: The substring to look for
+            fold: The form of the password to search in
+
+        Returns:
+            bool: True if the literal occurs in the password
+        """
+        if self.matcher is None or (fold, literal) not in self.matcher:
+            return literal in self.text(fold)
+        hits = self._hits.get(fold)
+        if hits is None:
+            hits = self._hits[fold] = self.matcher.search(fold, self.text(fold))
+        return literal in hits
+
+    @cached_property
+    def digest(self) -> bytes:
+        """SHA-256 of the password, used as a key for cached results."""
+        return hashlib.sha256(self.password.encode('utf-8', 'surrogatepass')).digest()
+
+    @cached_property
+    def length(self) -> int:
+        return len(self.password)
+
+    @cached_property
+    def lower(self) -> str:
+        return self.password.lower()
+
+    @cached_property
+    def upper(self) -> str:
+        return self.password.upper()
+
+    @cached_property
+    def chars(self) -> FrozenSet[str]:
+        """The distinct characters of the password."""
+        return frozenset(self.password)
+
+    @cached_property
+    def has_digit(self) -> bool:
+        return any(char.isdigit() for char in self.chars)
+
+    @cached_property
+    def has_upper(self) -> bool:
+        return any(char.isupper() for char in self.chars)
+
+    @cached_property
+    def has_special(self) -> bool:
+        return not self.chars.isdisjoint(SPECIAL_CHARS)
+
+    @cached_property
+    def digit_sum(self) -> int:
+        """Sum of all digits in the password.
+
+        Raises:
+            ValueError: If the password contains a digit int() can't parse (e.g. '²')
+        """
+        return sum(int(char) * self.password.count(char) for char in self.chars if char.isdigit())
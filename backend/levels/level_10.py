@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level10(BaseLevel):
     def __init__(self):
@@ -6,6 +7,8 @@ class Level10(BaseLevel):
             level_id=10,
             level_desc="Your password must include the Bitcoin Genesis Block hash.",
         )
+        self.genesis_hash = self.__init_genesis_hash()
+        self.literals = {"exact": (self.genesis_hash,)}
     
     def __init_genesis_hash(self):
         """Initialize the Bitcoin Genesis Block hash."""
@@ -22,8 +25,10 @@ class Level10(BaseLevel):
         Returns:
             bool: True if password contains the Genesis Block hash, False otherwise
         """
-        genesis_hash = self.__init_genesis_hash()
-        return genesis_hash in password
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.contains(self.genesis_hash)
 
 # Create a singleton instance of the level
     def start(self):
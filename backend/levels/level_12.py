@@ -1,8 +1,12 @@
 import random
 import requests
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level12(BaseLevel):
+    stateful = True
+    literals = {"lower": ("exactlyaggron",)}
+
     def __init__(self):
         # Get random Pokemon from API
         self.pokemon_name, self.pokemon_image = self._get_random_pokemon()
@@ -48,7 +52,10 @@ class Level12(BaseLevel):
         # print(password.lower().strip())
         # Case-insensitive exact match comparison
         # return level_state['pokemon_name'].lower().strip() in password.lower().strip()
-        return "exactlyaggron" in password.lower().strip()
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.contains("exactlyaggron", "lower")
 
     def start(self):
         return{
@@ -4,6 +4,8 @@ from datetime import datetime
 from .base_level import BaseLevel
 
 class Level13(BaseLevel):
+    time_dependent = True
+
     def __init__(self):
         super().__init__(
             level_id=13,
@@ -29,6 +31,15 @@ class Level13(BaseLevel):
         # Check if the current time is contained anywhere in the password
         return current_time in password.strip()
 
+    def validity_window(self, at=None):
+        """
+        The expected HH:MM changes every minute. Kolkata's UTC offset is a
+        whole number of minutes, so its minutes start with the UTC minutes.
+        """
+        at = time.time() if at is None else at
+        start = at - at % 60
+        return start, start + 60
+
     def start(self):
         """
         Initialize the level.
@@ -4,8 +4,11 @@ Level 14: Powerhouse of the Cell Password Validation
 This level checks if the password contains "mitochondria" - the powerhouse of the cell.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level14(BaseLevel):
+    literals = {"lower": ("mitochondria",)}
+
     def __init__(self):
         super().__init__(
             level_id=14,
@@ -23,8 +26,11 @@ class Level14(BaseLevel):
         Returns:
             bool: True if password contains mitochondria, False otherwise
         """
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         # Case-insensitive search for mitochondria
-        return "mitochondria" in password.lower()
+        return features.contains("mitochondria", "lower")
     
     def get_hint(self) -> str:
         """
@@ -5,8 +5,11 @@ This level requires understanding binary code.
 Your password must contain the binary representation of a specific number.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level15(BaseLevel):
+    literals = {"exact": ("1000101",)}
+
     def __init__(self):
         super().__init__(
             level_id=15,
@@ -25,8 +28,11 @@ class Level15(BaseLevel):
             bool: True if password contains the binary code, False otherwise
         """
         # Binary representation of 69 is 1000101
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         binary_code = "1000101"
-        return binary_code in password
+        return features.contains(binary_code)
     
     def get_hint(self) -> str:
         """
@@ -4,8 +4,11 @@ Level 16: Pi Password Validation
 This level checks if the password contains the value of pi up to first 5 decimal places (3.14159).
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level16(BaseLevel):
+    literals = {"exact": ("3.14159",)}
+
     def __init__(self):
         super().__init__(
             level_id=16,
@@ -23,8 +26,11 @@ class Level16(BaseLevel):
         Returns:
             bool: True if password contains 3.14159, False otherwise
         """
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         pi_value = "3.14159"
-        return pi_value in password
+        return features.contains(pi_value)
     
     def get_hint(self) -> str:
         """
@@ -5,6 +5,7 @@ This level requires completing a maze game through the frontend.
 The level validates that the user has completed the maze by checking the password for a special completion code.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level17(BaseLevel):
     def __init__(self):
@@ -15,6 +16,7 @@ class Level17(BaseLevel):
         
         # The completion code that needs to be in the password
         self.completion_code = "MAZE_COMPLETED"
+        self.literals = {"upper": (self.completion_code,)}
     
     def start(self):
         """
@@ -44,8 +46,11 @@ class Level17(BaseLevel):
         Returns:
             bool: True if password contains the completion code, False otherwise
         """
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         # Check if the password contains the maze completion code
-        return self.completion_code in password.upper()
+        return features.contains(self.completion_code, "upper")
     
     def get_hint(self) -> str:
         """
@@ -5,9 +5,11 @@ This level checks if the password contains the current time as emoji (nearest ha
 The time should be represented using clock face emojis (🕐🕑🕒🕓🕔🕕🕖🕗🕘🕙🕚🕛🕧🕜🕝🕞🕟🕠🕡🕢🕣🕤🕥🕦).
 """
 from .base_level import BaseLevel
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class Level18(BaseLevel):
+    time_dependent = True
+
     def __init__(self):
         super().__init__(
             level_id=18,
@@ -43,6 +45,17 @@ class Level18(BaseLevel):
             next_hour = (hour + 1) % 12
             return full_hour_emojis[next_hour]
     
+    def validity_window(self, at=None):
+        """
+        Get the half-hour bucket that shares the same emoji.
+
+        The emoji changes at :15 and :45 local time.
+        """
+        now = datetime.now() if at is None else datetime.fromtimestamp(at)
+        start = (now - timedelta(minutes=15)).replace(second=0, microsecond=0)
+        start = start.replace(minute=start.minute - start.minute % 30) + timedelta(minutes=15)
+        return start.timestamp(), (start + timedelta(minutes=30)).timestamp()
+    
     def is_valid(self, password: str, level_state: dict) -> bool:
         """
         Check if the password contains the correct time emoji for level 18.
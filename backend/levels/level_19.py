@@ -4,6 +4,7 @@ Level 19: Guess the Country Challenge
 This level requires users to identify a country from a 3D map view and include its name in their password.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level19(BaseLevel):
     def __init__(self):
@@ -13,6 +14,7 @@ class Level19(BaseLevel):
         )
         # The correct country name
         self.correct_country = "Indonesia"
+        self.literals = {"lower": (self.correct_country.lower(),)}
 
     def is_valid(self, password: str, level_state: dict) -> bool:
         """
@@ -25,8 +27,10 @@ class Level19(BaseLevel):
         Returns:
             bool: True if password contains the country name, False otherwise
         """
-        print(self.correct_country.lower() in password.lower())
-        return bool(self.correct_country.lower() in password.lower())
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.contains(self.correct_country.lower(), "lower")
 
     def get_hint(self) -> str:
         """
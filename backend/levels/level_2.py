@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level2(BaseLevel):
     def __init__(self):
@@ -8,9 +9,10 @@ class Level2(BaseLevel):
         )
     
     def is_valid(self, password: str, level_state: dict) -> bool:
-        if not any(char.isdigit() for char in password):
-            return False
-        return True     
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.has_digit
 
 
     def start(self):
@@ -4,8 +4,11 @@ Level 20: Basic Password Challenge
 This is a simple level that requires a specific password to pass.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level20(BaseLevel):
+    literals = {"lower": ("zerodayctf", "return0")}
+
     def __init__(self):
         super().__init__(
             level_id=20,
@@ -23,8 +26,10 @@ class Level20(BaseLevel):
         Returns:
             bool: True if password is correct, False otherwise
         """
-        normalized = password.lower().strip()
-        return "zerodayctf" in normalized or "return0" in normalized
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.contains("zerodayctf", "lower") or features.contains("return0", "lower")
     
     def start(self):
         """
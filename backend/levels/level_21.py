@@ -4,8 +4,11 @@ Level 21: Simple Password Validation
 This level checks if the password matches a specific string.
 """
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level21(BaseLevel):
+    literals = {"exact": ("bypass@)@%",)}
+
     def __init__(self):
         super().__init__(
             level_id=21,
@@ -24,7 +27,10 @@ class Level21(BaseLevel):
             bool: True if password is correct, False otherwise
         """
         # return password == "welcome123"
-        return "bypass@)@%" in password
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return features.contains("bypass@)@%")
 
     def start(self):
         return {
@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 from typing import Dict, Any
 
 class Level3(BaseLevel):
@@ -9,8 +10,11 @@ class Level3(BaseLevel):
         )
     
     def is_valid(self, password: str, level_state: Dict[str, Any]) -> bool:
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: Dict[str, Any]) -> bool:
         # Check if password contains at least one uppercase letter
-        return any(char.isupper() for char in password)
+        return features.has_upper
 
     def start(self):
         pass
@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level4(BaseLevel):
     def __init__(self):
@@ -8,12 +9,11 @@ class Level4(BaseLevel):
         )
     
     def is_valid(self, password: str, level_state: dict) -> bool:
+        return self.check(PasswordFeatures(password), level_state)
 
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         # Rule 4: Password must include a special character
-        special_chars = "!@#$%^&*()_+-=[]{}|;:,.<>?/"
-        if not any(char in special_chars for char in password):
-             return False
-        return True
+        return features.has_special
 
     def start(self):
         pass
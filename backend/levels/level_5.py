@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level5(BaseLevel):
     def __init__(self):
@@ -8,11 +9,11 @@ class Level5(BaseLevel):
         )
     
     def is_valid(self, password: str, level_state: dict) -> bool:
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
         # Rule 5: Digits in the password must add up to 250
-        digit_sum = sum(int(char) for char in password if char.isdigit())
-        if digit_sum != 250:
-            return False
-        return True
+        return features.digit_sum == 250
         
     def start(self):
         pass
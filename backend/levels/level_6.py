@@ -1,5 +1,8 @@
+import logging
 from .base_level import BaseLevel
 
+logger = logging.getLogger(__name__)
+
 class Level6(BaseLevel):
     def __init__(self):
         super().__init__(
@@ -23,9 +26,7 @@ class Level6(BaseLevel):
         length = len(password)
         required_skulls = length // 10
         actual_skulls = password.count(skull)
-        verification = actual_skulls == required_skulls
-        print(actual_skulls, required_skulls)
-        print(verification)
+        logger.debug("Level 6: %d skulls, %d required", actual_skulls, required_skulls)
         return actual_skulls == required_skulls
 
     def start(self):
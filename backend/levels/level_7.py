@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level7(BaseLevel):
     def __init__(self):
@@ -40,7 +41,10 @@ class Level7(BaseLevel):
         Returns:
             bool: True if password length is prime, False otherwise
         """
-        return self.is_prime(len(password))
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return self.is_prime(features.length)
 
     def start(self):
         pass
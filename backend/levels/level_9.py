@@ -1,4 +1,5 @@
 from .base_level import BaseLevel
+from .features import PasswordFeatures
 
 class Level9(BaseLevel):
     def __init__(self):
@@ -6,6 +7,7 @@ class Level9(BaseLevel):
             level_id=9,
             level_desc="Your password must include a Google Map Plus Code for GDGOCBIT.",
         )
+        self.literals = {"exact": tuple(sorted(self.__init_bit_codes()))}
     
     def __init_bit_codes(self):
         """Initialize the valid BIT Plus Codes."""
@@ -22,8 +24,10 @@ class Level9(BaseLevel):
         Returns:
             bool: True if password contains any valid BIT Plus Code, False otherwise
         """
-        bit_plus_codes = self.__init_bit_codes()
-        return any(code in password for code in bit_plus_codes)
+        return self.check(PasswordFeatures(password), level_state)
+
+    def check(self, features: PasswordFeatures, level_state: dict) -> bool:
+        return any(features.contains(code) for code in self.literals["exact"])
 
     def start(self):
         pass
@@ -0,0 +1,460 @@
+"""
+Level Registry Module
+
+This module maps level numbers to their modules and metadata, imports level
+modules only when a level is first used, and reloads changed level files.
+
+The metadata of every level (module, description, level_id, has_state,
+extras, caching flags, literals) is precomputed into levels/manifest.json together
+with a hash of each level file. While the manifest matches the files on
+disk, startup reads it instead of importing every level; otherwise all
+levels are imported as before. Regenerate it after changing a level:
+    python -m levels.registry
+
+A registry is an immutable snapshot of the levels, stamped with a version
+and each level's file hash. Reloading builds a new registry, so a request
+holding the old one keeps seeing a consistent set of levels.
+"""
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import types
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+from .base_level import BaseLevel
+from .features import PasswordFeatures
+from .matcher import LiteralMatcher
+
+logger = logging.getLogger(__name__)
+
+LEVELS_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(LEVELS_DIR, 'manifest.json')
+MANIFEST_VERSION = 2
+
+# level_N.py
+LEVEL_FILE = re.compile(r'^level_(\d+)\.py$')
+
+# (level_num, level_str, check, name, description, level)
+PipelineStep = Tuple[int, str, Callable[[PasswordFeatures, Dict[str, Any]], bool], str, str, BaseLevel]
+
+
+def level_files(levels_dir: str = LEVELS_DIR) -> Dict[int, str]:
+    """List the level modules in a directory.
+
+    Args:
+        levels_dir: Directory to scan
+
+    Returns:
+        dict: File path by level number
+    """
+    files = {}
+    for filename in os.listdir(levels_dir):
+        match = LEVEL_FILE.match(filename)
+        path = os.path.join(levels_dir, filename)
+        if match and os.path.isfile(path):
+            files[int(match.group(1))] = path
+    return files
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def import_level(module_name: str) -> BaseLevel:
+    """Import a level module and return its level instance.
+
+    Args:
+        module_name: Dotted module name, e.g. "levels.level_1"
+
+    Returns:
+        BaseLevel: The module's "level" attribute
+
+    Raises:
+        ImportError: If the module cannot be imported or exports no valid level
+    """
+    module = importlib.import_module(module_name)
+    level = getattr(module, 'level', None)
+    if level is None:
+        raise ImportError(f"{module_name} does not export a 'level' instance")
+    if not isinstance(level, BaseLevel):
+        raise ImportError(f"{module_name} exports a level that doesn't inherit from BaseLevel")
+    return level
+
+
+def load_level_file(module_name: str, path: str) -> Tuple[BaseLevel, str]:
+    """Execute a level file as a fresh module, bypassing cached bytecode.
+
+    The module replaces any previous version in sys.modules. The hash is
+    computed from the exact source that was executed.
+
+    Args:
+        module_name: Dotted module name, e.g. "levels.level_1"
+        path: The level file
+
+    Returns:
+        tuple: The level instance and the SHA-256 of the source
+
+    Raises:
+        ImportError: If the file cannot be executed or exports no valid level
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = types.ModuleType(module_name)
+    module.__file__ = path
+    module.__spec__ = spec
+    module.__package__ = module_name.rpartition('.')[0]
+    try:
+        exec(compile(source, path, 'exec'), module.__dict__)
+    except Exception as e:
+        raise ImportError(f"Error executing {module_name}: {e!r}") from e
+    sys.modules[module_name] = module
+    return import_level(module_name), hashlib.sha256(source).hexdigest()
+
+
+def describe_level(level_num: int, module_name: str, level: BaseLevel,
+                   level_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the manifest entry of a started level.
+
+    Args:
+        level_num: The level number
+        module_name: The module the level was imported from
+        level: The level instance
+        level_data: What the level's start() returned
+
+    Returns:
+        dict: The level's metadata
+    """
+    return {
+        'module': module_name,
+        'level_id': getattr(level, 'level_id', f'level_{level_num}'),
+        'description': getattr(level, 'level_desc', ''),
+        'has_state': bool(level_data.get('level_state')),
+        'extras': dict(level_data.get('level_extras') or {}),
+        'time_dependent': level.time_dependent,
+        'stateful': level.stateful,
+        'literals': {fold: list(values) for fold, values in level.literals.items()},
+    }
+
+
+class LevelRegistry(Mapping):
+    """Read-only mapping of level number to level instance.
+
+    Level numbers and metadata are known up front; a level's module is
+    imported and its start() called on first access. Iterating over the
+    keys or reading metadata() never imports anything.
+    """
+
+    def __init__(self, entries: Mapping[int, Dict[str, Any]],
+                 loaded: Optional[Mapping[int, Tuple[BaseLevel, Dict[str, Any]]]] = None,
+                 version: int = 1):
+        """
+        Args:
+            entries: Manifest entry by level number
+            loaded: Already started levels with their start() data
+            version: Version stamp, increased by every reload
+        """
+        self._entries = dict(sorted(entries.items()))
+        self._loaded: Dict[int, Tuple[BaseLevel, Dict[str, Any]]] = dict(loaded or {})
+        self._lock = threading.Lock()
+        self.version = version
+        self.max_level = max(self._entries, default=0)
+        # Substrings of all levels, each searched at most once per submission
+        self.matcher = LiteralMatcher(self.literals())
+        # Read-only level info served to clients
+        self.catalog: Mapping[int, Mapping[str, Any]] = MappingProxyType({
+            level_num: MappingProxyType({
+                'level': level_num,
+                'name': f'Level {level_num}',
+                'description': entry['description'],
+                'extras': MappingProxyType(dict(entry.get('extras', {}))),
+                'level_id': entry['level_id'],
+                'has_state': entry['has_state'],
+            })
+            for level_num, entry in self._entries.items()
+        })
+        self._steps: Dict[int, PipelineStep] = {}
+        self._pipelines: Dict[int, Tuple[PipelineStep, ...]] = {}
+
+    @classmethod
+    def scan(cls, levels_dir: str = LEVELS_DIR, package: str = 'levels') -> 'LevelRegistry':
+        """Import and start every level module in a directory.
+
+        Modules that fail to import or export no valid level are skipped
+        with a warning.
+
+        Args:
+            levels_dir: Directory to scan
+            package: Package the directory is imported as
+
+        Returns:
+            LevelRegistry: Registry with every level loaded
+        """
+        entries, loaded = {}, {}
+        for level_num, path in sorted(level_files(levels_dir).items()):
+            module_name = f"{package}.level_{level_num}"
+            try:
+                level = import_level(module_name)
+                level_data = level.start() or {}
+            except Exception:
+                logger.exception("Error loading %s", os.path.basename(path))
+                continue
+            entries[level_num] = describe_level(level_num, module_name, level, level_data)
+            entries[level_num]['sha256'] = file_digest(path)
+            loaded[level_num] = (level, level_data)
+        return cls(entries, loaded)
+
+    @classmethod
+    def from_manifest(cls, path: str = MANIFEST_PATH,
+                      levels_dir: str = LEVELS_DIR) -> Optional['LevelRegistry']:
+        """Create a registry from the manifest, without importing any level.
+
+        Args:
+            path: Manifest file
+            levels_dir: Directory the manifest describes
+
+        Returns:
+            LevelRegistry, or None if the manifest is missing or does not
+            match the level files on disk
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable level manifest %s: %s", path, e)
+            return None
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+
+        entries = {int(level_num): entry for level_num, entry in manifest.get('levels', {}).items()}
+        files = level_files(levels_dir)
+        if set(entries) != set(files) or any(
+            entries[level_num].get('sha256') != file_digest(path) for level_num, path in files.items()
+        ):
+            logger.warning("Level manifest is out of date; run 'python -m levels.registry'")
+            return None
+        return cls(entries)
+
+    def reload(self, levels_dir: str = LEVELS_DIR,
+               package: str = 'levels') -> Tuple['LevelRegistry', Dict[int, str]]:
+        """Build the next version of the registry from the level files on disk.
+
+        Only files whose hash changed are executed again; unchanged levels
+        keep their entries and instances. A changed file that fails to load
+        is skipped with an error and its previous version is kept.
+
+        Args:
+            levels_dir: Directory to scan
+            package: Package the directory is imported as
+
+        Returns:
+            tuple: The new registry (this one if nothing changed) and what
+            happened to each level ('added', 'changed' or 'removed')
+        """
+        files = level_files(levels_dir)
+        entries = dict(self._entries)
+        loaded = dict(self._loaded)
+        changes: Dict[int, str] = {}
+
+        for level_num in set(entries) - set(files):
+            del entries[level_num]
+            loaded.pop(level_num, None)
+            changes[level_num] = 'removed'
+
+        for level_num, path in sorted(files.items()):
+            entry = entries.get(level_num)
+            try:
+                if entry is not None and entry.get('sha256') == file_digest(path):
+                    continue
+                module_name = f"{package}.level_{level_num}"
+                level, digest = load_level_file(module_name, path)
+                level_data = level.start() or {}
+            except Exception:
+                logger.exception("Error reloading %s; keeping the previous version", os.path.basename(path))
+                continue
+            entries[level_num] = describe_level(level_num, module_name, level, level_data)
+            entries[level_num]['sha256'] = digest
+            loaded[level_num] = (level, level_data)
+            changes[level_num] = 'changed' if entry is not None else 'added'
+
+        if not changes:
+            return self, changes
+        return LevelRegistry(entries, loaded, self.version + 1), changes
+
+    def step(self, level_num: int) -> PipelineStep:
+        """Get the pipeline step of a level, importing the level if needed."""
+        step = self._steps.get(level_num)
+        if step is None:
+            level = self[level_num]
+            step = self._steps[level_num] = (
+                level_num, str(level_num), level.check, f'Level {level_num}',
+                getattr(level, 'level_desc', ''), level
+            )
+        return step
+
+    def pipeline(self, current_level: int) -> Tuple[PipelineStep, ...]:
+        """Get the validation steps for levels 1 to current_level.
+
+        The pipeline for level N is a tuple with one (level_num, level_str,
+        check, name, description, level) step per level up to N, so a
+        submission iterates over ready-made steps instead of looking up
+        validators and level metadata on every request. Pipelines are built
+        on first use, which is also when their level modules are imported.
+        """
+        if current_level < 1 or not self.max_level:
+            return ()
+        level_num = min(current_level, self.max_level)
+        pipeline = self._pipelines.get(level_num)
+        if pipeline is None:
+            pipeline = self._pipelines[level_num] = tuple(
+                self.step(num) for num in self._entries if num <= level_num
+            )
+        return pipeline
+
+    def manifest(self) -> Dict[str, Any]:
+        """The manifest describing this registry's levels."""
+        return {
+            'version': MANIFEST_VERSION,
+            'levels': {str(level_num): entry for level_num, entry in self._entries.items()},
+        }
+
+    def metadata(self, level_num: int) -> Dict[str, Any]:
+        """Get a level's manifest entry without importing it.
+
+        Raises:
+            KeyError: If there is no such level
+        """
+        return self._entries[level_num]
+
+    def literals(self) -> Dict[str, Tuple[str, ...]]:
+        """Literals of all levels merged by fold, without importing them."""
+        merged: Dict[str, set] = {}
+        for entry in self._entries.values():
+            for fold, values in entry.get('literals', {}).items():
+                merged.setdefault(fold, set()).update(values)
+        return {fold: tuple(sorted(values)) for fold, values in merged.items()}
+
+    def is_loaded(self, level_num: int) -> bool:
+        return level_num in self._loaded
+
+    def start_data(self, level_num: int) -> Dict[str, Any]:
+        """What the level's start() returned, loading the level if needed."""
+        self[level_num]
+        return self._loaded[level_num][1]
+
+    def load_all(self) -> None:
+        """Import every level that has not been used yet."""
+        for level_num in self._entries:
+            self[level_num]
+
+    def __getitem__(self, level_num: int) -> BaseLevel:
+        loaded = self._loaded.get(level_num)
+        if loaded is not None:
+            return loaded[0]
+        entry = self._entries[level_num]
+        with self._lock:
+            if level_num not in self._loaded:
+                level = import_level(entry['module'])
+                self._loaded[level_num] = (level, level.start() or {})
+                logger.debug("Loaded level %d from %s", level_num, entry['module'])
+            return self._loaded[level_num][0]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, level_num: object) -> bool:
+        return level_num in self._entries
+
+
+class LevelWatcher:
+    """Polls the levels directory and reports when level files change.
+
+    Polling the size and modification time of a couple of dozen files is
+    cheap and needs no platform-specific file notification API.
+    """
+
+    def __init__(self, on_change: Callable[[], None], interval: float = 2.0,
+                 levels_dir: str = LEVELS_DIR):
+        """
+        Args:
+            on_change: Called from the watcher thread after files changed
+            interval: Seconds between polls
+            levels_dir: Directory to watch
+        """
+        self.on_change = on_change
+        self.interval = interval
+        self.levels_dir = levels_dir
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot = self.snapshot()
+
+    def snapshot(self) -> Dict[int, Tuple[int, int]]:
+        """(mtime_ns, size) of every level file."""
+        result = {}
+        for level_num, path in level_files(self.levels_dir).items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result[level_num] = (stat.st_mtime_ns, stat.st_size)
+        return result
+
+    def poll(self) -> bool:
+        """Check once for changes, calling on_change if there were any."""
+        snapshot = self.snapshot()
+        if snapshot == self._snapshot:
+            return False
+        self._snapshot = snapshot
+        try:
+            self.on_change()
+        except Exception:
+            logger.exception("Error reloading levels")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='level-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def write_manifest(path: str = MANIFEST_PATH, levels_dir: str = LEVELS_DIR) -> Dict[str, Any]:
+    """Import every level and write the manifest describing them.
+
+    Returns:
+        dict: The written manifest
+    """
+    manifest = LevelRegistry.scan(levels_dir).manifest()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return manifest
+
+
+if __name__ == '__main__':
+    written = write_manifest()
+    print(f"Wrote {len(written['levels'])} levels to {MANIFEST_PATH}")
@@ -0,0 +1,184 @@
+"""
+Logs Module
+
+This module configures logging for the API server. Handlers only put records
+on a queue; a single listener thread formats them and writes them to
+stderr, so request handlers never block on output.
+
+Levels are set per logger with environment variables:
+- LOG_LEVEL: level of the root logger (default WARNING)
+- LOG_LEVELS: comma separated logger=level pairs, e.g.
+  "level_manager=DEBUG,storage=INFO" (the "access" logger defaults to INFO)
+- LOG_FORMAT: "json" (default) for one JSON object per line, or "text"
+
+By default only warnings, errors and one structured record per request on
+the "access" logger are emitted. Access records carry the method, path (never
+the query string, which may hold credentials), status, duration and client.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional
+
+# Logger for per-request records
+access_logger = logging.getLogger('access')
+
+# api_analytics sets itself to DEBUG on import
+DEFAULT_LEVELS = {'access': 'INFO', 'api_analytics': 'WARNING'}
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse a LOG_LEVELS value.
+
+    Args:
+        spec: Comma separated logger=level pairs
+
+    Returns:
+        dict: Level name by logger name
+
+    Raises:
+        ValueError: If a pair is malformed or names an unknown level
+    """
+    levels = {}
+    for pair in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, level = pair.partition('=')
+        level = level.strip().upper()
+        if not sep or not name.strip() or not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"Invalid LOG_LEVELS entry: {pair!r}")
+        levels[name.strip()] = level
+    return levels
+
+
+def setup_logging(level: Optional[str] = None, levels: Optional[str] = None,
+                  fmt: Optional[str] = None) -> None:
+    """Install the queue-based handler and the configured log levels.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level: Root log level; defaults to LOG_LEVEL
+        levels: Per-logger levels; defaults to LOG_LEVELS
+        fmt: "json" or "text"; defaults to LOG_FORMAT
+    """
+    global _listener
+
+    level = (level or os.getenv('LOG_LEVEL') or 'WARNING').upper()
+    per_logger = {**DEFAULT_LEVELS, **parse_levels(levels if levels is not None else os.getenv('LOG_LEVELS', ''))}
+    fmt = (fmt or os.getenv('LOG_FORMAT') or 'json').lower()
+
+    output = logging.StreamHandler()
+    if fmt == 'text':
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        output.setFormatter(JSONFormatter())
+
+    if _listener is not None:
+        _listener.stop()
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    for name, logger_level in per_logger.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+
+class AccessLogMiddleware:
+    """ASGI middleware writing one "access" record per HTTP request."""
+
+    def __init__(self, app: Callable[..., Awaitable[None]]):
+        self.app = app
+
+    async def __call__(self, scope: MutableMapping[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http' or not access_logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message: MutableMapping[str, Any]) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            client = scope.get('client')
+            access_logger.info(
+                "%s %s %d", scope['method'], scope['path'], status,
+                extra={
+                    'method': scope['method'],
+                    'path': scope['path'],
+                    'status': status,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                    'client': client[0] if client else None,
+                }
+            )
+
+
+def setup_worker_logging() -> None:
+    """Write the records of a forked worker process straight to stderr.
+
+    A forked process inherits the root QueueHandler but not the listener
+    thread that drains its queue, so its records would never be written.
+    The worker gets a plain handler with the parent's formatter instead.
+    """
+    global _listener
+    formatter = _listener.handlers[0].formatter if _listener is not None else None
+    # The listener thread only runs in the parent
+    _listener = None
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    output = logging.StreamHandler()
+    output.setFormatter(formatter)
+    root.addHandler(output)
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,23 +1,36 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
-import json
 import os
-from typing import Optional, Dict, Any, List, Tuple
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal, Tuple
+from typing_extensions import Annotated
+from pydantic import AfterValidator, BaseModel, Field
 import jwt
+import asyncio
 import secrets
-import time
 import operator
-import os
-from level_manager import level_manager
+import logging
+from logs import setup_logging, AccessLogMiddleware
+from request_limits import RequestSizeLimitMiddleware, MAX_REQUEST_BYTES, MAX_BATCH_REQUEST_BYTES
+from level_manager import level_manager, check_password_size, PasswordTooLarge, ValidationBusy, MAX_PASSWORD_LENGTH
+from concurrency import UserLocks, StoreWriter
+from leaderboard import LeaderboardIndex, LeaderboardBroadcaster
+from metrics import registry as metrics_registry
+from serialization import dumps as json_dumps
+from responses import FastJSONResponse
+from export import stream_export, content_info as export_content_info
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from api_analytics.fastapi import Analytics
 
+# After the imports, so the configured levels override those set by libraries
+setup_logging()
+
 # Initialize rate limiter
 limiter = Limiter(
     key_func=get_remote_address,  # Rate limit by IP address
@@ -25,7 +38,7 @@ limiter = Limiter(
 )
 
 # Initialize FastAPI with rate limiting
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -33,14 +46,21 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
 app.add_middleware(Analytics, api_key=os.getenv("API_DASH"))
 
-# Database configuration
-DB_FILE = "./db.json"
 # Update FastAPI app config with docs and redoc disabled
 app.title = "User Registration API"
 app.docs_url = None  # Disable /docs
 app.redoc_url = None  # Disable /redoc
 
-# Configure CORS
+# Middleware added later wraps the earlier ones
+
+# Reject oversized request bodies before anything reads them
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_bytes=MAX_REQUEST_BYTES,
+    path_limits={"/admin/validate": MAX_BATCH_REQUEST_BYTES},
+)
+
+# Configure CORS (outside the size limit, so browsers can read its 413s)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -49,11 +69,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-DB_FILE = "db.json"
+# Structured access records (outermost, so they include every other middleware)
+app.add_middleware(AccessLogMiddleware)
+
+logger = logging.getLogger(__name__)
+
+# Database storage (selected with DB_BACKEND / DB_PATH, shared with the level manager)
+storage = level_manager.storage
+# Requests of the same user are serialized; all writes go through one writer thread
+user_locks = UserLocks()
+store_writer = StoreWriter(storage)
+# Ranking of all users, updated incrementally as scores change
+leaderboard_index = LeaderboardIndex()
+leaderboard_index.rebuild(storage.iter_users())
+# Pushes ranking changes to /leaderboard/stream clients
+leaderboard_broadcaster = LeaderboardBroadcaster(
+    leaderboard_index,
+    max_rate=float(os.getenv("LEADERBOARD_STREAM_MAX_RATE", "2")),
+)
+LEADERBOARD_STREAM_MAX_CLIENTS = int(os.getenv("LEADERBOARD_STREAM_MAX_CLIENTS", "1000"))
+
 # Read JWT secret from environment variable with a default value for development
 JWT_SECRET = os.getenv("JWT_SEC", "your-secret-key-here")
 JWT_ALGORITHM = "HS256"
 
+# Browsers and proxies must revalidate /leaderboard with the ETag before reuse
+LEADERBOARD_CACHE_CONTROL = f"public, max-age={int(os.getenv('LEADERBOARD_MAX_AGE', '0'))}, must-revalidate"
+
 # JWT Token model
 class Token(BaseModel):
     access_token: str
@@ -74,7 +116,7 @@ class LeaderboardUser(BaseModel):
 
 class LeaderboardResponse(BaseModel):
     leaderboard: List[LeaderboardUser]
-    last_updated: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    last_updated: str = Field(..., description="Time of the last change to the leaderboard")
 
 class UserResponse(BaseModel):
     user_id: str
@@ -88,43 +130,25 @@ class UserResponse(BaseModel):
 def get_db():
     """Get the database content with proper structure."""
     try:
-        with open(DB_FILE, 'r') as f:
-            db = json.load(f)
-            # Ensure proper structure
-            if not isinstance(db, dict):
-                db = {'_global': {'levels': {}}, 'users': {}}
-            if '_global' not in db or not isinstance(db['_global'], dict):
-                db['_global'] = {'levels': {}}
-            if 'users' not in db or not isinstance(db['users'], dict):
-                db['users'] = {}
-            return db
-    except (FileNotFoundError, json.JSONDecodeError):
+        return storage.load_all()
+    except Exception as e:
+        logger.error("Error loading database: %s", e)
         return {'_global': {'levels': {}}, 'users': {}}
 
 def save_db(data):
     """Save the database with proper structure."""
-    # Ensure proper structure
-    if not isinstance(data, dict):
-        data = {'_global': {'levels': {}}, 'users': {}}
-    if '_global' not in data or not isinstance(data['_global'], dict):
-        data['_global'] = {'levels': {}}
-    if 'users' not in data or not isinstance(data['users'], dict):
-        data['users'] = {}
-        
-    # Ensure the directory exists
-    db_dir = os.path.dirname(DB_FILE) or '.'
-    if db_dir:  # Only create directory if a path is specified
-        os.makedirs(db_dir, exist_ok=True)
-    
-    # Write to a temporary file first, then rename (atomic write)
-    temp_path = f"{DB_FILE}.tmp"
-    with open(temp_path, 'w') as f:
-        json.dump(data, f, indent=2)
-        
-    # On Windows, we need to remove the destination file first
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
-    os.rename(temp_path, DB_FILE)
+    storage.replace_all(data)
+    leaderboard_index.rebuild(storage.iter_users())
+    leaderboard_broadcaster.notify()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        tag.removeprefix("W/") == etag for tag in candidates
+    )
 
 def create_access_token(user_id: str) -> str:
     """Create JWT token with user_id"""
@@ -145,6 +169,69 @@ def verify_token(token: str) -> Dict[str, Any]:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+# Seconds between checks for changed level files; 0 disables hot reload
+LEVEL_RELOAD_INTERVAL = float(os.getenv("LEVEL_RELOAD_INTERVAL", "2"))
+
+@app.on_event("startup")
+def watch_levels():
+    """Reload level modules when their files change."""
+    if LEVEL_RELOAD_INTERVAL > 0:
+        level_manager.start_watching(LEVEL_RELOAD_INTERVAL)
+
+@app.on_event("shutdown")
+def flush_storage():
+    """Persist any buffered database writes before the server stops."""
+    level_manager.stop_watching()
+    store_writer.drain()
+    storage.flush()
+    level_manager.shutdown_workers()
+
+# Seconds a submission may spend in validation before it is answered with 503
+VALIDATION_TIMEOUT = float(os.getenv("VALIDATION_TIMEOUT", "5"))
+
+async def validate_submission(user_id: str, user_data: Dict[str, Any], password: str,
+                              mode: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Validate a submission off the event loop.
+    
+    Validation runs in a worker process and is abandoned after
+    VALIDATION_TIMEOUT seconds; with VALIDATION_WORKERS=0 it runs in the
+    thread pool without a time limit.
+    
+    Args:
+        user_id: The ID of the user
+        user_data: The user's data
+        password: The submitted password
+        mode: 'full' or 'fast'
+        
+    Returns:
+        tuple: The validation result and the updated user data
+        
+    Raises:
+        HTTPException: 503 if every worker is busy or validation ran out of time
+    """
+    try:
+        future = level_manager.submit_validation(user_id, user_data, password, mode=mode)
+    except ValidationBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many submissions are being validated, try again shortly",
+        )
+    if future is None:
+        result = await run_in_threadpool(
+            level_manager.apply_submission, user_id, user_data, password, mode=mode
+        )
+        return result, user_data
+    
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), VALIDATION_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Validation of a %d character password timed out", len(password))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password validation took too long",
+        )
+
 @app.get("/")
 async def home():
     """Home endpoint"""
@@ -156,6 +243,17 @@ async def custom_docs(request: Request):
     """Custom docs endpoint with a secret message"""
     return {"message": "bro we know this page will be available at the right time ;) =V07="}
 
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: per-level validation latency and results, result
+    cache hits and storage timings.
+    """
+    return Response(
+        content=metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.get("/leaderboard", response_model=LeaderboardResponse)
 @limiter.limit("60/minute")
 async def get_leaderboard(
@@ -171,46 +269,59 @@ async def get_leaderboard(
         offset: Number of entries to skip (for pagination)
         
     Returns:
-        Object containing leaderboard array and last_updated timestamp
+        Object containing leaderboard array and last_updated timestamp.
+        The body is serialized once per leaderboard change and served with an
+        ETag; a matching If-None-Match returns 304 Not Modified.
     """
     limit = max(1, min(limit, 1000))  # Ensure limit is between 1 and 100
-    db = get_db()
     
-    # Calculate ranks and get full leaderboard
-    _, leaderboard = calculate_rank("", db)
+    # Ranks and display levels (n-1) are maintained by the leaderboard index
+    snapshot = leaderboard_index.snapshot(limit, max(0, offset))
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": LEADERBOARD_CACHE_CONTROL,
+    }
     
-    # Convert to new format without last_updated in user entries
-    # current_level is already adjusted in calculate_rank
-    leaderboard_users = [
-        {
-            'user_id': entry['user_id'],
-            'rank': entry['rank'],
-            'score': entry['score'],
-            'current_level': entry['current_level']  # Already adjusted to n-1 in calculate_rank
-        }
-        for entry in leaderboard[offset:offset + limit]
-    ]
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return {
-        'leaderboard': leaderboard_users,
-        'last_updated': datetime.utcnow().isoformat()
-    }
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@app.get("/leaderboard/stream")
+@limiter.limit("10/minute")
+async def stream_leaderboard(
+    request: Request,  # Required for rate limiting
+    limit: int = 100
+):
+    """
+    Stream leaderboard updates as server-sent events.
+    
+    The first "snapshot" event contains the top `limit` rows in the same
+    format as /leaderboard. Each following "delta" event contains only the
+    rows that changed and the user_ids that dropped out of the top `limit`.
+    """
+    if len(leaderboard_broadcaster) >= LEADERBOARD_STREAM_MAX_CLIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many leaderboard streams, use /leaderboard instead"
+        )
+    
+    limit = max(1, min(limit, 1000))
+    return StreamingResponse(
+        leaderboard_broadcaster.stream(limit),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/leaderboard/{user_id}", response_model=LeaderboardUser)
 async def get_user_rank(user_id: str):
     """
     Get a specific user's rank and leaderboard information
     """
-    db = get_db()
-    
-    if user_id not in db.get('users', {}):
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    rank, leaderboard = calculate_rank(user_id, db)
-    user_entry = next((entry for entry in leaderboard if entry['user_id'] == user_id), None)
+    user_entry = leaderboard_index.get(user_id)
     
     if not user_entry:
-        raise HTTPException(status_code=404, detail="User not found in leaderboard")
+        raise HTTPException(status_code=404, detail="User not found")
         
     return user_entry
 
@@ -224,28 +335,28 @@ async def register_user(
     user_registration: UserRegistration
 ):
     """Register a new user"""
-    db = get_db()
-    
-    # Check if user already exists
-    if user_registration.user_id in db['users']:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User already exists"
-        )
-    
-    # Create new user
-    user_data = {
-        "current_level": 1,
-        "level_states": {},
-        "passed_levels": [],
-        "failed_levels": [],
-        "registered_at": datetime.utcnow().isoformat(),
-        "initialized": True
-    }
-    
-    # Save the new user without auth token
-    db['users'][user_registration.user_id] = user_data
-    save_db(db)
+    async with user_locks.hold(user_registration.user_id):
+        # Check if user already exists
+        if await run_in_threadpool(storage.has_user, user_registration.user_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="User already exists"
+            )
+        
+        # Create new user
+        user_data = {
+            "current_level": 1,
+            "level_states": {},
+            "passed_levels": [],
+            "failed_levels": [],
+            "registered_at": datetime.utcnow().isoformat(),
+            "initialized": True
+        }
+        
+        # Save the new user without auth token
+        await store_writer.put_user(user_registration.user_id, user_data)
+        if leaderboard_index.update(user_registration.user_id, user_data):
+            leaderboard_broadcaster.notify()
     
     # Generate a new auth token for the response
     auth_token = create_access_token(user_registration.user_id)
@@ -265,68 +376,21 @@ async def register_user(
         auth_token=auth_token
     )
 
+def _check_password_size(password: str) -> str:
+    check_password_size(password)
+    return password
+
+# A password within MAX_PASSWORD_LENGTH characters and MAX_PASSWORD_BYTES bytes
+Password = Annotated[str, Field(max_length=MAX_PASSWORD_LENGTH), AfterValidator(_check_password_size)]
+
 # Request models
 class PasswordSubmit(BaseModel):
     auth_token: str
-    password: str
-
-def calculate_rank(user_id: str, db: dict) -> Tuple[int, List[dict]]:
-    """
-    Calculate ranks for all users based on their scores.
-    Returns the rank of the specified user and the full leaderboard.
-    """
-    # Get all users with their scores
-    leaderboard = []
-    for uid, user_data in db.get('users', {}).items():
-        if not isinstance(user_data, dict):
-            continue
-            
-        try:
-            # Calculate score based on passed levels and current level
-            passed_levels = user_data.get('passed_levels', [])
-            current_level = user_data.get('current_level', 1)  # Default to level 1 if not set
-            
-            # Ensure passed_levels is a list of integers
-            if not isinstance(passed_levels, list):
-                passed_levels = []
-                
-            # Ensure current_level is an integer
-            try:
-                current_level = int(current_level)
-            except (ValueError, TypeError):
-                current_level = 1
-            
-            # Simple scoring: 100 points per level completed + 10 points per level in current level
-            score = (len(passed_levels) * 100) + (current_level * 10)
-            
-            leaderboard.append({
-                'user_id': uid,
-                'score': score,
-                'current_level': current_level,
-                'last_updated': user_data.get('registered_at', datetime.utcnow().isoformat())
-            })
-        except Exception as e:
-            print(f"Error calculating score for user {uid}: {e}")
-            continue
-    
-    # Sort by score (descending) and then by last_updated (ascending for tiebreaker)
-    leaderboard.sort(key=lambda x: (-x['score'], x['last_updated']))
-    
-    # Assign ranks
-    for i, entry in enumerate(leaderboard, 1):
-        entry['rank'] = i
-    
-    # Find the user's rank
-    user_rank = next((entry['rank'] for entry in leaderboard if entry['user_id'] == user_id), None)
-    
-    # Create a copy of leaderboard with current_level as n-1 for consistent display
-    display_leaderboard = []
-    for entry in leaderboard:
-        entry_copy = entry.copy()
-        entry_copy['current_level'] = max(0, entry_copy['current_level'] - 1)  # Show as n-1, min 0
-        display_leaderboard.append(entry_copy)
-    
-    return user_rank or len(leaderboard) + 1, display_leaderboard
+    password: Password
+    mode: Literal["full", "fast"] = Field(
+        "full",
+        description="'fast' checks the current level first and stops at the first failed level"
+    )
 
 class SubmitResponse(BaseModel):
     user_id: str
@@ -358,78 +422,41 @@ async def submit_password(
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    # Get user data
-    db = get_db()
-    if user_id not in db.get('users', {}):
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user_data = db['users'][user_id]
-    current_level = user_data.get("current_level", 1)
-    
-    # Ensure current_level is an integer
-    try:
-        current_level = int(current_level)
-    except (ValueError, TypeError):
-        current_level = 1
-        user_data["current_level"] = current_level
-    
-    # Verify password against levels
-    try:
-        result = level_manager.verify_password(user_id, submit_data.password, current_level)
-    except Exception as e:
-        print(f"Error verifying password: {e}")
-        raise HTTPException(status_code=500, detail="Error verifying password")
-    
-    # Update user data based on verification
-    try:
-        # Ensure passed_levels is a list of integers
-        if 'passed_levels' not in user_data or not isinstance(user_data['passed_levels'], list):
-            user_data['passed_levels'] = []
-        
-        # Get the list of passed levels from the result
-        passed_levels = result.get('passed', [])
-        is_current_level_passed = any(level.get('level') == current_level for level in passed_levels)
-        
-        # Update passed levels if needed
-        if is_current_level_passed:
-            if current_level not in user_data["passed_levels"]:
-                user_data["passed_levels"].append(current_level)
-        else:
-            # Initialize failed_levels if not present
-            if 'failed_levels' not in user_data or not isinstance(user_data['failed_levels'], list):
-                user_data['failed_levels'] = []
-            
-            # Store only the level number in the database if not already passed
-            if current_level not in user_data.get('passed_levels', []) and current_level not in user_data['failed_levels']:
-                user_data['failed_levels'].append(current_level)
-                print(f"Added level {current_level} to failed_levels for user {user_id}")
+    async with user_locks.hold(user_id):
+        # Get user data
+        user_data = await run_in_threadpool(storage.get_user, user_id)
+        if user_data is None:
+            raise HTTPException(status_code=404, detail="User not found")
         
-        # Update user's current level if they passed
-        if is_current_level_passed:
-            new_level = current_level + 1
-            max_level = level_manager.get_max_level() or 1
-            if new_level > max_level:
-                new_level = max_level
-            
-            if new_level > current_level:
-                user_data["current_level"] = new_level
-                current_level = new_level
+        # Verify password against levels; nothing is saved until this completes
+        try:
+            result, user_data = await validate_submission(
+                user_id, user_data, submit_data.password, submit_data.mode
+            )
+        except HTTPException:
+            raise
+        except PasswordTooLarge as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        except Exception:
+            logger.exception("Error verifying password")
+            raise HTTPException(status_code=500, detail="Error verifying password")
         
-        # Update last updated timestamp
-        user_data["last_updated"] = datetime.utcnow().isoformat()
+        is_current_level_passed = result['current_level_passed']
         
-        # Save updated user data
-        db['users'][user_id] = user_data
-        save_db(db)
+        # Save updated user data (the only write for this submission)
+        try:
+            await store_writer.put_user(user_id, user_data)
+        except Exception:
+            logger.exception("Error updating user data")
+            raise HTTPException(status_code=500, detail="Error updating user progress")
         
-    except Exception as e:
-        print(f"Error updating user data: {e}")
-        raise HTTPException(status_code=500, detail="Error updating user progress")
+        if leaderboard_index.update(user_id, user_data):
+            leaderboard_broadcaster.notify()
     
     # Prepare response using the validation results directly
     try:
         # Get the current level number from the validation results
-        current_level_num = result.get('current_level', current_level)
+        current_level_num = result['current_level']
         
         # Get the current level's full information
         current_level_info = level_manager.get_level_info(current_level_num) or {}
@@ -455,64 +482,146 @@ async def submit_password(
             "message": "Password verified successfully" if is_current_level_passed else "Password verification failed"
         }
         
-        # Log the prepared response for debugging
-        print(f"Prepared response: {response}")
+        # Formatted only when debug logging is enabled for this module
+        logger.debug("Prepared response: %s", response)
         return response
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Error preparing response: {e}\n{error_trace}")
+        logger.exception("Error preparing response")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error preparing response: {str(e)}"
         )
 
-@app.get("/exportdb")
-@limiter.limit("10/minute")  # Additional rate limiting for exportdb
-async def export_database(
-    request: Request,  # Required for rate limiting
-    password: str = Query(..., description="Password to access the database")
-):
+def check_admin_password(password: str, unconfigured_detail: str) -> None:
     """
-    Export the database as JSON.
+    Check the password of an admin endpoint against the DB_PWD environment variable.
     
     Args:
-        password: The password to authenticate the request (must match DB_PWD environment variable)
-        
-    Returns:
-        dict: The database content if authentication is successful
+        password: The password sent with the request
+        unconfigured_detail: Error detail if DB_PWD is not set
         
     Raises:
-        HTTPException: If authentication fails
+        HTTPException: 500 if DB_PWD is not set, 401 if the password does not match
     """
-    # Get the password from environment variable
     db_password = os.getenv("DB_PWD")
     
-    # Check if password is set and matches
     if not db_password:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database export is not configured"
+            detail=unconfigured_detail
         )
     
-    if password != db_password:
+    if not secrets.compare_digest(password.encode("utf-8"), db_password.encode("utf-8")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
             headers={"WWW-Authenticate": "Query"},
         )
+
+class BatchItem(BaseModel):
+    user_id: str
+    password: Password
+    level: Optional[int] = Field(
+        None, ge=1, description="Level to validate up to; defaults to the user's current level"
+    )
+
+class BatchValidateRequest(BaseModel):
+    items: List[BatchItem]
+    mode: Literal["full", "fast"] = "full"
+
+@app.post("/admin/validate")
+@limiter.limit("10/minute")
+async def validate_batch(
+    request: Request,  # Required for rate limiting
+    batch: BatchValidateRequest,
+    password: str = Query(..., description="Password to access the admin API")
+):
+    """
+    Validate many passwords without changing any user.
+    
+    Results are streamed as NDJSON, one object per item in request order,
+    with the passed and failed level numbers of each item.
+    
+    Args:
+        batch: The (user_id, password, level) items and validation mode
+        password: The password to authenticate the request (must match DB_PWD environment variable)
+        
+    Returns:
+        StreamingResponse: One JSON object per line
+        
+    Raises:
+        HTTPException: If authentication fails
+    """
+    check_admin_password(password, "Admin API is not configured")
+    
+    items = [(item.user_id, item.password, item.level) for item in batch.items]
+    results = level_manager.validate_batch(items, mode=batch.mode)
+    
+    def lines():
+        for result in results:
+            yield json_dumps(result) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/exportdb")
+@limiter.limit("10/minute")  # Additional rate limiting for exportdb
+async def export_database(
+    request: Request,  # Required for rate limiting
+    password: str = Query(..., description="Password to access the database"),
+    export_format: Literal["json", "ndjson"] = Query(
+        "json", alias="format",
+        description="'json' for the db.json layout, 'ndjson' for one line per user"
+    ),
+    compression: Literal["none", "gzip", "zstd"] = Query("none", description="Compression of the export"),
+    since: Optional[str] = Query(
+        None, description="X-DB-Generation of an earlier export; only export what changed since"
+    )
+):
+    """
+    Export the database.
+    
+    A snapshot of the database is streamed in chunks, so the encoded export
+    is never held in memory. The X-DB-Generation header identifies the
+    snapshot; passing it back as `since` exports only the users changed
+    since then (and '_global' if it changed). X-DB-Incremental tells whether
+    that was possible or the export is complete, e.g. after a restart.
+    
+    Args:
+        password: The password to authenticate the request (must match DB_PWD environment variable)
+        export_format: "json" or "ndjson"
+        compression: "none", "gzip" or "zstd"
+        since: Generation of an earlier export
+        
+    Returns:
+        StreamingResponse: The database content if authentication is successful
+        
+    Raises:
+        HTTPException: If authentication fails or the compression is not available
+    """
+    check_admin_password(password, "Database export is not configured")
     
-    # Return the database content
     try:
-        with open(DB_FILE, 'r') as f:
-            db_content = json.load(f)
-        return db_content
+        generation, db, incremental = await run_in_threadpool(storage.export_snapshot, since)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to read database: {str(e)}"
         )
+    
+    try:
+        chunks = stream_export(db, export_format, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    media_type, filename = export_content_info(export_format, compression)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-DB-Incremental": "true" if incremental else "false",
+    }
+    if generation is not None:
+        headers["X-DB-Generation"] = generation
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,220 @@
+"""
+Metrics Module
+
+This module provides minimal counters and histograms and renders them in
+the Prometheus text exposition format for the /metrics endpoint.
+
+Recording a value is a lock-protected increment; all formatting happens
+when the endpoint is scraped, so metrics cost next to nothing while nobody
+is looking at them.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+# Upper bounds in seconds, from 10 microseconds to 10 seconds
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Increase the count for the given label values."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def drain(self) -> Dict[LabelValues, float]:
+        """Remove and return the counts recorded so far."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        """Add counts returned by drain(), e.g. in another process."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, per label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record one value for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        entry = self._values.get(label_values)
+        return sum(entry[0]) if entry else 0
+
+    def drain(self) -> Dict[LabelValues, Tuple[List[int], List[float]]]:
+        """Remove and return the observations recorded so far."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, Tuple[List[int], List[float]]]) -> None:
+        """Add observations returned by drain(), e.g. in another process."""
+        with self._lock:
+            for key, (counts, total) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+                for index, count in enumerate(counts):
+                    entry[0][index] += count
+                entry[1][0] += total[0]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        names = self.labels + ('le',)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def drain(self) -> Dict[str, Any]:
+        """Remove and return the values of all metrics.
+
+        Worker processes drain their metrics after each task and the parent
+        merges them, so /metrics covers work done in any process.
+        """
+        return {name: metric.drain() for name, metric in self._metrics.items()}
+
+    def merge(self, values: Dict[str, Any]) -> None:
+        """Add values returned by drain() to the metrics of the same name."""
+        for name, metric_values in values.items():
+            if metric_values and name in self._metrics:
+                self._metrics[name].merge(metric_values)
+
+    def reset_locks(self) -> None:
+        """Replace the metric locks; forked children may inherit them held."""
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset_locks)
+
+level_check_seconds = registry.histogram(
+    'password_level_check_seconds', 'Time spent in a level validator', ['level']
+)
+level_results = registry.counter(
+    'password_level_results_total',
+    'Level validation results (pass, fail, error) including cached results', ['level', 'result']
+)
+level_cache_hits = registry.counter(
+    'password_level_cache_hits_total', 'Level results served from the result cache', ['level']
+)
+storage_seconds = registry.histogram(
+    'storage_operation_seconds', 'Time spent reading and writing the database', ['backend', 'operation']
+)
@@ -0,0 +1,101 @@
+"""
+Request Limits Module
+
+This module bounds the size of request bodies, so oversized requests are
+rejected before they are parsed. Password limits are enforced by the
+request models and LevelManager (see MAX_PASSWORD_LENGTH in level_manager).
+
+Limits are set with environment variables:
+- MAX_REQUEST_BYTES: bytes in a request body (default 262144, enough for a
+  password of the maximum size even with every character JSON-escaped)
+- MAX_BATCH_REQUEST_BYTES: bytes in a POST /admin/validate body (default 64 MiB)
+"""
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional
+
+from fastapi import HTTPException, status
+
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', '262144'))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv('MAX_BATCH_REQUEST_BYTES', str(64 * 1024 * 1024)))
+
+
+class RequestTooLarge(HTTPException):
+    """Raised while reading a request body over its limit."""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body is larger than {limit} bytes",
+        )
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware rejecting request bodies over a size limit with 413.
+
+    Requests declaring a larger Content-Length are answered without reading
+    the body; chunked bodies are counted as they arrive and abandoned as soon
+    as they pass the limit, so no handler ever parses an oversized body.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], max_bytes: int = MAX_REQUEST_BYTES,
+                 path_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            app: The wrapped ASGI application
+            max_bytes: Default body limit
+            path_limits: Body limits of specific paths
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: MutableMapping[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope['path'], self.max_bytes)
+        for name, value in scope['headers']:
+            if name == b'content-length' and value.isdigit() and int(value) > limit:
+                await self._reject(send, limit)
+                return
+
+        received = 0
+        started = False
+
+        async def limited_receive() -> MutableMapping[str, Any]:
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise RequestTooLarge(limit)
+            return message
+
+        async def tracking_send(message: MutableMapping[str, Any]) -> None:
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            if started:
+                raise
+            await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send: Callable, limit: int) -> None:
+        body = json.dumps({'detail': f"Request body is larger than {limit} bytes"}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'connection', b'close'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
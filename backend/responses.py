@@ -0,0 +1,18 @@
+"""
+Responses Module
+
+This module provides the response classes of the API. Encoding itself lives
+in the serialization module, which does not depend on the web framework.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with serialization.dumps(), i.e. with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
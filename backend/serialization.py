@@ -0,0 +1,71 @@
+"""
+Serialization Module
+
+This module encodes and decodes JSON with orjson when it is installed and
+with the standard library otherwise, for the database file and for HTTP
+responses (see responses.FastJSONResponse). Output is always compact UTF-8
+bytes.
+
+orjson is optional (pip install orjson, or the "fast" extra). Set
+JSON_BACKEND=stdlib to use the standard library even when it is installed.
+
+orjson is stricter than the standard library: it rejects lone surrogates,
+non-string keys and integers beyond 64 bits. Such values are encoded and
+decoded with the standard library instead, so both backends accept the
+same documents.
+"""
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# 'orjson' or 'stdlib'
+BACKEND = 'orjson' if orjson is not None and os.getenv('JSON_BACKEND', 'auto') != 'stdlib' else 'stdlib'
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(',', ':')).encode('ascii')
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as compact JSON.
+
+    Args:
+        obj: JSON-compatible object
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+
+    Raises:
+        TypeError: If the object is not JSON serializable
+    """
+    if BACKEND == 'orjson':
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Decode JSON.
+
+    Args:
+        data: UTF-8 encoded JSON, as bytes or str
+
+    Returns:
+        The decoded object
+
+    Raises:
+        json.JSONDecodeError: If the data is not valid JSON
+    """
+    if BACKEND == 'orjson':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
@@ -0,0 +1,1138 @@
+"""
+Storage Module
+
+This module provides the persistence layer for users, their level states and
+the global level data. The rest of the backend talks to a BaseStorage
+implementation instead of reading and writing db.json directly.
+
+Three implementations are available:
+- JSONFileStorage keeps the original single db.json file layout
+- SQLiteStorage keeps one row per user in a WAL-mode SQLite database
+- JournalStorage keeps the database in memory and appends every change to a
+  journal next to a db.json snapshot, compacting it in the background
+
+The backend is selected with the DB_BACKEND environment variable ("json",
+"sqlite" or "journal") and the file location with DB_PATH. By default the
+json and sqlite backends are wrapped in a CachedStorage that keeps the
+database in memory and persists changes according to DB_DURABILITY.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional, Iterator, Set, Tuple
+
+import serialization
+from metrics import storage_seconds
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_PATHS = {
+    'json': os.path.join(BASE_DIR, 'db.json'),
+    'sqlite': os.path.join(BASE_DIR, 'db.sqlite3'),
+    # The journal backend's snapshot is a regular db.json
+    'journal': os.path.join(BASE_DIR, 'db.json'),
+}
+
+
+def empty_db() -> Dict[str, Any]:
+    """Return a new, empty database with the expected structure."""
+    return {'_global': {'levels': {}}, 'users': {}}
+
+
+def normalize_db(db: Any) -> Dict[str, Any]:
+    """Make sure a loaded database has the '_global' and 'users' sections.
+
+    Args:
+        db: The decoded database content
+
+    Returns:
+        Dict with a '_global' dict (containing 'levels') and a 'users' dict
+    """
+    if not isinstance(db, dict):
+        return empty_db()
+    if '_global' not in db or not isinstance(db['_global'], dict):
+        db['_global'] = {'levels': {}}
+    if not isinstance(db['_global'].get('levels'), dict):
+        db['_global']['levels'] = {}
+    if 'users' not in db or not isinstance(db['users'], dict):
+        db['users'] = {}
+    return db
+
+
+class BaseStorage(ABC):
+    """Base class for all storage backends.
+
+    A storage keeps three kinds of data:
+    - users: one record per user_id (including its 'level_states')
+    - global levels: level metadata under '_global.levels'
+    - any other '_global' keys
+    """
+
+    path: str = ''
+
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a user's record.
+
+        Args:
+            user_id: The user's ID
+
+        Returns:
+            The user record, or None if the user doesn't exist
+        """
+
+    @abstractmethod
+    def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        """Create or replace a user's record.
+
+        Args:
+            user_id: The user's ID
+            data: The full user record
+        """
+
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        """Create or replace several user records in one write.
+
+        Args:
+            users: Mapping of user_id to full user record
+        """
+        for user_id, data in users.items():
+            self.put_user(user_id, data)
+
+    @abstractmethod
+    def iter_users(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over all (user_id, record) pairs."""
+
+    @abstractmethod
+    def get_global(self) -> Dict[str, Any]:
+        """Get the '_global' section, always containing a 'levels' dict."""
+
+    @abstractmethod
+    def save_global(self, data: Dict[str, Any]) -> None:
+        """Update the '_global' section with the given keys.
+
+        Args:
+            data: Keys to merge into '_global'
+        """
+
+    def has_user(self, user_id: str) -> bool:
+        """Check whether a user exists."""
+        return self.get_user(user_id) is not None
+
+    def user_count(self) -> int:
+        """Get the number of stored users."""
+        return sum(1 for _ in self.iter_users())
+
+    def load_all(self) -> Dict[str, Any]:
+        """Load the whole database in the db.json layout."""
+        return {
+            '_global': self.get_global(),
+            'users': dict(self.iter_users()),
+        }
+
+    @abstractmethod
+    def replace_all(self, db: Dict[str, Any]) -> None:
+        """Replace the whole database with the given content.
+
+        Args:
+            db: Database content in the db.json layout
+        """
+
+    def export_snapshot(self, since: Optional[str] = None) -> Tuple[Optional[str], Dict[str, Any], bool]:
+        """Take a consistent snapshot of the database for an export.
+
+        Args:
+            since: Generation token of an earlier export. Storages that track
+                changes then only include the users changed since (and '_global'
+                if it changed)
+
+        Returns:
+            Tuple of (generation token of the snapshot, or None if the storage
+            does not track changes; the snapshot in the db.json layout; whether
+            it only contains the changes since the given token)
+        """
+        return None, self.load_all(), False
+
+    def flush(self) -> None:
+        """Persist any buffered writes."""
+
+    def close(self) -> None:
+        """Release any resources held by the storage."""
+
+
+class JSONFileStorage(BaseStorage):
+    """Storage backed by a single JSON file.
+
+    Every operation reads or rewrites the whole file, exactly like the
+    original db.json handling. It is kept for compatibility and for small
+    deployments.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATHS['json']):
+        self.path = path
+        # Serializes read-modify-write cycles on the file within this process
+        self._lock = threading.RLock()
+        self._ensure_db_exists()
+
+    def _ensure_db_exists(self) -> None:
+        """Ensure the database file exists with proper structure."""
+        if not os.path.exists(self.path):
+            self._save_db(empty_db())
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                db = serialization.loads(f.read())
+        except json.JSONDecodeError:
+            # If file is corrupted, recreate it
+            self._save_db(empty_db())
+            return
+        except Exception as e:
+            logger.error("Error ensuring database structure: %s", e)
+            self._save_db(empty_db())
+            return
+
+        if not isinstance(db, dict):
+            self._save_db(empty_db())
+            return
+
+        updated = False
+        if not isinstance(db.get('_global'), dict) or not isinstance(db['_global'].get('levels'), dict):
+            updated = True
+        if not isinstance(db.get('users'), dict):
+            updated = True
+        db = normalize_db(db)
+
+        # Move any top-level users into the users object
+        for key in list(db.keys()):
+            if key not in ['_global', 'users'] and isinstance(db[key], dict):
+                if 'current_level' in db[key]:  # Likely a user
+                    db['users'][key] = db[key]
+                    del db[key]
+                    updated = True
+
+        if updated:
+            self._save_db(db)
+
+    def _load_db(self) -> Dict[str, Any]:
+        """Load the entire database from disk."""
+        try:
+            with storage_seconds.time('json', 'load'), open(self.path, 'rb') as f:
+                return normalize_db(serialization.loads(f.read()))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return empty_db()
+
+    def _save_db(self, db: Dict[str, Any]) -> None:
+        """Save the entire database to disk."""
+        # Ensure the directory exists
+        db_dir = os.path.dirname(self.path) or '.'
+        os.makedirs(db_dir, exist_ok=True)
+
+        # Write to a unique temporary file first, then atomically replace the
+        # database so concurrent writers never share or delete a temp file
+        fd, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix='.tmp', dir=db_dir)
+        try:
+            with storage_seconds.time('json', 'save'):
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(serialization.dumps(db))
+                os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self._load_db()['users'].get(user_id)
+        return user if isinstance(user, dict) else None
+
+    def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        self.put_users({user_id: data})
+
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            db = self._load_db()
+            db['users'].update(users)
+            self._save_db(db)
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for user_id, data in self._load_db()['users'].items():
+            if isinstance(data, dict):
+                yield user_id, data
+
+    def get_global(self) -> Dict[str, Any]:
+        return self._load_db()['_global']
+
+    def save_global(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            db = self._load_db()
+            db['_global'].update(data)
+            normalize_db(db)
+            self._save_db(db)
+
+    def load_all(self) -> Dict[str, Any]:
+        return self._load_db()
+
+    def replace_all(self, db: Dict[str, Any]) -> None:
+        with self._lock:
+            self._save_db(normalize_db(db))
+
+
+class SQLiteStorage(BaseStorage):
+    """Storage backed by a SQLite database in WAL mode.
+
+    Users, their level states and the global levels live in separate tables
+    so a submission only reads and writes the rows of a single user.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS level_states (
+            user_id TEXT NOT NULL,
+            level TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (user_id, level)
+        );
+        CREATE TABLE IF NOT EXISTS global_levels (
+            level TEXT PRIMARY KEY,
+            info TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS global_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = DEFAULT_PATHS['sqlite'], import_from: Optional[str] = None):
+        """Open (and create if needed) the SQLite database.
+
+        Args:
+            path: Location of the SQLite database file
+            import_from: Optional db.json file imported when the database is empty
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+        if import_from and os.path.exists(import_from) and self.user_count() == 0:
+            self.replace_all(JSONFileStorage(import_from).load_all())
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed statements in a single write transaction."""
+        with self._lock, storage_seconds.time('sqlite', 'save'):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _write_user(self, conn: sqlite3.Connection, user_id: str, data: Dict[str, Any]) -> None:
+        record = dict(data)
+        if 'level_states' in record:
+            level_states = record.pop('level_states') or {}
+        else:
+            # Marks a record without level_states, so it reads back without them
+            record['level_states'] = None
+            level_states = {}
+        conn.execute(
+            "INSERT INTO users (user_id, data) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+            (user_id, json.dumps(record)),
+        )
+        conn.execute("DELETE FROM level_states WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO level_states (user_id, level, state) VALUES (?, ?, ?)",
+            [(user_id, str(level), json.dumps(state)) for level, state in level_states.items()],
+        )
+
+    @staticmethod
+    def _read_user(data: str, level_states: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild a user record from its row and level states."""
+        user = json.loads(data)
+        if 'level_states' in user and user['level_states'] is None:
+            del user['level_states']
+        else:
+            user['level_states'] = level_states
+        return user
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, storage_seconds.time('sqlite', 'load'):
+            row = self._conn.execute(
+                "SELECT data FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            states = self._conn.execute(
+                "SELECT level, state FROM level_states WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return self._read_user(row[0], {level: json.loads(state) for level, state in states})
+
+    def has_user(self, user_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row is not None
+
+    def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            self._write_user(conn, user_id, data)
+
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        with self._transaction() as conn:
+            for user_id, data in users.items():
+                self._write_user(conn, user_id, data)
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock, storage_seconds.time('sqlite', 'load_all'):
+            users = self._conn.execute("SELECT user_id, data FROM users").fetchall()
+            states = self._conn.execute("SELECT user_id, level, state FROM level_states").fetchall()
+
+        level_states: Dict[str, Dict[str, Any]] = {}
+        for user_id, level, state in states:
+            level_states.setdefault(user_id, {})[level] = json.loads(state)
+
+        for user_id, data in users:
+            yield user_id, self._read_user(data, level_states.get(user_id, {}))
+
+    def user_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def get_global(self) -> Dict[str, Any]:
+        with self._lock:
+            levels = self._conn.execute("SELECT level, info FROM global_levels").fetchall()
+            meta = self._conn.execute("SELECT key, value FROM global_meta").fetchall()
+        data = {key: json.loads(value) for key, value in meta}
+        data['levels'] = {level: json.loads(info) for level, info in levels}
+        return data
+
+    def save_global(self, data: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            self._write_global(conn, data)
+
+    def _write_global(self, conn: sqlite3.Connection, data: Dict[str, Any]) -> None:
+        for key, value in data.items():
+            if key == 'levels':
+                if not isinstance(value, dict):
+                    value = {}
+                conn.execute("DELETE FROM global_levels")
+                conn.executemany(
+                    "INSERT INTO global_levels (level, info) VALUES (?, ?)",
+                    [(str(level), json.dumps(info)) for level, info in value.items()],
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO global_meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (key, json.dumps(value)),
+                )
+
+    def replace_all(self, db: Dict[str, Any]) -> None:
+        db = normalize_db(db)
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users")
+            conn.execute("DELETE FROM level_states")
+            conn.execute("DELETE FROM global_meta")
+            self._write_global(conn, db['_global'])
+            for user_id, data in db['users'].items():
+                if isinstance(data, dict):
+                    self._write_user(conn, user_id, data)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ChangeLog:
+    """Generation counter of an in-memory storage, for incremental exports.
+
+    Every write increases the generation, and the log remembers the
+    generation at which each user and the '_global' section last changed.
+    Tokens have the form "<epoch>.<generation>"; the epoch is new whenever
+    the history is lost (a restart or replace_all), so older tokens are not
+    used for incremental exports.
+
+    The owning storage calls the methods with its lock held.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the history and start a new epoch."""
+        self.epoch = secrets.token_hex(8)
+        self.generation = 0
+        self.global_generation = 0
+        # user_id -> generation of the last change, oldest first
+        self._users: 'OrderedDict[str, int]' = OrderedDict()
+
+    @property
+    def token(self) -> str:
+        return f"{self.epoch}.{self.generation}"
+
+    def record_users(self, user_ids: Iterable[str]) -> None:
+        self.generation += 1
+        for user_id in user_ids:
+            self._users[user_id] = self.generation
+            self._users.move_to_end(user_id)
+
+    def record_global(self) -> None:
+        self.generation += 1
+        self.global_generation = self.generation
+
+    def since(self, token: str) -> Optional[Tuple[List[str], bool]]:
+        """Find what changed after the generation of a token.
+
+        Args:
+            token: A token returned earlier by this log
+
+        Returns:
+            Tuple of (changed user_ids, whether '_global' changed), or None if
+            the token is not from the current epoch
+        """
+        epoch, _, generation = token.partition('.')
+        if epoch != self.epoch or not generation.isdigit() or int(generation) > self.generation:
+            return None
+        since = int(generation)
+        changed = []
+        for user_id, user_generation in reversed(self._users.items()):
+            if user_generation <= since:
+                break
+            changed.append(user_id)
+        changed.reverse()
+        return changed, self.global_generation > since
+
+    def snapshot(self, users: Dict[str, Dict[str, Any]], global_data: Dict[str, Any],
+                 since: Optional[str]) -> Tuple[str, Dict[str, Any], bool]:
+        """Build BaseStorage.export_snapshot()'s result for an in-memory database.
+
+        The user records are not copied; the storages replace records instead
+        of modifying them.
+        """
+        changes = self.since(since) if since else None
+        if changes is None:
+            return self.token, {'_global': copy.deepcopy(global_data), 'users': dict(users)}, False
+        user_ids, global_changed = changes
+        db: Dict[str, Any] = {'users': {user_id: users[user_id] for user_id in user_ids}}
+        if global_changed:
+            db['_global'] = copy.deepcopy(global_data)
+        return self.token, db, True
+
+
+class CachedStorage(BaseStorage):
+    """In-memory, authoritative copy of another storage with write-behind.
+
+    All users and the '_global' section are loaded once. Reads are served
+    from memory; writes update memory and are persisted to the wrapped
+    storage according to the durability mode:
+
+    - "sync": every put_user() is written through before returning
+    - "group": changed users are marked dirty and written in one batch every
+      flush_interval seconds or as soon as flush_batch users are dirty
+
+    The cache assumes it is the only writer of the wrapped storage, i.e. a
+    single server process.
+    """
+
+    DURABILITY_MODES = ('sync', 'group')
+
+    def __init__(self, backend: BaseStorage, durability: str = 'sync',
+                 flush_interval: float = 1.0, flush_batch: int = 100):
+        """Load the wrapped storage into memory.
+
+        Args:
+            backend: The storage that persists the data
+            durability: "sync" (write-through) or "group" (group commit)
+            flush_interval: Seconds between group commits
+            flush_batch: Number of dirty users that triggers an early group commit
+        """
+        if durability not in self.DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability!r} (expected 'sync' or 'group')")
+
+        self.backend = backend
+        self.path = backend.path
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.flush_batch = max(1, flush_batch)
+
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict[str, Any]] = dict(backend.iter_users())
+        self._global: Dict[str, Any] = backend.get_global()
+        self._dirty: Set[str] = set()
+        self.changes = ChangeLog()
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if durability == 'group':
+            self._flusher = threading.Thread(target=self._flush_loop, name='db-flusher', daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        """Background thread performing group commits."""
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error flushing database")
+
+    def flush(self) -> None:
+        """Write all dirty users to the wrapped storage."""
+        with self._lock:
+            if not self._dirty:
+                return
+            batch = {user_id: self._users[user_id] for user_id in self._dirty}
+            self._dirty = set()
+        try:
+            with storage_seconds.time('cache', 'flush'):
+                self.backend.put_users(batch)
+        except Exception:
+            # Keep the users dirty so the next flush retries them
+            with self._lock:
+                self._dirty.update(batch)
+            raise
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            user = self._users.get(user_id)
+        return copy.deepcopy(user) if user is not None else None
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        self.put_users({user_id: data})
+
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        users = copy.deepcopy(users)
+        with self._lock:
+            if self.durability == 'sync':
+                # Persist first, so a failed write never shows up in later reads
+                self.backend.put_users(users)
+            self._users.update(users)
+            self.changes.record_users(users)
+            if self.durability == 'sync':
+                return
+            self._dirty.update(users)
+            batch_full = len(self._dirty) >= self.flush_batch
+        if batch_full:
+            self._wakeup.set()
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over all (user_id, record) pairs.
+
+        The records are the cached objects themselves and must not be modified.
+        """
+        with self._lock:
+            users = list(self._users.items())
+        return iter(users)
+
+    def user_count(self) -> int:
+        return len(self._users)
+
+    def get_global(self) -> Dict[str, Any]:
+        with self._lock:
+            return copy.deepcopy(self._global)
+
+    def save_global(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self.backend.save_global(data)
+            self._global.update(copy.deepcopy(data))
+            self.changes.record_global()
+
+    def load_all(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                '_global': copy.deepcopy(self._global),
+                'users': dict(self._users),
+            }
+
+    def replace_all(self, db: Dict[str, Any]) -> None:
+        db = copy.deepcopy(normalize_db(db))
+        with self._lock:
+            self.backend.replace_all(db)
+            self._users = {user_id: data for user_id, data in db['users'].items()
+                           if isinstance(data, dict)}
+            self._global = db['_global']
+            self._dirty = set()
+            self.changes.reset()
+
+    def export_snapshot(self, since: Optional[str] = None) -> Tuple[Optional[str], Dict[str, Any], bool]:
+        with self._lock:
+            return self.changes.snapshot(self._users, self._global, since)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        self.flush()
+        self.backend.close()
+
+
+class JournalStorage(BaseStorage):
+    """In-memory database persisted as a snapshot plus an append-only journal.
+
+    The snapshot is a db.json file (the JSONFileStorage layout). Every write
+    appends one line per changed user to "<path>.journal" holding only what
+    changed: the modified fields, the modified level states and a
+    timestamp. Writing a user therefore costs the size of the change, not
+    the size of the database.
+
+    At startup the snapshot is loaded and the journal replayed on top of it.
+    A background thread compacts the journal every compact_interval seconds
+    (or once it exceeds compact_bytes) by writing a fresh snapshot and
+    starting an empty journal.
+
+    The journal is fsynced according to the durability mode:
+
+    - "sync": put_user() returns once its record is on disk; concurrent
+      writers share one fsync (group commit)
+    - "group": the journal is fsynced every flush_interval seconds, so a
+      power loss can lose the last interval (a crashed process loses nothing)
+
+    Records carry a sequence number; the snapshot stores the last one it
+    contains, so records already in the snapshot are skipped on replay.
+    Like CachedStorage, this assumes a single server process.
+    """
+
+    DURABILITY_MODES = ('sync', 'group')
+
+    def __init__(self, path: str = DEFAULT_PATHS['journal'], durability: str = 'sync',
+                 flush_interval: float = 1.0, compact_interval: float = 300.0,
+                 compact_bytes: int = 64 * 1024 * 1024):
+        """Load the snapshot, replay the journal and start the background thread.
+
+        Args:
+            path: Location of the snapshot file; the journal is "<path>.journal"
+            durability: "sync" (fsync per write) or "group" (periodic fsync)
+            flush_interval: Seconds between background fsyncs and compaction checks
+            compact_interval: Seconds between compactions; 0 only compacts by size
+            compact_bytes: Journal size that triggers a compaction
+        """
+        if durability not in self.DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability!r} (expected 'sync' or 'group')")
+
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        # Journal being compacted into a new snapshot
+        self._rotated_path = f"{self.journal_path}.old"
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+
+        # Lock order: _compact_lock, then _sync_lock, then _lock
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+
+        with storage_seconds.time('journal', 'load'):
+            db = self._load_snapshot()
+            self._seq: int = db.pop('_seq', 0) if isinstance(db.get('_seq'), int) else 0
+            self._users: Dict[str, Dict[str, Any]] = {
+                user_id: data for user_id, data in db['users'].items() if isinstance(data, dict)
+            }
+            self._global: Dict[str, Any] = db['_global']
+            replayed = self._replay(self._rotated_path) + self._replay(self.journal_path)
+        self._synced_seq = self._seq
+        self._last_compaction = time.monotonic()
+        self.changes = ChangeLog()
+        self._file = open(self.journal_path, 'ab')
+        self._journal_bytes = self._file.tell()
+
+        if self._journal_bytes or os.path.exists(self._rotated_path):
+            # Also drops a partially written last record before anything is appended
+            logger.info("Replayed %d journal records into %s", replayed, path)
+            self.compact()
+
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._background_loop, name='db-journal', daemon=True)
+        self._worker.start()
+        # A clean shutdown leaves an up-to-date snapshot and an empty journal
+        atexit.register(self.close)
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last write; increases with every change."""
+        return self._seq
+
+    def _load_snapshot(self) -> Dict[str, Any]:
+        """Read the snapshot file as it is; a missing file is an empty database.
+
+        Unlike JSONFileStorage, a snapshot that cannot be decoded is neither
+        repaired nor replaced: it holds every user not in the journal.
+
+        Raises:
+            ValueError: If the snapshot is not a valid database
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return empty_db()
+        try:
+            db = serialization.loads(data)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Corrupted database snapshot {self.path}: {e}") from e
+        if not isinstance(db, dict):
+            raise ValueError(f"Corrupted database snapshot {self.path}: not a JSON object")
+        return normalize_db(db)
+
+    def _replay(self, journal_path: str) -> int:
+        """Apply the records of a journal file that are newer than the snapshot.
+
+        Args:
+            journal_path: The journal file to replay
+
+        Returns:
+            int: Number of records applied
+        """
+        try:
+            with open(journal_path, 'rb') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return 0
+
+        applied = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                record = serialization.loads(line)
+            except json.JSONDecodeError:
+                if number == len(lines):
+                    # The process died while appending; the write never completed
+                    logger.warning("Ignoring incomplete last record of %s", journal_path)
+                else:
+                    logger.error("Skipping corrupted record %d of %s", number, journal_path)
+                continue
+            if not isinstance(record, dict) or record.get('seq', 0) <= self._seq:
+                continue
+            self._apply(record)
+            self._seq = record['seq']
+            applied += 1
+        return applied
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Apply one journal record to the in-memory database."""
+        if 'global' in record:
+            self._global.update(record['global'])
+            if not isinstance(self._global.get('levels'), dict):
+                self._global['levels'] = {}
+            return
+
+        user = self._users.setdefault(record['user'], {})
+        user.update(record.get('set', {}))
+        for key in record.get('unset', ()):
+            user.pop(key, None)
+        if 'states' in record or 'unset_states' in record:
+            if not isinstance(user.get('level_states'), dict):
+                user['level_states'] = {}
+            user['level_states'].update(record.get('states', {}))
+            for level in record.get('unset_states', ()):
+                user['level_states'].pop(level, None)
+
+    @staticmethod
+    def _user_delta(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe the change from one user record to another.
+
+        Args:
+            old: The current record, or None for a new user
+            new: The record being written
+
+        Returns:
+            Dict with the changed fields ('set'), removed fields ('unset'), changed
+            level states ('states') and removed level states ('unset_states');
+            empty parts are omitted
+        """
+        old = old or {}
+        old_states, new_states = old.get('level_states'), new.get('level_states')
+        # Level states are diffed per level only if both records have them;
+        # otherwise the whole field is set or unset like any other
+        per_level = isinstance(old_states, dict) and isinstance(new_states, dict)
+        skip = ('level_states',) if per_level else ()
+
+        delta: Dict[str, Any] = {
+            'set': {key: value for key, value in new.items()
+                    if key not in skip and (key not in old or old[key] != value)},
+            'unset': [key for key in old if key not in new],
+        }
+        if per_level:
+            delta['states'] = {level: state for level, state in new_states.items()
+                               if level not in old_states or old_states[level] != state}
+            delta['unset_states'] = [level for level in old_states if level not in new_states]
+        return {key: value for key, value in delta.items() if value}
+
+    def _append(self, records: List[Dict[str, Any]]) -> int:
+        """Write records to the journal; must be called with _lock held.
+
+        Returns:
+            int: Sequence number of the last record
+        """
+        lines = []
+        for record in records:
+            self._seq += 1
+            lines.append(serialization.dumps({'seq': self._seq, 'ts': time.time(), **record}))
+        if lines:
+            data = b'\n'.join(lines) + b'\n'
+            with storage_seconds.time('journal', 'append'):
+                self._file.write(data)
+                # Hand the records to the OS so a crashed process loses nothing
+                self._file.flush()
+            self._journal_bytes += len(data)
+        return self._seq
+
+    def _sync(self, seq: int) -> None:
+        """Make sure the journal is on disk up to the given sequence number.
+
+        Writers waiting at the same time are covered by a single fsync.
+        """
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            with self._lock:
+                target = self._seq
+                fileno = self._file.fileno()
+            with storage_seconds.time('journal', 'fsync'):
+                os.fsync(fileno)
+            self._synced_seq = target
+
+    def flush(self) -> None:
+        """Fsync all journal records written so far."""
+        self._sync(self._seq)
+
+    def _background_loop(self) -> None:
+        """Background thread performing periodic fsyncs and compactions."""
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                if self.durability == 'group':
+                    self.flush()
+                if self._should_compact():
+                    self.compact()
+            except Exception:
+                logger.exception("Error maintaining database journal")
+
+    def _should_compact(self) -> bool:
+        if self._journal_bytes == 0:
+            return False
+        if self._journal_bytes >= self.compact_bytes:
+            return True
+        return self.compact_interval > 0 and time.monotonic() - self._last_compaction >= self.compact_interval
+
+    def _rotate(self) -> bytes:
+        """Start a new journal; must be called with _sync_lock and _lock held.
+
+        The previous journal is kept as "<journal>.old" until the snapshot
+        returned here has been written.
+
+        Returns:
+            bytes: The encoded snapshot matching the end of the previous journal
+        """
+        snapshot = serialization.dumps({'_global': self._global, 'users': self._users, '_seq': self._seq})
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if os.path.exists(self._rotated_path):
+            # An earlier compaction failed; its records are not in a snapshot yet
+            with open(self.journal_path, 'rb') as src, open(self._rotated_path, 'ab') as dst:
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self._rotated_path)
+        self._file = open(self.journal_path, 'ab')
+        self._synced_seq = self._seq
+        self._journal_bytes = 0
+        return snapshot
+
+    def _write_snapshot(self, snapshot: bytes) -> None:
+        """Durably replace the snapshot and drop the journal it includes."""
+        db_dir = os.path.dirname(self.path) or '.'
+        fd, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix='.tmp', dir=db_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.remove(self._rotated_path)
+        # Make the new snapshot and the journal changes durable
+        dir_fd = os.open(db_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self._last_compaction = time.monotonic()
+
+    def compact(self) -> None:
+        """Write a fresh snapshot and start an empty journal.
+
+        Writers are only blocked while the snapshot is encoded, not while it
+        is written to disk.
+        """
+        with self._compact_lock:
+            with self._sync_lock, self._lock:
+                if self._journal_bytes == 0 and not os.path.exists(self._rotated_path):
+                    return
+                with storage_seconds.time('journal', 'compact'):
+                    snapshot = self._rotate()
+            with storage_seconds.time('journal', 'compact'):
+                self._write_snapshot(snapshot)
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            user = self._users.get(user_id)
+            return copy.deepcopy(user) if user is not None else None
+
+    def has_user(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def put_user(self, user_id: str, data: Dict[str, Any]) -> None:
+        self.put_users({user_id: data})
+
+    def put_users(self, users: Dict[str, Dict[str, Any]]) -> None:
+        users = copy.deepcopy(users)
+        with self._lock:
+            records = []
+            for user_id, data in users.items():
+                delta = self._user_delta(self._users.get(user_id), data)
+                if delta or user_id not in self._users:
+                    records.append({'user': user_id, **delta})
+            seq = self._append(records)
+            self._users.update(users)
+            self.changes.record_users(users)
+        if self.durability == 'sync':
+            self._sync(seq)
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over all (user_id, record) pairs.
+
+        The records are the in-memory objects themselves and must not be modified.
+        """
+        with self._lock:
+            users = list(self._users.items())
+        return iter(users)
+
+    def user_count(self) -> int:
+        return len(self._users)
+
+    def get_global(self) -> Dict[str, Any]:
+        with self._lock:
+            return copy.deepcopy(self._global)
+
+    def save_global(self, data: Dict[str, Any]) -> None:
+        data = copy.deepcopy(data)
+        with self._lock:
+            seq = self._append([{'global': data}])
+            self._apply({'global': data})
+            self.changes.record_global()
+        if self.durability == 'sync':
+            self._sync(seq)
+
+    def load_all(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                '_global': copy.deepcopy(self._global),
+                'users': dict(self._users),
+            }
+
+    def replace_all(self, db: Dict[str, Any]) -> None:
+        db = copy.deepcopy(normalize_db(db))
+        with self._compact_lock:
+            with self._sync_lock, self._lock:
+                self._users = {user_id: data for user_id, data in db['users'].items()
+                               if isinstance(data, dict)}
+                self._global = db['_global']
+                self._seq += 1
+                self.changes.reset()
+                # Writes wait until the new content is in the snapshot
+                self._write_snapshot(self._rotate())
+
+    def export_snapshot(self, since: Optional[str] = None) -> Tuple[Optional[str], Dict[str, Any], bool]:
+        with self._lock:
+            return self.changes.snapshot(self._users, self._global, since)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._stopped.set()
+        if self._worker is not threading.current_thread():
+            self._worker.join(timeout=5)
+        self.compact()
+        with self._lock:
+            self._file.close()
+
+
+def create_storage(backend: Optional[str] = None, path: Optional[str] = None,
+                   cache: Optional[bool] = None) -> BaseStorage:
+    """Create the storage backend selected by configuration.
+
+    Args:
+        backend: "json", "sqlite" or "journal"; defaults to the DB_BACKEND environment variable
+        path: Database location; defaults to DB_PATH or the backend's default file
+        cache: Keep the database in memory (CachedStorage); defaults to DB_CACHE.
+            Ignored by the journal backend, which always keeps it in memory
+
+    Returns:
+        BaseStorage: The configured storage instance
+    """
+    backend = (backend or os.getenv("DB_BACKEND", "json")).lower()
+    path = path or os.getenv("DB_PATH") or DEFAULT_PATHS.get(backend)
+
+    if backend == 'json':
+        storage: BaseStorage = JSONFileStorage(path)
+    elif backend == 'sqlite':
+        # Import an existing db.json the first time the SQLite store is used
+        storage = SQLiteStorage(path, import_from=DEFAULT_PATHS['json'])
+    elif backend == 'journal':
+        return JournalStorage(
+            path,
+            durability=os.getenv("DB_DURABILITY", "sync").lower(),
+            flush_interval=float(os.getenv("DB_FLUSH_INTERVAL", "1.0")),
+            compact_interval=float(os.getenv("DB_COMPACT_INTERVAL", "300")),
+            compact_bytes=int(os.getenv("DB_COMPACT_BYTES", str(64 * 1024 * 1024))),
+        )
+    else:
+        raise ValueError(f"Unknown DB_BACKEND: {backend!r} (expected 'json', 'sqlite' or 'journal')")
+
+    if cache is None:
+        cache = os.getenv("DB_CACHE", "1").lower() not in ('0', 'false', 'no')
+    if not cache:
+        return storage
+
+    return CachedStorage(
+        storage,
+        durability=os.getenv("DB_DURABILITY", "sync").lower(),
+        flush_interval=float(os.getenv("DB_FLUSH_INTERVAL", "1.0")),
+        flush_batch=int(os.getenv("DB_FLUSH_BATCH", "100")),
+    )
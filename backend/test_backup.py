@@ -0,0 +1,149 @@
+"""
+Test Script for Incremental Backups
+
+This script checks that backup_db.py stores a full backup followed by
+incremental ones, skips intervals without changes, starts a new chain when
+needed and restores a db.json from the chain. Exports are fetched from the
+app through a TestClient instead of a running server.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import backup_db
+from main import app, limiter, storage
+
+class ClientResponse:
+    """The parts of a streamed requests.Response that backup_db uses."""
+
+    def __init__(self, response):
+        self.response = response
+        self.headers = response.headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+    def iter_content(self, chunk_size):
+        content = self.response.content
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+class TestBackups(unittest.TestCase):
+    def setUp(self):
+        limiter.enabled = False
+        self.client = TestClient(app)
+        self.tmp = tempfile.mkdtemp()
+        patches = [
+            mock.patch.dict(os.environ, {"DB_PWD": "secret"}),
+            mock.patch.object(backup_db, "DB_EXPORT_PASSWORD", "secret"),
+            mock.patch.object(backup_db, "BACKUP_DIR", self.tmp),
+            mock.patch.object(backup_db.requests, "get", self.get),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.state = {}
+        self.requests = []
+
+    def tearDown(self):
+        limiter.enabled = True
+        shutil.rmtree(self.tmp)
+
+    def get(self, url, params, **kwargs):
+        self.requests.append(params)
+        return ClientResponse(self.client.get("/exportdb", params=params))
+
+    def backup(self):
+        with mock.patch("builtins.print"):
+            return backup_db.download_backup(self.state)
+
+    def put(self, user_id, level):
+        storage.put_user(user_id, {"current_level": level, "passed_levels": [], "failed_levels": [],
+                                   "level_states": {"1": {"attempts": level}}})
+
+    def kinds(self):
+        return [kind for _, kind, _ in backup_db.list_backups(self.tmp)]
+
+    def restored(self, at=None):
+        output = os.path.join(self.tmp, "db.json")
+        backup_db.restore(output, at)
+        with open(output) as f:
+            return json.load(f)
+
+    def test_chain_and_restore(self):
+        self.put("backup_alice", 1)
+        full = self.backup()
+        self.assertTrue(full.endswith(".full.ndjson.gz"))
+        self.assertNotIn("since", self.requests[0])
+        generation = self.state["generation"]
+
+        self.put("backup_bob", 2)
+        delta = self.backup()
+        self.assertTrue(delta.endswith(".delta.ndjson.gz"))
+        self.assertEqual(self.requests[1]["since"], generation)
+        users = [record["user_id"] for record in backup_db.read_backup(delta) if "user_id" in record]
+        self.assertEqual(users, ["backup_bob"])
+
+        # Nothing changed: nothing is stored
+        self.assertEqual(self.backup(), "")
+        self.put("backup_alice", 3)
+        self.backup()
+        self.assertEqual(self.kinds(), ["full", "delta", "delta"])
+
+        db = self.restored()
+        self.assertEqual(db, json.loads(json.dumps(storage.load_all())))
+        self.assertEqual(db["users"]["backup_alice"]["current_level"], 3)
+
+    def test_identical_delta_is_skipped(self):
+        self.put("backup_carol", 1)
+        self.backup()
+        self.put("backup_carol", 2)
+        self.backup()
+        # Written again with the same content as the last delta
+        self.put("backup_carol", 2)
+        self.assertEqual(self.backup(), "")
+        self.assertEqual(self.kinds(), ["full", "delta"])
+
+    def test_json_format(self):
+        with mock.patch.object(backup_db, "BACKUP_FORMAT", "json"):
+            self.put("backup_erin", 1)
+            self.assertTrue(self.backup().endswith(".full.json.gz"))
+            # A json delta without changes is {"users":{}}, which is not stored
+            self.assertEqual(self.backup(), "")
+            self.put("backup_erin", 2)
+            delta = self.backup()
+        self.assertTrue(delta.endswith(".delta.json.gz"))
+        self.assertEqual(self.kinds(), ["full", "delta"])
+        self.assertEqual(self.restored()["users"]["backup_erin"]["current_level"], 2)
+
+    def test_new_chain(self):
+        self.backup()
+        with mock.patch.object(backup_db, "BACKUP_FULL_EVERY", 1):
+            self.put("backup_dave", 1)
+            self.backup()
+            self.put("backup_dave", 2)
+            self.backup()
+        self.assertEqual(self.kinds(), ["full", "delta", "full"])
+
+        # A server restart (new generation epoch) also starts a new chain
+        self.state["generation"] = "restarted.5"
+        self.put("backup_dave", 3)
+        self.backup()
+        self.assertEqual(self.kinds(), ["full", "delta", "full", "full"])
+        self.assertEqual(self.restored()["users"]["backup_dave"]["current_level"], 3)
+
+    def test_restore_without_full_backup(self):
+        with self.assertRaises(RuntimeError):
+            backup_db.restore(os.path.join(self.tmp, "db.json"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Test Script for Batch Validation
+
+This script checks LevelManager.validate_batch() in-process and in worker
+processes, and the NDJSON /admin/validate endpoint.
+"""
+import json
+import os
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from level_manager import level_manager
+from levels.base_level import BaseLevel
+from levels.registry import LevelRegistry
+from main import app, limiter, storage
+
+class SecretWordLevel(BaseLevel):
+    """A stateful level: the password must contain the word in the user's level_state."""
+    stateful = True
+
+    def __init__(self):
+        super().__init__(level_id=1, level_desc="Contains your secret word")
+
+    def is_valid(self, password, level_state):
+        return "word" in level_state and level_state["word"] in password
+
+ITEMS = [
+    ("alice", "welcome123", 1),
+    ("bob", "nope", 1),
+    ("carol", "welcome123", 3),
+    ("dave", "welcome123", None),
+]
+
+class TestValidateBatch(unittest.TestCase):
+    def expected(self):
+        return [
+            level_manager.evaluate_password(user_id, password, level or 1, "full", index)
+            for index, (user_id, password, level) in enumerate(ITEMS)
+        ]
+
+    def test_in_process(self):
+        results = list(level_manager.validate_batch(ITEMS, workers=1))
+        self.assertEqual(results, self.expected())
+        self.assertEqual(results[0]["passed"], [1])
+        self.assertTrue(results[0]["current_level_passed"])
+        self.assertEqual(results[1]["failed"], [1])
+        self.assertEqual(results[2]["failed"], [3])
+        self.assertEqual(results[3]["level"], 1)
+
+    def test_worker_processes(self):
+        items = ITEMS * 20
+        results = list(level_manager.validate_batch(items, workers=2, chunk_size=7))
+        self.assertEqual([result["index"] for result in results], list(range(len(items))))
+        self.assertEqual(results[:len(ITEMS)], self.expected())
+
+    def test_does_not_touch_storage(self):
+        with mock.patch.object(level_manager.storage, "put_user") as put_user:
+            list(level_manager.validate_batch(ITEMS, workers=1))
+        put_user.assert_not_called()
+
+    def test_stateful_level_uses_stored_record(self):
+        entry = {"module": "", "level_id": 1, "description": "Contains your secret word",
+                 "has_state": True, "stateful": True}
+        registry = LevelRegistry({1: entry}, {1: (SecretWordLevel(), {})})
+        record = {"current_level": 1, "passed_levels": [], "failed_levels": [],
+                  "level_states": {"1": {"word": "parrot", "attempts": 4}}}
+        storage.put_user("batch_stateful", record)
+        items = [("batch_stateful", "blue parrot", None), ("batch_stateful", "blue", 1),
+                 ("batch_stateful_unknown", "blue parrot", 1)]
+        with mock.patch.object(level_manager, "levels", registry):
+            results = list(level_manager.validate_batch(items, workers=1))
+            self.assertEqual(results[:2], [level_manager.evaluate_password(user_id, password, 1, "full", index)
+                                           for index, (user_id, password, _) in enumerate(items[:2])])
+        self.assertEqual([result["passed"] for result in results], [[1], [], []])
+        # The stored record is only read
+        self.assertEqual(storage.get_user("batch_stateful"), record)
+        self.assertIsNone(storage.get_user("batch_stateful_unknown"))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            list(level_manager.validate_batch(ITEMS, mode="slow"))
+
+class TestValidateEndpoint(unittest.TestCase):
+    def setUp(self):
+        limiter.enabled = False
+        self.client = TestClient(app)
+        self.body = {"items": [{"user_id": u, "password": p, "level": l} for u, p, l in ITEMS]}
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_streams_ndjson(self):
+        with mock.patch.dict(os.environ, {"DB_PWD": "secret", "BATCH_WORKERS": "1"}):
+            response = self.client.post("/admin/validate", params={"password": "secret"}, json=self.body)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["index"] for line in lines], [0, 1, 2, 3])
+        self.assertEqual(lines[0]["passed"], [1])
+
+    def test_requires_password(self):
+        with mock.patch.dict(os.environ, {"DB_PWD": "secret"}):
+            response = self.client.post("/admin/validate", params={"password": "wrong"}, json=self.body)
+        self.assertEqual(response.status_code, 401)
+
+    def test_not_configured(self):
+        with mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("DB_PWD", None)
+            response = self.client.post("/admin/validate", params={"password": "x"}, json=self.body)
+        self.assertEqual(response.status_code, 500)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Test Script for Database Export
+
+This script checks that the streamed export formats decode to the database
+they were made from, that the output is sent in bounded chunks, and the
+/exportdb endpoint's formats and compression.
+"""
+import gzip
+import json
+import os
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import export
+from export import content_info, read_ndjson, stream_export
+from main import app, limiter, storage
+
+DB = {
+    "_global": {"levels": {"1": {"name": "Level 1"}}},
+    "users": {
+        f"user{i}": {"current_level": i % 7 + 1, "level_states": {"1": {"attempts": i}}, "name": "💀"}
+        for i in range(3000)
+    },
+}
+
+class TestStreamExport(unittest.TestCase):
+    def test_json(self):
+        chunks = list(stream_export(DB))
+        self.assertEqual(json.loads(b"".join(chunks)), DB)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) < 2 * export.CHUNK_BYTES for chunk in chunks))
+
+    def test_json_empty(self):
+        db = {"_global": {"levels": {}}, "users": {}}
+        self.assertEqual(json.loads(b"".join(stream_export(db))), db)
+
+    def test_ndjson(self):
+        data = b"".join(stream_export(DB, "ndjson"))
+        lines = data.splitlines()
+        self.assertEqual(len(lines), len(DB["users"]) + 1)
+        self.assertEqual(json.loads(lines[1]), {"user_id": "user0", "data": DB["users"]["user0"]})
+        self.assertEqual(read_ndjson(lines), DB)
+
+    def test_gzip(self):
+        data = b"".join(stream_export(DB, "ndjson", "gzip"))
+        self.assertEqual(read_ndjson(gzip.decompress(data).splitlines()), DB)
+
+    @unittest.skipIf(export.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        data = b"".join(stream_export(DB, "json", "zstd"))
+        self.assertEqual(json.loads(export.zstandard.ZstdDecompressor().decompressobj().decompress(data)), DB)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            stream_export(DB, "xml")
+        with self.assertRaises(ValueError):
+            stream_export(DB, "json", "brotli")
+        with mock.patch.object(export, "zstandard", None), self.assertRaises(ValueError):
+            stream_export(DB, "json", "zstd")
+
+    def test_content_info(self):
+        self.assertEqual(content_info("json", "none"), ("application/json", "db.json"))
+        self.assertEqual(content_info("ndjson", "gzip"), ("application/gzip", "db.ndjson.gz"))
+
+class TestExportEndpoint(unittest.TestCase):
+    def setUp(self):
+        limiter.enabled = False
+        self.client = TestClient(app)
+        self.env = mock.patch.dict(os.environ, {"DB_PWD": "secret"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        limiter.enabled = True
+
+    def test_json(self):
+        response = self.client.get("/exportdb", params={"password": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), json.loads(json.dumps(storage.load_all())))
+
+    def test_ndjson_gzip(self):
+        response = self.client.get("/exportdb", params={"password": "secret", "format": "ndjson",
+                                                        "compression": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/gzip")
+        self.assertIn('filename="db.ndjson.gz"', response.headers["content-disposition"])
+        db = read_ndjson(gzip.decompress(response.content).splitlines())
+        self.assertEqual(set(db["users"]), {user_id for user_id, _ in storage.iter_users()})
+
+    def test_zstd_not_available(self):
+        with mock.patch.object(export, "zstandard", None):
+            response = self.client.get("/exportdb", params={"password": "secret", "compression": "zstd"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_password(self):
+        response = self.client.get("/exportdb", params={"password": "wrong"})
+        self.assertEqual(response.status_code, 401)
+
+if __name__ == "__main__":
+    unittest.main()
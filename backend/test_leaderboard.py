@@ -0,0 +1,121 @@
+"""
+Test Script for the Leaderboard Index
+
+This script checks that the incrementally maintained ranking matches a full
+recompute of all users and that streaming clients receive its changes.
+"""
+import asyncio
+import json
+import random
+import unittest
+from leaderboard import LeaderboardIndex, LeaderboardBroadcaster, compute_score
+
+def make_user(passed: int, registered_at: str) -> dict:
+    return {
+        "current_level": passed + 1,
+        "passed_levels": list(range(1, passed + 1)),
+        "failed_levels": [],
+        "registered_at": registered_at,
+    }
+
+def full_ranking(users: dict) -> list:
+    """Rank users the way the original full recompute did."""
+    ranked = sorted(
+        users.items(),
+        key=lambda item: (-compute_score(item[1])[0], item[1]["registered_at"], item[0])
+    )
+    return [user_id for user_id, _ in ranked]
+
+class TestLeaderboardIndex(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.users = {
+            f"user{i}": make_user(rng.randint(0, 20), f"2025-01-01T00:00:{rng.randint(0, 59):02d}")
+            for i in range(200)
+        }
+        self.index = LeaderboardIndex()
+        self.index.rebuild(self.users.items())
+
+    def test_rebuild_matches_full_ranking(self):
+        page = self.index.page(limit=len(self.users))
+        self.assertEqual([entry["user_id"] for entry in page], full_ranking(self.users))
+        self.assertEqual([entry["rank"] for entry in page], list(range(1, len(self.users) + 1)))
+
+    def test_incremental_updates(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            user_id = f"user{rng.randrange(250)}"
+            self.users[user_id] = make_user(rng.randint(0, 20), "2025-01-01T00:00:00")
+            self.index.update(user_id, self.users[user_id])
+
+        expected = full_ranking(self.users)
+        self.assertEqual(len(self.index), len(self.users))
+        self.assertEqual([entry["user_id"] for entry in self.index.page(limit=len(expected))], expected)
+        for rank, user_id in enumerate(expected, 1):
+            self.assertEqual(self.index.rank(user_id), rank)
+
+    def test_page_and_get(self):
+        expected = full_ranking(self.users)
+        page = self.index.page(limit=10, offset=20)
+        self.assertEqual([entry["user_id"] for entry in page], expected[20:30])
+        self.assertEqual(page[0]["rank"], 21)
+
+        entry = self.index.get(expected[5])
+        self.assertEqual(entry["rank"], 6)
+        self.assertEqual(entry["current_level"], self.users[expected[5]]["current_level"] - 1)
+        self.assertIsNone(self.index.get("nobody"))
+
+    def test_generation_changes_only_on_change(self):
+        generation = self.index.generation
+        self.assertFalse(self.index.update("user0", self.users["user0"]))
+        self.assertEqual(self.index.generation, generation)
+        self.assertTrue(self.index.update("user0", make_user(25, "2025-01-01T00:00:00")))
+        self.assertEqual(self.index.generation, generation + 1)
+        self.assertEqual(self.index.rank("user0"), 1)
+
+def parse_event(raw: str):
+    event, data = raw.strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+class TestLeaderboardBroadcaster(unittest.TestCase):
+    def test_snapshot_then_coalesced_deltas(self):
+        users = {f"user{i}": make_user(i, "2025-01-01T00:00:00") for i in range(5)}
+        index = LeaderboardIndex()
+        index.rebuild(users.items())
+        broadcaster = LeaderboardBroadcaster(index, max_rate=5)
+
+        async def scenario():
+            stream = broadcaster.stream(limit=3)
+            event, data = parse_event(await stream.__anext__())
+            self.assertEqual(event, "snapshot")
+            self.assertEqual([row["user_id"] for row in data["leaderboard"]], ["user4", "user3", "user2"])
+            self.assertEqual(len(broadcaster), 1)
+
+            # user0 jumps to the top: three rows move, user2 drops out
+            index.update("user0", make_user(10, "2025-01-01T00:00:00"))
+            broadcaster.notify()
+            event, data = parse_event(await asyncio.wait_for(stream.__anext__(), 1))
+            self.assertEqual(event, "delta")
+            self.assertEqual({row["user_id"]: row["rank"] for row in data["rows"]},
+                             {"user0": 1, "user4": 2, "user3": 3})
+            self.assertEqual(data["removed"], ["user2"])
+
+            # A burst of changes is delivered as a single delta
+            for level in (11, 12, 13):
+                index.update("user1", make_user(level, "2025-01-01T00:00:00"))
+                broadcaster.notify()
+            event, data = parse_event(await asyncio.wait_for(stream.__anext__(), 1))
+            self.assertEqual(event, "delta")
+            user1 = next(row for row in data["rows"] if row["user_id"] == "user1")
+            self.assertEqual(user1["current_level"], 13)
+            self.assertEqual(data["removed"], ["user3"])
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(stream.__anext__(), 0.5)
+
+            await stream.aclose()
+            self.assertEqual(len(broadcaster), 0)
+
+        asyncio.run(scenario())
+
+if __name__ == "__main__":
+    unittest.main()
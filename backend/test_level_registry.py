@@ -0,0 +1,90 @@
+"""
+Test Script for the Level Registry
+
+This script checks that the committed level manifest matches the level
+modules, that levels are only imported on first use, and that an out of
+date manifest is ignored.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from levels.registry import LevelRegistry, MANIFEST_PATH, LEVELS_DIR, file_digest
+from level_manager import level_manager
+
+class TestManifest(unittest.TestCase):
+    def test_manifest_is_up_to_date(self):
+        registry = LevelRegistry.from_manifest()
+        self.assertIsNotNone(registry, "run 'python -m levels.registry' after changing a level")
+        self.assertEqual(registry.manifest(), LevelRegistry.scan().manifest())
+
+    def test_out_of_date_manifest_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest["levels"]["1"]["sha256"] = file_digest(__file__)
+            path = os.path.join(tmp, "manifest.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            self.assertIsNone(LevelRegistry.from_manifest(path))
+
+            del manifest["levels"]["1"]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            self.assertIsNone(LevelRegistry.from_manifest(path))
+
+    def test_missing_manifest(self):
+        self.assertIsNone(LevelRegistry.from_manifest(os.path.join(LEVELS_DIR, "missing.json")))
+
+class TestLazyLoading(unittest.TestCase):
+    def test_levels_load_on_first_use(self):
+        registry = LevelRegistry.from_manifest()
+        self.assertEqual(list(registry), sorted(registry))
+        self.assertEqual(registry.metadata(12)["stateful"], True)
+        self.assertFalse(any(registry.is_loaded(num) for num in registry))
+
+        level = registry[3]
+        self.assertTrue(registry.is_loaded(3))
+        self.assertFalse(registry.is_loaded(4))
+        self.assertEqual(level.level_desc, registry.metadata(3)["description"])
+
+    def test_literals_match_loaded_levels(self):
+        registry = LevelRegistry.from_manifest()
+        merged = {}
+        for level in LevelRegistry.scan().values():
+            for fold, values in level.literals.items():
+                merged.setdefault(fold, set()).update(values)
+        self.assertEqual(registry.literals(), {fold: tuple(sorted(v)) for fold, v in merged.items()})
+
+    def test_sync_skips_unchanged_levels(self):
+        with mock.patch.object(level_manager, "_save_global_data") as save_global_data:
+            level_manager._sync_global_levels()
+        save_global_data.assert_not_called()
+
+class TestLevelCatalog(unittest.TestCase):
+    def test_no_io(self):
+        with mock.patch.object(level_manager.storage, "get_global") as get_global, \
+                mock.patch.object(level_manager.storage, "save_global") as save_global:
+            info = level_manager.get_level_info(12)
+        get_global.assert_not_called()
+        save_global.assert_not_called()
+        self.assertEqual(info["description"], level_manager.levels.metadata(12)["description"])
+        self.assertTrue(info["has_state"])
+        self.assertIn("hint", info["extras"])
+
+    def test_catalog_is_read_only(self):
+        with self.assertRaises(TypeError):
+            level_manager.levels.catalog[1]["name"] = "changed"
+        info = level_manager.get_level_info(1)
+        info["extras"]["added"] = True
+        self.assertNotIn("added", level_manager.get_level_info(1)["extras"])
+
+    def test_unknown_level(self):
+        with self.assertLogs("level_manager", "WARNING"):
+            info = level_manager.get_level_info(999)
+        self.assertEqual(info["name"], "Level 999")
+        self.assertEqual(info["extras"], {})
+
+if __name__ == "__main__":
+    unittest.main()
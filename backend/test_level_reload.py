@@ -0,0 +1,130 @@
+"""
+Test Script for Level Hot Reload
+
+This script checks that changed level files are picked up without a
+restart, that a reload swaps the whole level set at once, and that a level
+file that fails to load leaves the previous version in place.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from levels.registry import LevelRegistry, LevelWatcher
+from level_manager import level_manager
+
+LEVEL_SOURCE = '''from levels.base_level import BaseLevel
+
+class Level(BaseLevel):
+    def __init__(self):
+        super().__init__(level_id={num}, level_desc="Must contain {word}")
+
+    def is_valid(self, password, level_state):
+        return "{word}" in password
+
+level = Level()
+'''
+
+class TestRegistryReload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.package = "reloadtest_levels"
+        self.levels_dir = os.path.join(self.tmp, self.package)
+        os.mkdir(self.levels_dir)
+        open(os.path.join(self.levels_dir, "__init__.py"), "w").close()
+        self.write(1, "apple")
+        self.write(2, "pear")
+        sys.path.insert(0, self.tmp)
+        self.registry = LevelRegistry.scan(self.levels_dir, self.package)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp)
+        for name in [name for name in sys.modules if name.startswith(self.package)]:
+            del sys.modules[name]
+        shutil.rmtree(self.tmp)
+
+    def write(self, num, word, source=LEVEL_SOURCE):
+        with open(os.path.join(self.levels_dir, f"level_{num}.py"), "w") as f:
+            f.write(source.format(num=num, word=word))
+
+    def reload(self):
+        return self.registry.reload(self.levels_dir, self.package)
+
+    def test_unchanged(self):
+        registry, changes = self.reload()
+        self.assertIs(registry, self.registry)
+        self.assertEqual(changes, {})
+
+    def test_changed_level(self):
+        self.write(1, "banana")
+        registry, changes = self.reload()
+        self.assertEqual(changes, {1: "changed"})
+        self.assertEqual(registry.version, self.registry.version + 1)
+        self.assertTrue(registry[1].is_valid("banana", {}))
+        self.assertEqual(registry.metadata(1)["description"], "Must contain banana")
+        self.assertEqual(registry.catalog[1]["description"], "Must contain banana")
+        self.assertEqual(self.registry.catalog[1]["description"], "Must contain apple")
+        # Unchanged levels keep their instance; the old registry is untouched
+        self.assertIs(registry[2], self.registry[2])
+        self.assertTrue(self.registry[1].is_valid("apple", {}))
+        self.assertFalse(self.registry[1].is_valid("banana", {}))
+
+    def test_added_and_removed_levels(self):
+        self.write(3, "plum")
+        os.remove(os.path.join(self.levels_dir, "level_2.py"))
+        registry, changes = self.reload()
+        self.assertEqual(changes, {2: "removed", 3: "added"})
+        self.assertEqual(list(registry), [1, 3])
+        self.assertEqual(registry.max_level, 3)
+        self.assertEqual([step[0] for step in registry.pipeline(3)], [1, 3])
+
+    def test_broken_level_keeps_previous_version(self):
+        self.write(1, "banana", "this is not python")
+        with self.assertLogs("levels.registry", "ERROR"):
+            registry, changes = self.reload()
+        self.assertEqual(changes, {})
+        self.assertTrue(registry[1].is_valid("apple", {}))
+
+    def test_watcher(self):
+        calls = []
+        watcher = LevelWatcher(lambda: calls.append(1), levels_dir=self.levels_dir)
+        self.assertFalse(watcher.poll())
+        self.write(1, "a much longer word")
+        self.assertTrue(watcher.poll())
+        self.assertEqual(calls, [1])
+
+class TestLevelManagerReload(unittest.TestCase):
+    def setUp(self):
+        self.original = level_manager.levels
+
+    def tearDown(self):
+        level_manager.levels = self.original
+
+    def test_swaps_levels(self):
+        new = LevelRegistry.scan()
+        new.version = self.original.version + 1
+        old_cache = level_manager.result_cache
+        old_cache.put(b"digest", 3, True, version=self.original.version)
+        with mock.patch.object(self.original, "reload", return_value=(new, {3: "changed"})), \
+                mock.patch.object(level_manager, "_sync_global_levels") as sync:
+            changes = level_manager.reload_levels()
+        self.assertEqual(changes, {3: "changed"})
+        self.assertIs(level_manager.levels, new)
+        self.assertIs(level_manager.matcher, new.matcher)
+        self.assertIsNot(level_manager.result_cache, old_cache)
+        self.assertEqual(len(level_manager.result_cache), 0)
+        # A late result computed with the old levels is never served with the new ones
+        level_manager.result_cache.put(b"digest", 3, False, version=self.original.version)
+        self.assertIsNone(level_manager.result_cache.get(b"digest", 3, version=new.version))
+        sync.assert_called_once_with({3})
+
+    def test_nothing_changed(self):
+        with mock.patch.object(self.original, "reload", return_value=(self.original, {})), \
+                mock.patch.object(level_manager, "_sync_global_levels") as sync:
+            self.assertEqual(level_manager.reload_levels(), {})
+        self.assertIs(level_manager.levels, self.original)
+        sync.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
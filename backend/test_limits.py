@@ -0,0 +1,104 @@
+"""
+Test Script for Size Limits
+
+This script checks that oversized passwords and request bodies are
+rejected before any level validator runs.
+"""
+import unittest
+from unittest import mock
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import main
+from main import app, limiter
+from level_manager import (
+    level_manager, check_password_size, PasswordTooLarge, MAX_PASSWORD_LENGTH, MAX_PASSWORD_BYTES
+)
+from request_limits import RequestSizeLimitMiddleware
+
+class TestPasswordSize(unittest.TestCase):
+    def test_within_limits(self):
+        check_password_size("a" * MAX_PASSWORD_LENGTH)
+        check_password_size("💀" * (MAX_PASSWORD_BYTES // 4))
+
+    def test_too_long(self):
+        with self.assertRaises(PasswordTooLarge):
+            check_password_size("a" * (MAX_PASSWORD_LENGTH + 1))
+
+    def test_too_many_bytes(self):
+        with mock.patch("level_manager.MAX_PASSWORD_BYTES", 8):
+            check_password_size("💀💀")
+            with self.assertRaises(PasswordTooLarge):
+                check_password_size("💀💀a")
+
+    def test_rejected_before_levels(self):
+        user_data = {"current_level": 3, "passed_levels": [], "failed_levels": [], "level_states": {}}
+        with mock.patch.object(level_manager, "_get_steps") as get_steps:
+            with self.assertRaises(PasswordTooLarge):
+                level_manager.apply_submission("big", user_data, "a" * (MAX_PASSWORD_LENGTH + 1))
+        get_steps.assert_not_called()
+        self.assertEqual(user_data["level_states"], {})
+
+class TestRequestSize(unittest.TestCase):
+    def setUp(self):
+        self.app = FastAPI()
+
+        @self.app.post("/echo")
+        async def echo(request: Request):
+            return {"size": len(await request.body())}
+
+        self.app.add_middleware(RequestSizeLimitMiddleware, max_bytes=100, path_limits={"/big": 1000})
+        self.client = TestClient(self.app)
+
+    def test_within_limit(self):
+        response = self.client.post("/echo", content=b"x" * 100)
+        self.assertEqual(response.json(), {"size": 100})
+
+    def test_content_length_over_limit(self):
+        response = self.client.post("/echo", content=b"x" * 101)
+        self.assertEqual(response.status_code, 413)
+
+    def test_chunked_over_limit(self):
+        def chunks():
+            for _ in range(5):
+                yield b"x" * 30
+
+        response = self.client.post("/echo", content=chunks())
+        self.assertEqual(response.status_code, 413)
+
+class TestSubmitLimits(unittest.TestCase):
+    def setUp(self):
+        limiter.enabled = False
+        self.client = TestClient(app)
+        main.storage.put_user("limit-user", {
+            "current_level": 1, "passed_levels": [], "failed_levels": [], "level_states": {}
+        })
+        self.token = main.create_access_token("limit-user")
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_long_password_rejected(self):
+        with mock.patch.object(level_manager, "submit_validation") as submit_validation:
+            response = self.client.post("/submit", json={
+                "auth_token": self.token, "password": "a" * (MAX_PASSWORD_LENGTH + 1)
+            })
+        self.assertEqual(response.status_code, 422)
+        submit_validation.assert_not_called()
+
+    def test_huge_body_rejected(self):
+        response = self.client.post(
+            "/submit", content=b'{"password": "' + b"a" * 1_000_000 + b'"}',
+            headers={"content-type": "application/json"}
+        )
+        self.assertEqual(response.status_code, 413)
+
+    def test_huge_body_rejected_with_cors_headers(self):
+        response = self.client.post(
+            "/submit", content=b'{"password": "' + b"a" * 1_000_000 + b'"}',
+            headers={"content-type": "application/json", "origin": "https://example.com"}
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("access-control-allow-origin", response.headers)
+
+if __name__ == "__main__":
+    unittest.main()
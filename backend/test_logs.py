@@ -0,0 +1,56 @@
+"""
+Test Script for the Logging Setup
+
+This script checks the LOG_LEVELS parser, the JSON formatter and the
+structured access records written for every request.
+"""
+import json
+import logging
+import unittest
+from fastapi.testclient import TestClient
+from logs import JSONFormatter, parse_levels, setup_logging
+from main import app
+
+class TestLogConfig(unittest.TestCase):
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels("level_manager=debug, storage=INFO,"),
+                         {"level_manager": "DEBUG", "storage": "INFO"})
+        self.assertEqual(parse_levels(""), {})
+        for spec in ("level_manager", "=DEBUG", "storage=LOUD"):
+            with self.assertRaises(ValueError):
+                parse_levels(spec)
+
+    def test_per_logger_levels(self):
+        setup_logging(level="ERROR", levels="level_manager=DEBUG")
+        try:
+            self.assertTrue(logging.getLogger("level_manager").isEnabledFor(logging.DEBUG))
+            self.assertFalse(logging.getLogger("storage").isEnabledFor(logging.WARNING))
+            self.assertTrue(logging.getLogger("access").isEnabledFor(logging.INFO))
+        finally:
+            logging.getLogger("level_manager").setLevel(logging.NOTSET)
+            setup_logging(level="WARNING", levels="")
+
+    def test_json_formatter(self):
+        record = logging.makeLogRecord({
+            "name": "access", "levelno": logging.INFO, "levelname": "INFO",
+            "msg": "%s %s", "args": ("GET", "/"), "status": 200,
+        })
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry["message"], "GET /")
+        self.assertEqual(entry["logger"], "access")
+        self.assertEqual(entry["status"], 200)
+
+class TestAccessLog(unittest.TestCase):
+    def test_access_record(self):
+        client = TestClient(app)
+        with self.assertLogs("access", level="INFO") as captured:
+            client.get("/leaderboard/nobody?secret=1")
+        record = captured.records[-1]
+        self.assertEqual(record.method, "GET")
+        self.assertEqual(record.path, "/leaderboard/nobody")
+        self.assertEqual(record.status, 404)
+        self.assertGreaterEqual(record.duration_ms, 0)
+        self.assertNotIn("secret", record.getMessage())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Test Script for Metrics
+
+This script checks the counters and histograms and the /metrics endpoint
+fed by password validation and storage operations.
+"""
+import unittest
+from fastapi.testclient import TestClient
+from metrics import Counter, Histogram, Registry, level_check_seconds, level_results
+from level_manager import level_manager
+from main import app
+
+class TestMetricTypes(unittest.TestCase):
+    def test_counter(self):
+        counter = Counter("requests_total", "Requests", ["path"])
+        counter.inc("/")
+        counter.inc("/", amount=2)
+        counter.inc('say "hi"')
+        self.assertEqual(counter.value("/"), 3)
+        self.assertEqual(counter.samples(), [
+            'requests_total{path="/"} 3',
+            'requests_total{path="say \\"hi\\""} 1',
+        ])
+
+    def test_histogram(self):
+        histogram = Histogram("latency_seconds", "Latency", buckets=[0.1, 1.0])
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.samples(), [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 5.65',
+            'latency_seconds_count 4',
+        ])
+
+    def test_drain_and_merge(self):
+        worker, parent = Registry(), Registry()
+        for registry in (worker, parent):
+            registry.counter("a_total", "A", ["x"])
+            registry.histogram("b_seconds", "B", buckets=[1.0])
+        worker._metrics["a_total"].inc("1", amount=2)
+        worker._metrics["b_seconds"].observe(0.5)
+        parent._metrics["a_total"].inc("1")
+        parent.merge(worker.drain())
+        self.assertEqual(parent._metrics["a_total"].value("1"), 3)
+        self.assertEqual(parent._metrics["b_seconds"].count(), 1)
+        self.assertEqual(worker._metrics["a_total"].value("1"), 0)
+
+    def test_registry(self):
+        registry = Registry()
+        registry.counter("a_total", "A").inc()
+        self.assertEqual(registry.render(), "# HELP a_total A\n# TYPE a_total counter\na_total 1\n")
+        with self.assertRaises(ValueError):
+            registry.counter("a_total", "A again")
+
+class TestValidationMetrics(unittest.TestCase):
+    def test_submission_records_levels(self):
+        # Level 3 requires an uppercase letter
+        checks = level_check_seconds.count("3")
+        passes = level_results.value("1", "pass")
+        fails = level_results.value("3", "fail")
+        user_data = {"current_level": 3, "level_states": {}, "passed_levels": [1, 2], "failed_levels": []}
+        level_manager.apply_submission("metrics_test", user_data, "welcome123 metrics " + str(id(self)), 3)
+        level_manager.apply_submission("metrics_test", user_data, "welcome123", 3)
+        self.assertEqual(level_results.value("1", "pass"), passes + 2)
+        self.assertEqual(level_results.value("3", "fail"), fails + 2)
+        self.assertGreaterEqual(level_check_seconds.count("3"), checks + 1)
+
+    def test_metrics_endpoint(self):
+        response = TestClient(app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("# TYPE password_level_check_seconds histogram", response.text)
+        self.assertIn("# TYPE storage_operation_seconds histogram", response.text)
+
+if __name__ == "__main__":
+    unittest.main()
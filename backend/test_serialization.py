@@ -0,0 +1,66 @@
+"""
+Test Script for Serialization
+
+This script checks that both JSON backends produce the same documents,
+including values orjson rejects, and that the database file is written
+compactly while indented files keep loading.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import serialization
+from responses import FastJSONResponse
+from serialization import dumps, loads
+from storage import JSONFileStorage
+
+DOCUMENTS = [
+    {"users": {"alice": {"current_level": 3, "level_states": {"1": {"attempts": 2}}}}},
+    {"text": "💀 ß ✓", "float": 1.5, "list": [None, True, False]},
+    {"lone surrogate": "\ud800"},
+    {1: "int key"},
+    {"big": 2 ** 70},
+]
+
+class TestSerialization(unittest.TestCase):
+    def test_backends_agree(self):
+        for backend in ("orjson", "stdlib"):
+            if backend == "orjson" and serialization.orjson is None:
+                continue
+            with mock.patch("serialization.BACKEND", backend):
+                for document in DOCUMENTS:
+                    encoded = dumps(document)
+                    self.assertIsInstance(encoded, bytes)
+                    self.assertNotIn(b"\n", encoded)
+                    self.assertEqual(loads(encoded), json.loads(json.dumps(document)))
+
+    def test_loads_accepts_str_and_surrogate_escapes(self):
+        self.assertEqual(loads('{"a": "\\ud800"}'), {"a": "\ud800"})
+
+    def test_invalid_json(self):
+        with self.assertRaises(json.JSONDecodeError):
+            loads(b"{not json")
+
+    def test_response(self):
+        response = FastJSONResponse({"ok": True, "text": "💀"})
+        self.assertEqual(json.loads(response.body), {"ok": True, "text": "💀"})
+        self.assertEqual(response.media_type, "application/json")
+
+class TestCompactDatabase(unittest.TestCase):
+    def test_compact_file_and_indented_legacy_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "db.json")
+            with open(path, "w") as f:
+                json.dump({"_global": {"levels": {}}, "users": {"bob": {"current_level": 2}}}, f, indent=2)
+            storage = JSONFileStorage(path)
+            self.assertEqual(storage.get_user("bob"), {"current_level": 2})
+
+            storage.put_user("carol", {"current_level": 1})
+            with open(path, "rb") as f:
+                content = f.read()
+            self.assertNotIn(b"\n", content)
+            self.assertEqual(set(json.loads(content)["users"]), {"bob", "carol"})
+
+if __name__ == "__main__":
+    unittest.main()
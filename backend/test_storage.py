@@ -0,0 +1,322 @@
+"""
+Test Script for Storage Backends
+
+This script checks that all storage backends behave the same way.
+"""
+import unittest
+import os
+import json
+import tempfile
+import time
+from unittest import mock
+from storage import JSONFileStorage, SQLiteStorage, CachedStorage, JournalStorage, create_storage
+
+class StorageContract:
+    """Tests shared by all storage backends."""
+
+    def make_storage(self, path):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = self.make_storage(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def reopen(self):
+        """Open the same database again, as after a restart."""
+        self.storage.close()
+        self.storage = self.make_storage(self.tmp_dir.name)
+
+    def test_put_and_get_user(self):
+        user = {
+            "current_level": 3,
+            "passed_levels": [1, 2],
+            "failed_levels": [],
+            "level_states": {"1": {"attempts": 2, "last_attempt": None}},
+        }
+        self.storage.put_user("alice", user)
+        self.assertTrue(self.storage.has_user("alice"))
+        self.assertFalse(self.storage.has_user("bob"))
+        self.assertEqual(self.storage.get_user("alice"), user)
+        self.assertIsNone(self.storage.get_user("bob"))
+
+    def test_put_user_replaces_level_states(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {"1": {"attempts": 1}}})
+        self.storage.put_user("alice", {"current_level": 2, "level_states": {"2": {"attempts": 1}}})
+        user = self.storage.get_user("alice")
+        self.assertEqual(user["current_level"], 2)
+        self.assertEqual(user["level_states"], {"2": {"attempts": 1}})
+
+    def test_removed_fields_survive_reopen(self):
+        self.storage.put_user("alice", {"name": "a", "level_states": {"1": {"x": 1}}, "team": "red"})
+        self.storage.put_user("alice", {"name": "a"})
+        before = self.storage.get_user("alice")
+        self.assertNotIn("team", before)
+        # Backends may keep an empty level_states, but must read back what they returned
+        self.assertIn(before.get("level_states"), (None, {}))
+        self.reopen()
+        self.assertEqual(self.storage.get_user("alice"), before)
+
+        self.storage.put_user("alice", {"name": "a", "level_states": {"2": {"x": 2}}})
+        self.reopen()
+        self.assertEqual(self.storage.get_user("alice"), {"name": "a", "level_states": {"2": {"x": 2}}})
+
+    def test_global_levels(self):
+        self.storage.save_global({"levels": {"1": {"name": "Level 1"}}})
+        self.storage.save_global({"season": 2})
+        data = self.storage.get_global()
+        self.assertEqual(data["levels"], {"1": {"name": "Level 1"}})
+        self.assertEqual(data["season"], 2)
+
+    def test_replace_and_load_all(self):
+        db = {
+            "_global": {"levels": {"1": {"name": "Level 1"}}},
+            "users": {
+                "alice": {"current_level": 2, "level_states": {}},
+                "bob": {"current_level": 1, "level_states": {}},
+            },
+        }
+        self.storage.replace_all(db)
+        self.assertEqual(self.storage.load_all(), db)
+        self.assertEqual(self.storage.user_count(), 2)
+        self.assertEqual(dict(self.storage.iter_users()), db["users"])
+
+    def test_export_snapshot(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        generation, db, incremental = self.storage.export_snapshot()
+        self.assertFalse(incremental)
+        self.assertEqual(set(db["users"]), {"alice"})
+        self.assertIn("_global", db)
+
+        self.storage.put_user("bob", {"current_level": 2, "level_states": {}})
+        later, delta, incremental = self.storage.export_snapshot(generation)
+        if generation is None:
+            # Storages that don't track changes always export everything
+            self.assertFalse(incremental)
+            self.assertEqual(set(delta["users"]), {"alice", "bob"})
+            return
+        self.assertTrue(incremental)
+        self.assertEqual(delta, {"users": {"bob": {"current_level": 2, "level_states": {}}}})
+        self.assertNotEqual(later, generation)
+
+        self.storage.save_global({"season": 3})
+        _, delta, _ = self.storage.export_snapshot(later)
+        self.assertEqual(delta["users"], {})
+        self.assertEqual(delta["_global"]["season"], 3)
+
+        # replace_all loses the history: tokens from before get a full export
+        self.storage.replace_all(self.storage.load_all())
+        _, db, incremental = self.storage.export_snapshot(later)
+        self.assertFalse(incremental)
+        self.assertEqual(set(db["users"]), {"alice", "bob"})
+        self.assertFalse(self.storage.export_snapshot("unknown.1")[2])
+
+
+class TestJSONFileStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, path):
+        return JSONFileStorage(os.path.join(path, "db.json"))
+
+    def test_migrates_top_level_users(self):
+        path = os.path.join(self.tmp_dir.name, "legacy.json")
+        with open(path, "w") as f:
+            json.dump({"alice": {"current_level": 4}}, f)
+        storage = JSONFileStorage(path)
+        self.assertEqual(storage.get_user("alice"), {"current_level": 4})
+
+
+class TestSQLiteStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, path):
+        return SQLiteStorage(os.path.join(path, "db.sqlite3"))
+
+    def test_imports_existing_json(self):
+        json_path = os.path.join(self.tmp_dir.name, "db.json")
+        JSONFileStorage(json_path).put_user("alice", {"current_level": 5, "level_states": {}})
+        storage = SQLiteStorage(os.path.join(self.tmp_dir.name, "imported.sqlite3"), import_from=json_path)
+        self.assertEqual(storage.get_user("alice"), {"current_level": 5, "level_states": {}})
+        storage.close()
+
+
+class TestCachedStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, path):
+        return CachedStorage(SQLiteStorage(os.path.join(path, "db.sqlite3")))
+
+    def test_get_user_returns_copy(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        user = self.storage.get_user("alice")
+        user["current_level"] = 9
+        self.assertEqual(self.storage.get_user("alice")["current_level"], 1)
+
+    def test_sync_writes_through(self):
+        self.storage.put_user("alice", {"current_level": 2, "level_states": {}})
+        self.assertEqual(self.storage.backend.get_user("alice")["current_level"], 2)
+
+    def test_group_commit(self):
+        backend = SQLiteStorage(os.path.join(self.tmp_dir.name, "group.sqlite3"))
+        storage = CachedStorage(backend, durability="group", flush_interval=60, flush_batch=3)
+        storage.put_user("alice", {"current_level": 2, "level_states": {}})
+        self.assertEqual(storage.get_user("alice")["current_level"], 2)
+        self.assertIsNone(backend.get_user("alice"))
+
+        storage.flush()
+        self.assertEqual(backend.get_user("alice")["current_level"], 2)
+
+        # Reaching the batch size wakes the flusher without waiting for the interval
+        for i in range(3):
+            storage.put_user(f"user{i}", {"current_level": 1, "level_states": {}})
+        for _ in range(100):
+            if backend.user_count() == 4:
+                break
+            time.sleep(0.01)
+        self.assertEqual(backend.user_count(), 4)
+
+        storage.put_user("bob", {"current_level": 3, "level_states": {}})
+        storage.close()
+        reopened = SQLiteStorage(backend.path)
+        self.assertEqual(reopened.get_user("bob")["current_level"], 3)
+        reopened.close()
+
+    def test_failed_write_is_not_cached(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        with mock.patch.object(self.storage.backend, "put_users", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.storage.put_user("alice", {"current_level": 2, "level_states": {}})
+            with self.assertRaises(OSError):
+                self.storage.put_user("bob", {"current_level": 1, "level_states": {}})
+        self.assertEqual(self.storage.get_user("alice")["current_level"], 1)
+        self.assertFalse(self.storage.has_user("bob"))
+
+    def test_unknown_durability(self):
+        with self.assertRaises(ValueError):
+            CachedStorage(self.storage.backend, durability="never")
+
+
+class TestJournalStorage(StorageContract, unittest.TestCase):
+    def make_storage(self, path):
+        return JournalStorage(os.path.join(path, "db.json"), compact_interval=0)
+
+    def reopen(self):
+        """Simulate a restart without a clean shutdown."""
+        self.storage._file.close()
+        self.storage._stopped.set()
+        self.storage = JournalStorage(self.storage.path, compact_interval=0)
+
+    def test_removed_level_states_are_not_recreated(self):
+        self.storage.put_user("alice", {"name": "a", "level_states": {"1": {"x": 1}}})
+        self.storage.put_user("alice", {"name": "a"})
+        self.assertEqual(self.journal_records()[-1]["unset"], ["level_states"])
+        self.assertNotIn("unset_states", self.journal_records()[-1])
+        self.reopen()
+        self.assertEqual(self.storage.get_user("alice"), {"name": "a"})
+
+    def journal_records(self):
+        with open(self.storage.journal_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_appends_only_the_change(self):
+        user = {"current_level": 1, "passed_levels": [], "level_states": {"1": {"attempts": 1}}}
+        self.storage.put_user("alice", user)
+        user = {"current_level": 2, "passed_levels": [1],
+                "level_states": {"1": {"attempts": 1}, "2": {"attempts": 1}}}
+        self.storage.put_user("alice", user)
+        self.storage.put_user("alice", user)
+
+        records = self.journal_records()
+        self.assertEqual(len(records), 2)
+        last = records[-1]
+        self.assertEqual(last["user"], "alice")
+        self.assertEqual(last["set"], {"current_level": 2, "passed_levels": [1]})
+        self.assertEqual(last["states"], {"2": {"attempts": 1}})
+        self.assertIn("ts", last)
+        self.assertGreater(last["seq"], records[0]["seq"])
+
+    def test_recovers_from_snapshot_and_journal(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {"1": {"attempts": 1}}})
+        self.storage.compact()
+        self.storage.put_user("alice", {"current_level": 2, "level_states": {"2": {"attempts": 3}}})
+        self.storage.put_user("bob", {"current_level": 1})
+        self.storage.save_global({"levels": {"1": {"name": "Level 1"}}})
+        expected = self.storage.load_all()
+
+        self.reopen()
+        self.assertEqual(self.storage.load_all(), expected)
+        # Recovery writes a fresh snapshot that the json backend can read
+        self.assertEqual(os.path.getsize(self.storage.journal_path), 0)
+        self.assertEqual(JSONFileStorage(self.storage.path).get_user("alice")["level_states"],
+                         {"2": {"attempts": 3}})
+
+    def test_corrupted_snapshot(self):
+        path = os.path.join(self.tmp_dir.name, "corrupted.json")
+        with open(path, "wb") as f:
+            f.write(b'{"users": {"alice": {"current_level": 2')
+        with self.assertRaises(ValueError):
+            JournalStorage(path, compact_interval=0)
+        # The snapshot is left for recovery
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b'{"users": {"alice": {"current_level": 2')
+
+    def test_ignores_incomplete_last_record(self):
+        self.storage.put_user("alice", {"current_level": 2, "level_states": {}})
+        with open(self.storage.journal_path, "ab") as f:
+            f.write(b'{"seq": 99, "user": "alice", "set": {"current_')
+        with self.assertLogs("storage", "WARNING"):
+            self.reopen()
+        self.assertEqual(self.storage.get_user("alice")["current_level"], 2)
+        self.storage.put_user("bob", {"current_level": 1})
+        self.reopen()
+        self.assertTrue(self.storage.has_user("bob"))
+
+    def test_interrupted_compaction(self):
+        self.storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        # Crash after the journal was rotated but before the snapshot was written
+        with self.storage._sync_lock, self.storage._lock:
+            self.storage._rotate()
+        self.storage.put_user("alice", {"current_level": 3, "level_states": {}})
+        self.reopen()
+        self.assertEqual(self.storage.get_user("alice")["current_level"], 3)
+        self.assertFalse(os.path.exists(self.storage._rotated_path))
+
+    def test_compacts_by_size(self):
+        storage = JournalStorage(os.path.join(self.tmp_dir.name, "small.json"), flush_interval=0.01,
+                                 compact_interval=0, compact_bytes=1)
+        storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        # The previous journal is removed once the snapshot is written
+        compacted = lambda: (os.path.getsize(storage.journal_path) == 0
+                             and not os.path.exists(storage._rotated_path))
+        for _ in range(200):
+            if compacted():
+                break
+            time.sleep(0.01)
+        self.assertTrue(compacted())
+        self.assertIn("alice", JSONFileStorage(storage.path).load_all()["users"])
+        storage.close()
+
+    def test_group_durability(self):
+        storage = JournalStorage(os.path.join(self.tmp_dir.name, "group.json"), durability="group",
+                                 flush_interval=60)
+        storage.put_user("alice", {"current_level": 1, "level_states": {}})
+        self.assertLess(storage._synced_seq, storage.seq)
+        storage.flush()
+        self.assertEqual(storage._synced_seq, storage.seq)
+        storage.close()
+
+    def test_unknown_durability(self):
+        with self.assertRaises(ValueError):
+            JournalStorage(os.path.join(self.tmp_dir.name, "other.json"), durability="never")
+
+
+class TestCreateStorage(unittest.TestCase):
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_storage("redis")
+
+    def test_journal_backend(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = create_storage("journal", os.path.join(tmp, "db.json"))
+            self.assertIsInstance(storage, JournalStorage)
+            storage.close()
+
+if __name__ == "__main__":
+    unittest.main()
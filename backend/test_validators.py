@@ -0,0 +1,223 @@
+"""
+Test Script for Level Validators
+
+This script checks the shared password features and the precompiled
+validation pipeline used by the LevelManager.
+"""
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+from levels.features import PasswordFeatures
+from levels.matcher import LiteralMatcher
+from levels.level_8 import atomic_number_sum, level as level_8
+from level_manager import level_manager, ResultCache
+
+class TestPasswordFeatures(unittest.TestCase):
+    def test_features(self):
+        features = PasswordFeatures("Ab1!9 💀")
+        self.assertEqual(features.length, 7)
+        self.assertEqual(features.lower, "ab1!9 💀")
+        self.assertEqual(features.upper, "AB1!9 💀")
+        self.assertTrue(features.has_digit)
+        self.assertTrue(features.has_upper)
+        self.assertTrue(features.has_special)
+        self.assertEqual(features.digit_sum, 10)
+
+    def test_empty_password(self):
+        features = PasswordFeatures("")
+        self.assertFalse(features.has_digit)
+        self.assertFalse(features.has_upper)
+        self.assertFalse(features.has_special)
+        self.assertEqual(features.digit_sum, 0)
+
+    def test_digit_sum_counts_repeats(self):
+        self.assertEqual(PasswordFeatures("9" * 27 + "7").digit_sum, 250)
+
+    def test_unparseable_digit(self):
+        with self.assertRaises(ValueError):
+            PasswordFeatures("²").digit_sum
+
+class TestLiteralMatcher(unittest.TestCase):
+    def test_search_by_fold(self):
+        matcher = LiteralMatcher({"exact": ["abc", "ABC", "abc"], "lower": ["xyz"]})
+        self.assertEqual(matcher.literals, {"exact": ("ABC", "abc"), "lower": ("xyz",)})
+        self.assertEqual(matcher.search("exact", "xxabcxx"), {"abc"})
+        self.assertEqual(matcher.search("upper", "ABC"), frozenset())
+        self.assertIn(("lower", "xyz"), matcher)
+        self.assertNotIn(("exact", "xyz"), matcher)
+
+        with self.assertRaises(ValueError):
+            LiteralMatcher({"title": ["Abc"]})
+
+    def test_features_share_one_search(self):
+        matcher = LiteralMatcher({"lower": ["mitochondria", "indonesia"]})
+        features = PasswordFeatures("MitoChondria", matcher)
+        with mock.patch.object(matcher, "search", wraps=matcher.search) as search:
+            self.assertTrue(features.contains("mitochondria", "lower"))
+            self.assertFalse(features.contains("indonesia", "lower"))
+            self.assertEqual(search.call_count, 1)
+        # Unregistered literals are searched directly
+        self.assertTrue(features.contains("Chon"))
+        self.assertFalse(features.contains("chon"))
+
+    def test_manager_registers_level_literals(self):
+        literals = level_manager.matcher.literals
+        self.assertIn("welcome123", literals["exact"])
+        self.assertIn("mitochondria", literals["lower"])
+        self.assertIn("MAZE_COMPLETED", literals["upper"])
+
+    def test_checks_match_is_valid(self):
+        passwords = ["welcome123", "GFC6+J7 maze_completed", "ReTurn0 ExactlyAggron", "Indonesia 3.14159 1000101",
+                     "000000000019d6689c085ae165831e93 bypass@)@%", "ßſ MitoChondria", ""]
+        for password in passwords:
+            features = PasswordFeatures(password, level_manager.matcher)
+            for level_num, level in level_manager.levels.items():
+                if level.literals:
+                    self.assertEqual(level.check(features, {}), level.is_valid(password, {}),
+                                     f"level {level_num}: {password!r}")
+
+class TestLevel8(unittest.TestCase):
+    def test_atomic_number_sum(self):
+        self.assertEqual(atomic_number_sum("IrW"), 151)
+        self.assertEqual(atomic_number_sum("HeH"), 3)
+        # "Ha" isn't an element, so it counts as H followed by an unmatched a
+        self.assertEqual(atomic_number_sum("Ha"), 1)
+        self.assertEqual(atomic_number_sum("Xa XE é É"), 0)
+        self.assertEqual(atomic_number_sum(""), 0)
+
+    def test_extract_elements(self):
+        self.assertEqual(level_8.extract_elements("NaCl HaXx Og"), ["Na", "Cl", "H", "Og"])
+
+    def test_is_valid(self):
+        self.assertTrue(level_8.is_valid("IrWK" + "H" * 30, {}))
+        self.assertFalse(level_8.is_valid("IrW", {}))
+
+class TestLevelMetadata(unittest.TestCase):
+    def test_declared_dependencies(self):
+        levels = level_manager.levels
+        self.assertTrue(levels[13].time_dependent)
+        self.assertTrue(levels[18].time_dependent)
+        self.assertTrue(levels[12].stateful)
+        self.assertTrue(levels[10].pure)
+        self.assertTrue(levels[15].pure)
+        self.assertEqual({level_num for level_num in levels if levels[level_num].pure},
+                         set(levels) - {12, 13, 18})
+
+    def test_validity_windows(self):
+        self.assertIsNone(level_manager.levels[1].validity_window())
+        self.assertEqual(level_manager.levels[13].validity_window(125.5), (120.0, 180.0))
+
+        level_18 = level_manager.levels[18]
+        start, end = level_18.validity_window()
+        self.assertEqual(end - start, 30 * 60)
+        self.assertTrue(start <= time.time() < end)
+        # Every moment of the window maps to the same emoji
+        with mock.patch("levels.level_18.datetime") as fake_datetime:
+            fake_datetime.now.side_effect = lambda: datetime.fromtimestamp(start)
+            first = level_18._get_current_time_emoji()
+            fake_datetime.now.side_effect = lambda: datetime.fromtimestamp(end - 1)
+            self.assertEqual(level_18._get_current_time_emoji(), first)
+            fake_datetime.now.side_effect = lambda: datetime.fromtimestamp(end)
+            self.assertNotEqual(level_18._get_current_time_emoji(), first)
+
+class TestValidationPipeline(unittest.TestCase):
+    def test_pipeline_covers_levels_up_to_current(self):
+        pipeline = level_manager._get_pipeline(5)
+        self.assertEqual([step[0] for step in pipeline], [1, 2, 3, 4, 5])
+        self.assertEqual(level_manager._get_pipeline(0), ())
+
+        max_level = level_manager.get_max_level()
+        self.assertEqual(level_manager._get_pipeline(max_level + 10), level_manager._get_pipeline(max_level))
+
+    def test_apply_submission_uses_one_timestamp(self):
+        user_data = {"current_level": 5, "level_states": {}, "passed_levels": [1, 2, 3, 4], "failed_levels": []}
+        result = level_manager.apply_submission("pipeline_test", user_data, "welcome123A!", 5)
+        self.assertEqual([level["level"] for level in result["passed"]], [1, 2, 3, 4])
+        self.assertEqual([level["level"] for level in result["failed"]], [5])
+        timestamps = {state["last_attempt"] for state in user_data["level_states"].values()}
+        self.assertEqual(len(timestamps), 1)
+
+    def test_fast_mode_stops_at_first_failure(self):
+        user_data = {"current_level": 5, "level_states": {}, "passed_levels": [1, 2, 3, 4], "failed_levels": []}
+        result = level_manager.apply_submission("pipeline_test", user_data, "welcome123A!", 5, mode="fast")
+        self.assertEqual(result["passed"], [])
+        self.assertEqual([level["level"] for level in result["failed"]], [5])
+        self.assertEqual(list(user_data["level_states"]), ["5"])
+        self.assertEqual(result["current_level"], 5)
+
+    def test_fast_mode_checks_current_level_first(self):
+        user_data = {"current_level": 2, "level_states": {}, "passed_levels": [1], "failed_levels": []}
+        result = level_manager.apply_submission("pipeline_test", user_data, "x", 2, mode="fast")
+        self.assertEqual([level["level"] for level in result["failed"]], [2])
+        self.assertNotIn("1", user_data["level_states"])
+
+        with self.assertRaises(ValueError):
+            level_manager.apply_submission("pipeline_test", user_data, "x", 2, mode="lazy")
+
+    def test_modes_agree_on_passing_password(self):
+        full = {"current_level": 4, "level_states": {}, "passed_levels": [], "failed_levels": []}
+        fast = {"current_level": 4, "level_states": {}, "passed_levels": [], "failed_levels": []}
+        full_result = level_manager.apply_submission("pipeline_test", full, "welcome123A!", 4)
+        fast_result = level_manager.apply_submission("pipeline_test", fast, "welcome123A!", 4, mode="fast")
+        self.assertEqual([l["level"] for l in full_result["passed"]], [1, 2, 3, 4])
+        self.assertEqual([l["level"] for l in fast_result["passed"]], [1, 2, 3, 4])
+        self.assertEqual(full_result["current_level"], fast_result["current_level"])
+
+    def test_repeated_password_uses_cached_results(self):
+        password = "cached password 123A!" * 10
+        digest = PasswordFeatures(password).digest
+        max_level = level_manager.get_max_level()
+        user_data = {"current_level": max_level, "level_states": {}, "passed_levels": [], "failed_levels": []}
+        first = level_manager.apply_submission("pipeline_test", user_data, password, max_level)
+
+        cache = level_manager.result_cache
+        version = level_manager.levels.version
+        for level_num, level in level_manager.levels.items():
+            if level.stateful:
+                self.assertIsNone(cache.get(digest, level_num, version=version))
+            elif level.time_dependent:
+                window = level.validity_window()
+                self.assertIsNotNone(cache.get(digest, level_num, window, version))
+                self.assertIsNone(cache.get(digest, level_num, (0.0, 1.0), version))
+            else:
+                self.assertIsNotNone(cache.get(digest, level_num, version=version))
+                self.assertIsNone(cache.get(digest, level_num, version=version + 1))
+
+        second = level_manager.apply_submission("pipeline_test", user_data, password, max_level)
+        self.assertEqual([l["level"] for l in first["passed"]], [l["level"] for l in second["passed"]])
+        self.assertTrue(all(state["attempts"] == 2 for state in user_data["level_states"].values()))
+
+class TestResultCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ResultCache(max_size=2)
+        cache.put(b"a", 1, True)
+        cache.put(b"b", 1, False)
+        self.assertTrue(cache.get(b"a", 1))
+        cache.put(b"c", 1, True)
+        self.assertIsNone(cache.get(b"b", 1))
+        self.assertTrue(cache.get(b"a", 1))
+        self.assertIsNone(cache.get(b"a", 2))
+        self.assertEqual(len(cache), 2)
+
+    def test_window(self):
+        cache = ResultCache()
+        cache.put(b"a", 13, True, (60.0, 120.0))
+        self.assertTrue(cache.get(b"a", 13, (60.0, 120.0)))
+        self.assertIsNone(cache.get(b"a", 13, (120.0, 180.0)))
+        self.assertIsNone(cache.get(b"a", 13))
+
+    def test_version(self):
+        cache = ResultCache()
+        cache.put(b"a", 1, True, version=1)
+        self.assertTrue(cache.get(b"a", 1, version=1))
+        # A result computed with other levels is never returned
+        self.assertIsNone(cache.get(b"a", 1, version=2))
+
+    def test_disabled(self):
+        cache = ResultCache(max_size=0)
+        cache.put(b"a", 1, True)
+        self.assertIsNone(cache.get(b"a", 1))
+
+if __name__ == "__main__":
+    unittest.main()
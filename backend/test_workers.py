@@ -0,0 +1,144 @@
+"""
+Test Script for Validation Workers
+
+This script checks that submissions validated in worker processes return
+the same results as in-process validation, carry their metrics back to the
+server process, are cancelled with their caller, log through their own
+handler, and are answered with 503 when every worker is busy or once the
+time budget runs out.
+"""
+import copy
+import logging
+import logging.handlers
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from main import app, limiter
+from level_manager import level_manager, ValidationBusy
+from metrics import level_results
+
+def root_handler_types():
+    return [type(handler) for handler in logging.getLogger().handlers]
+
+class FakePool:
+    """Records submitted tasks without running them."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, *args):
+        task = Future()
+        self.tasks.append(task)
+        return task
+
+def new_user():
+    return {
+        "current_level": 3,
+        "passed_levels": [1, 2],
+        "failed_levels": [],
+        "level_states": {},
+        "previous_passed_levels": [],
+        "initialized": True,
+    }
+
+class TestSubmitValidation(unittest.TestCase):
+    def test_matches_in_process(self):
+        password = "welcome123" + "9" * 30
+        user_data = new_user()
+        future = level_manager.submit_validation("worker-user", user_data, password, workers=2)
+        result, updated = future.result(timeout=30)
+
+        expected_data = new_user()
+        expected = level_manager.apply_submission("worker-user", expected_data, password)
+        self.assertEqual(
+            [entry["level"] for entry in result["passed"]], [entry["level"] for entry in expected["passed"]]
+        )
+        self.assertEqual(result["current_level"], expected["current_level"])
+        self.assertEqual(updated["passed_levels"], expected_data["passed_levels"])
+        # The caller's copy is left as it was
+        self.assertEqual(user_data, new_user())
+
+    def test_merges_metrics(self):
+        before = level_results.value("3", "fail")
+        future = level_manager.submit_validation("worker-user", new_user(), "nope", workers=2)
+        future.result(timeout=30)
+        self.assertEqual(level_results.value("3", "fail"), before + 1)
+
+    def test_disabled(self):
+        self.assertIsNone(level_manager.submit_validation("worker-user", new_user(), "nope", workers=0))
+
+    def test_worker_logging(self):
+        pool = level_manager._get_pool("validation", 2)
+        types = pool.submit(root_handler_types).result(timeout=30)
+        self.assertNotIn(logging.handlers.QueueHandler, types)
+        self.assertIn(logging.StreamHandler, types)
+
+class TestInFlightSubmissions(unittest.TestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        for patch in (mock.patch.object(level_manager, "_get_pool", return_value=self.pool),
+                      mock.patch("level_manager.VALIDATION_QUEUE_PER_WORKER", 1)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def submit(self):
+        return level_manager.submit_validation("worker-user", new_user(), "nope", workers=1)
+
+    def test_busy(self):
+        self.submit()
+        with self.assertRaises(ValidationBusy):
+            self.submit()
+        # The slot is free again once the worker is done
+        self.pool.tasks[0].set_result(({}, new_user(), {}))
+        self.assertIsNotNone(self.submit())
+        self.pool.tasks[1].set_result(({}, new_user(), {}))
+
+    def test_cancel_queued(self):
+        done = self.submit()
+        done.cancel()
+        self.assertTrue(self.pool.tasks[0].cancelled())
+        self.assertIsNotNone(self.submit())
+        self.pool.tasks[1].set_result(({}, new_user(), {}))
+
+    def test_cancel_running(self):
+        done = self.submit()
+        task = self.pool.tasks[0]
+        task.set_running_or_notify_cancel()
+        done.cancel()
+        self.assertFalse(task.cancelled())
+        with self.assertNoLogs("concurrent.futures", level="ERROR"):
+            task.set_result(({}, new_user(), {}))
+        self.assertTrue(done.cancelled())
+        self.assertIsNotNone(self.submit())
+        self.pool.tasks[1].set_result(({}, new_user(), {}))
+
+class TestSubmitTimeout(unittest.TestCase):
+    def setUp(self):
+        limiter.enabled = False
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_timeout_returns_503(self):
+        main.storage.put_user("slow-user", new_user())
+        token = main.create_access_token("slow-user")
+        before = copy.deepcopy(main.storage.get_user("slow-user"))
+
+        with mock.patch.object(level_manager, "submit_validation", return_value=Future()), \
+                mock.patch.object(main, "VALIDATION_TIMEOUT", 0.05):
+            response = self.client.post("/submit", json={"auth_token": token, "password": "welcome123"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(main.storage.get_user("slow-user"), before)
+
+    def test_busy_returns_503(self):
+        main.storage.put_user("busy-user", new_user())
+        token = main.create_access_token("busy-user")
+        with mock.patch.object(level_manager, "submit_validation", side_effect=ValidationBusy("busy")):
+            response = self.client.post("/submit", json={"auth_token": token, "password": "welcome123"})
+        self.assertEqual(response.status_code, 503)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,47 @@
-import React, { useState } from "react";
-import { useQuery } from "@tanstack/react-query";
+import React, { useEffect, useState } from "react";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import axios from "axios";
 
+// Merge a streamed leaderboard delta into the cached leaderboard response
+const applyLeaderboardDelta = (current, delta) => {
+  if (!current) return current;
+  const rows = new Map(current.leaderboard.map((row) => [row.user_id, row]));
+  delta.removed.forEach((userId) => rows.delete(userId));
+  delta.rows.forEach((row) => rows.set(row.user_id, row));
+  return {
+    leaderboard: [...rows.values()]
+      .sort((a, b) => a.rank - b.rank)
+      .slice(0, delta.size),
+    last_updated: delta.last_updated,
+  };
+};
+
 const GameLeaderboard = () => {
   const BACKEND_URL = import.meta.env.VITE_BACKEND_URL;
   const itemsPerPage = 10;
   const [currentPage, setCurrentPage] = useState(1);
+  const [isStreaming, setIsStreaming] = useState(false);
+  const queryClient = useQueryClient();
+
+  // Live updates from the server; polling is only used while the stream is down
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return undefined;
+
+    const source = new EventSource(`${BACKEND_URL}/leaderboard/stream`);
+    source.addEventListener("snapshot", (event) => {
+      queryClient.setQueryData(["leaderboard"], JSON.parse(event.data));
+      setIsStreaming(true);
+    });
+    source.addEventListener("delta", (event) => {
+      const delta = JSON.parse(event.data);
+      queryClient.setQueryData(["leaderboard"], (current) =>
+        applyLeaderboardDelta(current, delta)
+      );
+    });
+    source.onerror = () => setIsStreaming(false);
+
+    return () => source.close();
+  }, [BACKEND_URL, queryClient]);
 
   // API functions
   const fetchLeaderboard = async () => {
@@ -27,7 +63,7 @@ const GameLeaderboard = () => {
   } = useQuery({
     queryKey: ["leaderboard"],
     queryFn: fetchLeaderboard,
-    refetchInterval: 30000, // Auto-refresh every 30 seconds
+    refetchInterval: isStreaming ? false : 30000, // Auto-refresh every 30 seconds without a stream
     staleTime: 25000, // Consider data stale after 25 seconds
     retry: 3,
     retryDelay: (attemptIndex) => Math.min(1000 * 2 ** attemptIndex, 30000),